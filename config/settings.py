@@ -5,6 +5,8 @@ import os
 from dotenv import load_dotenv
 import dj_database_url
 
+from config.database import tune_database
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -38,12 +40,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Off (and removed at startup) unless PROFILE_SAMPLE_RATE is set.
+    "main_app.profiling.ProfilingMiddleware",
+    "main_app.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "main_app.replicas.ReplicaMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "main_app.auth.CachedAuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -66,7 +72,12 @@ TEMPLATES = [
     },
 ]
 
-WSGI_APPLICATION = "asset--ally.wsgi.application"
+WSGI_APPLICATION = "config.wsgi.application"
+ASGI_APPLICATION = "config.asgi.application"
+
+# Serve the read-only pages (dashboard, lists, details) from async views.
+# Turn on together with the ASGI server, see Procfile / README.
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "") == "1"
 
 # ======================
 # DATABASES
@@ -88,6 +99,124 @@ db_from_env = dj_database_url.config(
 if db_from_env:
     DATABASES["default"] = db_from_env
 
+# Optional read replica: GET pages and reports read from it, writes and
+# anything after a write go to the primary (main_app/replicas.py). Two
+# local files work too: REPLICA_DATABASE_URL=sqlite:///replica.sqlite3
+REPLICA_DATABASE = None
+db_replica = dj_database_url.config(
+    env="REPLICA_DATABASE_URL",
+    conn_max_age=600,
+    conn_health_checks=True,
+)
+if db_replica:
+    # Tests run against the primary's test database.
+    db_replica["TEST"] = {"MIRROR": "default"}
+    DATABASES["replica"] = db_replica
+    REPLICA_DATABASE = "replica"
+
+DATABASE_ROUTERS = ["main_app.replicas.ReplicaRouter"]
+
+# Connection pooling for Postgres, WAL and pragmas for SQLite
+# (config/database.py). DB_PROFILE=stock keeps Django's defaults.
+DB_PROFILE = os.getenv("DB_PROFILE", "tuned")
+DATABASES = {alias: tune_database(db, DB_PROFILE) for alias, db in DATABASES.items()}
+
+# How long a client that just wrote keeps reading from the primary; set
+# above the replica's usual lag.
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "10"))
+
+# ======================
+# CACHES
+# ======================
+# Local memory by default; set REDIS_URL to share the cache between
+# gunicorn workers and dynos.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "asset-ally",
+    }
+}
+if os.getenv("REDIS_URL"):
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ["REDIS_URL"],
+    }
+
+# With REDIS_URL, sessions and the logged-in user are read from their own
+# cache and written through to the database (main_app/auth.py). Without a
+# cache every worker and dyno shares, a logout or deactivation on one would
+# go unseen by the others, so sessions and users then come from the
+# database and the "sessions" cache is a no-op.
+if os.getenv("REDIS_URL"):
+    CACHES["sessions"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ["REDIS_URL"],
+        "KEY_PREFIX": "sessions",
+    }
+    SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+    AUTHENTICATION_BACKENDS = ["main_app.auth.CachedModelBackend"]
+else:
+    CACHES["sessions"] = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+    SESSION_ENGINE = "django.contrib.sessions.backends.db"
+    AUTHENTICATION_BACKENDS = ["django.contrib.auth.backends.ModelBackend"]
+SESSION_CACHE_ALIAS = "sessions"
+# Saves and deletes drop the cached user at once; this bounds how long a
+# bulk .update() (which sends no signals) can leave a stale copy in use.
+USER_CACHE_SECONDS = int(os.getenv("USER_CACHE_SECONDS", "60"))
+
+# Dashboard counters are cached per user and dropped on every write. A
+# write only drops the copy in a cache every worker reads, so this is off
+# (0, computed on each request) unless the cache is shared.
+DASHBOARD_CACHE_SECONDS = int(os.getenv("DASHBOARD_CACHE_SECONDS", "60")) if os.getenv("REDIS_URL") else 0
+
+# Scanner lookups kept per worker process (see main_app/lookup.py). Their
+# versions live in the default cache, so this is off unless it is shared.
+LOOKUP_CACHE_SIZE = int(os.getenv("LOOKUP_CACHE_SIZE", "10000")) if os.getenv("REDIS_URL") else 0
+
+# Returned checkouts older than this move to the archive table
+# (`manage.py archive_checkouts`, see main_app/history.py).
+CHECKOUT_ARCHIVE_DAYS = int(os.getenv("CHECKOUT_ARCHIVE_DAYS", "365"))
+
+# Fraction of requests that get Server-Timing headers and a JSON log line
+# with their SQL, view and template times (main_app/profiling.py); 0 = off.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOWEST_QUERIES = int(os.getenv("PROFILE_SLOWEST_QUERIES", "3"))
+
+# Prometheus metrics at /metrics (main_app/metrics.py). The gauges count
+# every account's checkouts, so they are only served to scrapes sending
+# "Authorization: Bearer <METRICS_TOKEN>"; without a token metrics are off.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1" if METRICS_TOKEN else "0") == "1"
+# How stale the open/overdue/device gauges may get.
+METRICS_SNAPSHOT_SECONDS = int(os.getenv("METRICS_SNAPSHOT_SECONDS", "60"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "main_app.profiling": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
+# ======================
+# EMAIL
+# ======================
+# Overdue notices print to the console locally; set EMAIL_HOST etc. in
+# Config Vars to send real mail.
+EMAIL_BACKEND = os.getenv(
+    "EMAIL_BACKEND",
+    "django.core.mail.backends.console.EmailBackend"
+    if DEBUG
+    else "django.core.mail.backends.smtp.EmailBackend",
+)
+EMAIL_HOST = os.getenv("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "25"))
+EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "") == "1"
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "Asset Ally <no-reply@assetally.local>")
+
 # ======================
 # Password validation
 # ======================
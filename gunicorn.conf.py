@@ -0,0 +1,29 @@
+# gunicorn reads this from the working directory (Procfile, loadtest servers).
+import os
+import shutil
+import tempfile
+
+
+# Each worker writes its Prometheus samples here and /metrics adds up the
+# files of all of them (main_app/metrics.py). Set before the workers fork,
+# so they all see it.
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), f"asset-ally-metrics-{os.getpid()}")
+)
+
+
+def on_starting(server):
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    # Keeps its counters, drops its live gauges.
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
@@ -1,28 +1,115 @@
 from django.contrib import admin
-from .models import Device, Student, Staff, Checkout
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .models import (
+    ArchivedCheckout,
+    ArchivedDeviceEvent,
+    Checkout,
+    Device,
+    DeviceEvent,
+    OverdueNotice,
+    Staff,
+    Student,
+)
+from .search import search_devices, search_students
+
+
+def estimated_rows(queryset):
+    """
+    Roughly how many rows the table behind queryset has, without scanning
+    it: the planner's estimate on Postgres, else the span of primary keys
+    (old rows are the ones archived, so that stays close).
+    """
+    connection = connections[queryset.db]
+    opts = queryset.model._meta
+    table = connection.ops.quote_name(opts.db_table)
+    pk = connection.ops.quote_name(opts.pk.column)
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [opts.db_table])
+            estimate = cursor.fetchone()[0]
+            if estimate > 0:  # -1 until the table's first ANALYZE
+                return estimate
+        # Separate subqueries: SQLite only reads MIN or MAX off the index
+        # when it is the query's only aggregate.
+        cursor.execute(f"SELECT (SELECT MIN({pk}) FROM {table}), (SELECT MAX({pk}) FROM {table})")
+        first, last = cursor.fetchone()
+    return last - first + 1 if first is not None else 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Never runs COUNT(*) over a whole big table. An unfiltered list past
+    EXACT_LIMIT rows shows estimated_rows(); a filtered or searched one is
+    counted up to EXACT_LIMIT + 1 and stops paging there.
+    """
+
+    EXACT_LIMIT = 10_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.has_filters():
+            estimate = estimated_rows(queryset)
+            if estimate > self.EXACT_LIMIT:
+                return estimate
+        return queryset.order_by()[: self.EXACT_LIMIT + 1].count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables that grow without bound."""
+
+    paginator = EstimatedCountPaginator
+    # The "(N total)" link would COUNT(*) the whole table on every page.
+    show_full_result_count = False
+
 
 @admin.register(Student)
-class StudentAdmin(admin.ModelAdmin):
+class StudentAdmin(LargeTableAdmin):
     list_display = ("student_id", "last_name", "first_name", "grade_level", "active")
     list_filter = ("grade_level", "active")
-    search_fields = ("student_id", "last_name", "first_name", "guardian_name", "guardian_email")
+    # Documents the search box; the search itself is search_students().
+    search_fields = ("student_id", "last_name", "first_name")
+    autocomplete_fields = ("created_by",)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_students(queryset, search_term, rank=False), False
 
 @admin.register(Staff)
 class StaffAdmin(admin.ModelAdmin):
     list_display = ("last_name", "first_name", "email", "role", "active")
     list_filter = ("role", "active")
     search_fields = ("last_name", "first_name", "email")
+    autocomplete_fields = ("created_by",)
 
 @admin.register(Device)
-class DeviceAdmin(admin.ModelAdmin):
-    list_display = ("asset_tag", "serial_number", "model", "status", "condition")
+class DeviceAdmin(LargeTableAdmin):
+    list_display = ("asset_tag", "serial_number", "model", "status", "current_borrower", "condition")
     list_filter = ("status", "condition")
-    search_fields = ("asset_tag", "serial_number", "model", "manufacturer")
+    # Documents the search box; the search itself is search_devices().
+    search_fields = ("asset_tag", "serial_number", "model")
+    autocomplete_fields = ("created_by",)
+    # Kept in step with the checkouts; see repair_current_checkouts.
+    readonly_fields = ("current_checkout", "current_borrower")
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_devices(queryset, search_term, rank=False), False
 
 @admin.register(Checkout)
-class CheckoutAdmin(admin.ModelAdmin):
+class CheckoutAdmin(LargeTableAdmin):
     list_display = ("device", "student", "staff", "checked_out_at", "due_back_at", "returned_at")
+    list_select_related = ("device", "student", "staff")
     list_filter = ("due_back_at", "returned_at")
+    # Newest first by primary key: a backwards index scan, where
+    # -checked_out_at would sort the whole table for every page.
+    ordering = ("-pk",)
     search_fields = (
         "device__asset_tag",
         "device__serial_number",
@@ -30,4 +117,71 @@ class CheckoutAdmin(admin.ModelAdmin):
         "student__last_name",
         "staff__last_name",
     )
+    autocomplete_fields = ("device", "student", "staff", "created_by")
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Look the term up in the device and student search indexes and
+        filter on the foreign keys, instead of LIKE '%term%' across joins.
+        """
+        if not search_term.strip():
+            return queryset, False
+        devices = search_devices(Device.objects.all(), search_term, rank=False).values("pk")
+        students = search_students(Student.objects.all(), search_term, rank=False).values("pk")
+        # A few thousand rows at most; not worth an index.
+        staff = Staff.objects.filter(
+            Q(last_name__istartswith=search_term.strip()) | Q(email__iexact=search_term.strip())
+        ).values("pk")
+        matches = Q(device__in=devices) | Q(student__in=students) | Q(staff__in=staff)
+        return queryset.filter(matches), False
+
+
+@admin.register(ArchivedCheckout)
+class ArchivedCheckoutAdmin(CheckoutAdmin):
+    """Read-only: see `manage.py archive_checkouts`."""
+
+    list_display = CheckoutAdmin.list_display + ("archived_at",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OverdueNotice)
+class OverdueNoticeAdmin(LargeTableAdmin):
+    list_display = ("checkout", "recipient", "sent_at")
+    list_select_related = ("checkout__device", "checkout__student", "checkout__staff")
+    search_fields = ("recipient",)
+    autocomplete_fields = ("checkout",)
+
+
+class DeviceEventAdmin(LargeTableAdmin):
+    """Read-only: events are append-only."""
+
+    list_display = ("device", "kind", "old_value", "new_value", "borrower", "created_at")
+    list_select_related = ("device",)
+    # A date filter rather than date_hierarchy, whose year links need a
+    # DISTINCT over every event.
+    list_filter = ("kind", "created_at")
+    search_fields = ("device__asset_tag",)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        devices = search_devices(Device.objects.all(), search_term, rank=False).values("pk")
+        return queryset.filter(device__in=devices), False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
+admin.site.register(DeviceEvent, DeviceEventAdmin)
+admin.site.register(ArchivedDeviceEvent, DeviceEventAdmin)
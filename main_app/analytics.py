@@ -0,0 +1,434 @@
+"""
+Daily analytics rollups. `manage.py rollup_analytics` (nightly) writes one
+DailyRollup row per user, day and model / manufacturer / grade level from
+live and archived checkouts and the device event log; the analytics page
+only reads those rows, aggregated by month.
+
+A run re-rolls every day since the previous run started (open checkouts and
+device status changes only ever touch "now") plus any past days marked in
+RollupDirtyDay by backdated checkout edits and deletes. A day's fleet size
+is fixed the first time the day is rolled.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import (
+    ArchivedCheckout,
+    ArchivedDeviceEvent,
+    Checkout,
+    DailyRollup,
+    Device,
+    DeviceEvent,
+    RollupDirtyDay,
+    RollupRun,
+)
+
+
+ROLLUP_BATCH_SIZE = 1000
+
+# Rollup column for each device status the event log counts.
+STATUS_COUNTERS = {"REPAIR": "repairs", "LOST": "losses"}
+
+
+def date_range(first, last):
+    day = first
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
+
+
+def local_day(value):
+    return timezone.localtime(value).date()
+
+
+def day_bounds(first, last):
+    """Aware datetimes from the start of first to the end of last, local time."""
+    tz = timezone.get_current_timezone()
+    return (
+        datetime.combine(first, time.min, tzinfo=tz),
+        datetime.combine(last + timedelta(days=1), time.min, tzinfo=tz),
+    )
+
+
+def contiguous_runs(days):
+    """Sorted (first, last) pairs covering a set of dates."""
+    runs = []
+    for day in sorted(days):
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [tuple(run) for run in runs]
+
+
+# ======================
+#  CHANGE TRACKING
+# ======================
+def checkout_changed_days(checkout, deleted=False):
+    """
+    Past days whose rollups this save (or delete) of checkout changed.
+    Today is re-rolled on every run, so ordinary checkouts and returns
+    yield nothing; only backdated edits and deletes do.
+    """
+    today = timezone.localdate()
+
+    def span(start, end):
+        return local_day(start), local_day(end) if end else today
+
+    start, end = span(checkout.checked_out_at, checkout.returned_at)
+    loaded = getattr(checkout, "_loaded", {})
+    if deleted or len(loaded) < len(Checkout.ROLLUP_FIELDS):
+        ranges = [(start, end)]
+    elif any(loaded[name] != getattr(checkout, name) for name in ("device_id", "student_id", "staff_id")):
+        # Counted under another model or grade now: both spans change.
+        ranges = [span(loaded["checked_out_at"], loaded["returned_at"]), (start, end)]
+    else:
+        old_start, old_end = span(loaded["checked_out_at"], loaded["returned_at"])
+        ranges = []
+        if loaded["checked_out_at"] != checkout.checked_out_at:
+            ranges.append(sorted((old_start, start)))
+        if loaded["returned_at"] != checkout.returned_at:
+            ranges.append(sorted((old_end, end)))
+    yesterday = today - timedelta(days=1)
+    return {day for first, last in ranges for day in date_range(first, min(last, yesterday))}
+
+
+def mark_dirty_days(user_id, days):
+    if user_id and days:
+        RollupDirtyDay.objects.bulk_create(
+            [RollupDirtyDay(created_by_id=user_id, day=day) for day in days], ignore_conflicts=True
+        )
+
+
+# ======================
+#  COMPUTING
+# ======================
+def _checkouts(user_id, start, end):
+    """(checked_out_at, returned_at, model, manufacturer, grade) open at any time in [start, end)."""
+    fields = ("checked_out_at", "returned_at", "device__model", "device__manufacturer", "student__grade_level")
+    open_now = Checkout.objects.filter(created_by_id=user_id, returned_at__isnull=True)
+    querysets = [open_now] + [
+        model.objects.filter(created_by_id=user_id, returned_at__gte=start)
+        for model in (Checkout, ArchivedCheckout)
+    ]
+    for queryset in querysets:
+        yield from queryset.filter(checked_out_at__lt=end).order_by().values_list(*fields)
+
+
+def _status_events(user_id, start, end):
+    """(device_id, status, created_at, model, manufacturer) for repairs and losses in [start, end)."""
+    for model in (DeviceEvent, ArchivedDeviceEvent):
+        yield from (
+            model.objects.filter(
+                device__created_by_id=user_id,
+                kind="STATUS",
+                new_value__in=STATUS_COUNTERS,
+                created_at__gte=start,
+                created_at__lt=end,
+            )
+            .order_by()
+            .values_list("device_id", "new_value", "created_at", "device__model", "device__manufacturer")
+        )
+
+
+def _last_grades(device_ids):
+    """device_id -> [(checked_out_at, grade)] of its student checkouts, oldest first."""
+    grades = defaultdict(list)
+    for model in (Checkout, ArchivedCheckout):
+        rows = (
+            model.objects.filter(device_id__in=device_ids, student__isnull=False)
+            .order_by()
+            .values_list("device_id", "checked_out_at", "student__grade_level")
+        )
+        for device_id, checked_out_at, grade in rows:
+            grades[device_id].append((checked_out_at, grade))
+    for history in grades.values():
+        history.sort()
+    return grades
+
+
+def _retirements(user_id):
+    """device_id -> [(day, retired afterwards)] from its status events, oldest first."""
+    history = defaultdict(list)
+    for model in (DeviceEvent, ArchivedDeviceEvent):
+        rows = (
+            model.objects.filter(device__created_by_id=user_id, kind="STATUS")
+            .filter(Q(old_value="RETIRED") | Q(new_value="RETIRED"))
+            .order_by()
+            .values_list("device_id", "created_at", "old_value", "new_value")
+        )
+        for device_id, created_at, old, new in rows:
+            history[device_id].append((created_at, old == "RETIRED", new == "RETIRED"))
+    for events in history.values():
+        events.sort()
+    return {
+        device_id: (events[0][1], [(local_day(at), new) for at, _, new in events])
+        for device_id, events in history.items()
+    }
+
+
+def fleet_changes(user_id, first, last):
+    """
+    (dimension, key) -> day -> change in devices on hand, for first..last.
+    A device is on hand from its purchase date (when known) except while
+    retired, which is read back from its status events.
+    """
+    changes = defaultdict(Counter)
+    retirements = _retirements(user_id)
+    devices = Device.objects.filter(created_by_id=user_id).order_by()
+    for pk, model, manufacturer, status, purchased in devices.values_list(
+        "pk", "model", "manufacturer", "status", "purchase_date"
+    ):
+        start = max(first, purchased) if purchased else first
+        if pk in retirements:
+            retired, transitions = retirements[pk]
+        else:
+            retired, transitions = status == "RETIRED", []
+        spans = []
+        since = None
+        for day, now_retired in [(start, None)] + [t for t in transitions if t[0] > start]:
+            if day > last:
+                break
+            if now_retired is None:
+                # State at the end of start: the last transition up to it.
+                now_retired = next((r for d, r in reversed(transitions) if d <= start), retired)
+            if now_retired and since is not None:
+                spans.append((since, day - timedelta(days=1)))
+                since = None
+            elif not now_retired and since is None:
+                since = day
+        if since is not None:
+            spans.append((since, last))
+        for key in (("MODEL", model), ("MANUFACTURER", manufacturer)):
+            for span_first, span_last in spans:
+                changes[key][span_first] += 1
+                changes[key][span_last + timedelta(days=1)] -= 1
+    return changes
+
+
+def compute_rollups(user_id, first, last):
+    """Unsaved DailyRollup rows for user_id and every day from first to last."""
+    start, end = day_bounds(first, last)
+    stats = defaultdict(Counter)  # (day, dimension, key) -> column -> value
+    out = defaultdict(Counter)  # (dimension, key) -> day -> change in open checkouts
+
+    for checked_out_at, returned_at, model, manufacturer, grade in _checkouts(user_id, start, end):
+        keys = [("MODEL", model), ("MANUFACTURER", manufacturer)]
+        if grade is not None:
+            keys.append(("GRADE", grade))
+        opened = local_day(checked_out_at)
+        closed = local_day(returned_at) if returned_at else last
+        for key in keys:
+            if opened >= first:
+                stats[(opened,) + key]["checkouts"] += 1
+            if returned_at and closed <= last:
+                stats[(closed,) + key]["returns"] += 1
+                stats[(closed,) + key]["return_seconds"] += int((returned_at - checked_out_at).total_seconds())
+            out[key][max(opened, first)] += 1
+            out[key][min(closed, last) + timedelta(days=1)] -= 1
+
+    for key, changes in out.items():
+        running = 0
+        for day in date_range(first, last):
+            running += changes[day]
+            if running:
+                stats[(day,) + key]["devices_out"] = running
+
+    events = list(_status_events(user_id, start, end))
+    lost = {device_id for device_id, status, *_ in events if status == "LOST"}
+    grades = _last_grades(lost) if lost else {}
+    for device_id, status, created_at, model, manufacturer in events:
+        column = STATUS_COUNTERS[status]
+        day = local_day(created_at)
+        stats[day, "MODEL", model][column] += 1
+        stats[day, "MANUFACTURER", manufacturer][column] += 1
+        if status == "LOST":
+            # Charged to the grade of the last student who borrowed it.
+            borrowed = [grade for at, grade in grades.get(device_id, ()) if at <= created_at]
+            if borrowed:
+                stats[day, "GRADE", borrowed[-1]][column] += 1
+
+    for key, changes in fleet_changes(user_id, first, last).items():
+        running = 0
+        for day in date_range(first, last):
+            running += changes[day]
+            if running:
+                stats[(day,) + key]["fleet"] = running
+
+    return [
+        DailyRollup(created_by_id=user_id, day=day, dimension=dimension, key=key or "", **columns)
+        for (day, dimension, key), columns in stats.items()
+    ]
+
+
+def write_rollups(user_id, first, last):
+    """
+    Replace user_id's rollups for first..last. Returns the rows written.
+    Days before today keep the fleet they were first rolled with, so later
+    additions and retirements don't rewrite past utilization.
+    """
+    rows = compute_rollups(user_id, first, last)
+    closed = DailyRollup.objects.filter(
+        created_by_id=user_id, day__range=(first, min(last, timezone.localdate() - timedelta(days=1)))
+    )
+    snapshot = {
+        (day, dimension, key): fleet
+        for day, dimension, key, fleet in closed.values_list("day", "dimension", "key", "fleet")
+    }
+    if snapshot:
+        rolled_days = {day for day, _, _ in snapshot}
+        by_key = {(row.day, row.dimension, row.key): row for row in rows}
+        for row in rows:
+            if row.day in rolled_days:
+                row.fleet = snapshot.get((row.day, row.dimension, row.key), 0)
+        rows += [
+            DailyRollup(created_by_id=user_id, day=day, dimension=dimension, key=key, fleet=fleet)
+            for (day, dimension, key), fleet in snapshot.items()
+            if fleet and (day, dimension, key) not in by_key
+        ]
+    with transaction.atomic():
+        DailyRollup.objects.filter(created_by_id=user_id, day__range=(first, last)).delete()
+        DailyRollup.objects.bulk_create(rows, batch_size=ROLLUP_BATCH_SIZE)
+    return len(rows)
+
+
+def _first_days():
+    """user_id -> the first day anything happened for that user."""
+    firsts = {}
+    sources = [
+        model.objects.values_list("created_by_id").annotate(first=Min("checked_out_at"))
+        for model in (Checkout, ArchivedCheckout)
+    ] + [
+        model.objects.values_list("device__created_by_id").annotate(first=Min("created_at"))
+        for model in (DeviceEvent, ArchivedDeviceEvent)
+    ]
+    for queryset in sources:
+        for user_id, first in queryset.order_by():
+            if user_id and first:
+                firsts[user_id] = min(firsts.get(user_id, first), first)
+    return {user_id: local_day(first) for user_id, first in firsts.items()}
+
+
+def run_rollups(full=False):
+    """
+    Re-roll the days that changed since the last run (every day when full
+    or on the first run) and record the run. Returns the RollupRun.
+    """
+    started = timezone.now()
+    today = timezone.localdate()
+    last_run = RollupRun.objects.first()
+    full = full or last_run is None
+
+    marked = list(RollupDirtyDay.objects.values_list("pk", "created_by_id", "day"))
+    days = defaultdict(set)
+    for _, user_id, day in marked:
+        days[user_id].add(day)
+    if full:
+        firsts = _first_days()
+        for user_id, first in firsts.items():
+            days[user_id].update(date_range(first, today))
+            DailyRollup.objects.filter(created_by_id=user_id, day__lt=first).delete()
+        DailyRollup.objects.exclude(created_by_id__in=firsts).delete()
+    else:
+        since = local_day(last_run.started_at)
+        users = Device.objects.filter(created_by__isnull=False).values_list("created_by_id", flat=True)
+        for user_id in users.order_by().distinct():
+            days[user_id].update(date_range(since, today))
+
+    processed = 0
+    for user_id, user_days in days.items():
+        for first, last in contiguous_runs(user_days):
+            write_rollups(user_id, first, last)
+        processed += len(user_days)
+    RollupDirtyDay.objects.filter(pk__in=[pk for pk, _, _ in marked]).delete()
+    return RollupRun.objects.create(
+        started_at=started, finished_at=timezone.now(), days=processed, full=full
+    )
+
+
+# ======================
+#  READING
+# ======================
+def _ratio(part, whole, scale=1):
+    return round(part * scale / whole, 1) if whole else None
+
+
+def utilization(row):
+    return _ratio(row["devices_out"], row["fleet"], 100)
+
+
+def average_days(row):
+    return _ratio(row["return_seconds"], row["returns"], 1 / 86400)
+
+
+def repairs_per_100(row):
+    # fleet is summed over the month's days; divide by them for the average.
+    return _ratio(row["repairs"] * row["days"], row["fleet"], 100)
+
+
+def loss_rate(row):
+    return _ratio(row["losses"], row["checkouts"], 100)
+
+
+# (title, dimension, unit, value of one month's summed rollups)
+CHARTS = [
+    ("Utilization by model", "MODEL", "%", utilization),
+    ("Average checkout length by model", "MODEL", "days", average_days),
+    ("Repairs per 100 devices by manufacturer", "MANUFACTURER", "", repairs_per_100),
+    ("Loss rate by grade level", "GRADE", "%", loss_rate),
+]
+
+SUMMED = ("fleet", "devices_out", "checkouts", "returns", "return_seconds", "repairs", "losses")
+
+
+def month_start(today, months_back):
+    month = today.year * 12 + today.month - 1 - months_back
+    return today.replace(year=month // 12, month=month % 12 + 1, day=1)
+
+
+def monthly_charts(user, months=12):
+    """
+    Month-over-month charts for the last `months` months, from one query
+    that sums the user's daily rollups by month (a few hundred rows).
+    """
+    since = month_start(timezone.localdate(), months - 1)
+    rows = (
+        DailyRollup.objects.filter(created_by=user, day__gte=since)
+        .annotate(month=TruncMonth("day"))
+        .values("dimension", "key", "month")
+        .annotate(
+            days=Count("pk"),
+            **{column: Sum(column) for column in SUMMED},
+        )
+        .order_by("month", "dimension", "key")
+    )
+    by_dimension = defaultdict(list)
+    for row in rows:
+        by_dimension[row["dimension"]].append(row)
+
+    charts = []
+    for title, dimension, unit, value in CHARTS:
+        cells = {(row["month"], row["key"]): value(row) for row in by_dimension[dimension]}
+        keys = sorted({key for _, key in cells})
+        top = max((v for v in cells.values() if v), default=0)
+        charts.append(
+            {
+                "title": title,
+                "unit": unit,
+                "keys": keys,
+                "months": [
+                    {"month": month, "cells": [_cell(cells.get((month, key)), top) for key in keys]}
+                    for month in sorted({month for month, _ in cells})
+                ],
+            }
+        )
+    return charts
+
+
+def _cell(value, top):
+    return {"value": value, "width": round(100 * value / top) if value and top else 0}
@@ -0,0 +1,103 @@
+"""
+Async versions of the read-only views, used when ASYNC_READ_VIEWS is on
+(the ASGI deployment, see config/asgi.py). They reuse the querysets and
+templates of the sync views in views.py and only swap the DB calls for the
+async ORM, so a single ASGI worker isn't tied up while slow clients read.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404, JsonResponse
+
+from . import views
+from .autocomplete import PICKERS, aautocomplete
+from .dashboard import aget_dashboard
+from .lookup import alookup_device
+
+
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    async def dispatch(self, request, *args, **kwargs):
+        # Load the user without blocking the event loop, and hand the same
+        # object to request.user so templates don't load it again.
+        user = await request.auser()
+        request.user = user
+        if not user.is_authenticated:
+            return self.handle_no_permission()
+        return await super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
+
+
+class AsyncListMixin(AsyncLoginRequiredMixin):
+    async def get(self, request, *args, **kwargs):
+        # Off the event loop: a search checks for rows to rank up front.
+        self.object_list = await sync_to_async(self.get_queryset)()
+        await self.apaginate()
+        return self.render_to_response(self.get_context_data())
+
+
+class AsyncDetailMixin(AsyncLoginRequiredMixin):
+    async def get(self, request, *args, **kwargs):
+        self.object = await self.aget_object()
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+    async def aget_object(self, queryset=None):
+        queryset = self.get_queryset() if queryset is None else queryset
+        try:
+            return await queryset.aget(pk=self.kwargs["pk"])
+        except queryset.model.DoesNotExist:
+            raise Http404(f"No {self.model._meta.verbose_name} found matching the query")
+
+
+class DashboardView(AsyncLoginRequiredMixin, views.DashboardView):
+    async def get(self, request, *args, **kwargs):
+        ctx = self.get_context_data(**kwargs)
+        ctx.update(await aget_dashboard(request.user))
+        return self.render_to_response(ctx)
+
+    def get_context_data(self, **kwargs):
+        # Skip views.DashboardView's sync lookup; get() fills it in.
+        return super(views.DashboardView, self).get_context_data(**kwargs)
+
+
+class StudentList(AsyncListMixin, views.StudentList):
+    pass
+
+
+class StudentDetail(AsyncDetailMixin, views.StudentDetail):
+    pass
+
+
+class DeviceList(AsyncListMixin, views.DeviceList):
+    pass
+
+
+class DeviceDetail(AsyncDetailMixin, views.DeviceDetail):
+    pass
+
+
+class CheckoutList(AsyncListMixin, views.CheckoutList):
+    pass
+
+
+class CheckoutDetail(AsyncDetailMixin, views.CheckoutDetail):
+    async def aget_object(self, queryset=None):
+        try:
+            return await super().aget_object(queryset)
+        except Http404:
+            return await super().aget_object(self.get_archived_queryset())
+
+
+class DeviceLookupView(AsyncLoginRequiredMixin, views.DeviceLookupView):
+    async def get(self, request):
+        code = request.GET.get("code", "").strip()
+        if not code:
+            return JsonResponse({"error": "Pass the scanned asset tag or serial as ?code=."}, status=400)
+        return self.respond(code, await alookup_device(request.user, code))
+
+
+class AutocompleteView(AsyncLoginRequiredMixin, views.AutocompleteView):
+    async def get(self, request, kind):
+        if kind not in PICKERS:
+            raise Http404("Unknown autocomplete.")
+        q = request.GET.get("q", "").strip()
+        if not q:
+            return JsonResponse({"error": "Pass the start of a name or tag as ?q=."}, status=400)
+        return JsonResponse({"results": await aautocomplete(request.user, kind, q)})
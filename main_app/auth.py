@@ -0,0 +1,96 @@
+"""
+Cache-first authentication. Sessions use the cached_db engine (written
+through to the database, read from the "sessions" cache) and the logged-in
+User is kept in the same cache until it is saved or deleted, so a warm
+request loads neither from the database.
+
+It is only switched on with REDIS_URL (config/settings.py): the cache has
+to be shared by every worker and dyno, so logging out or changing a
+password takes effect in all of them. A bulk .update() of users sends no
+signals, so cached users also expire after USER_CACHE_SECONDS.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.sessions.backends.cached_db import KEY_PREFIX
+from django.core.cache import caches
+from django.db import transaction
+
+
+def _user_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def _cache():
+    return caches[settings.SESSION_CACHE_ALIAS]
+
+
+def forget_user(user_id):
+    """Drop the cached user now and again on commit (see invalidate_lookups)."""
+
+    def delete():
+        _cache().delete(_user_key(user_id))
+
+    delete()
+    transaction.on_commit(delete)
+
+
+def forget_session(session_key):
+    _cache().delete(KEY_PREFIX + session_key)
+
+
+def cached_auth():
+    """
+    override_settings() for the REDIS_URL setup with a local memory cache in
+    Redis's place, for the benchmarks and tests, which run in one process.
+    User ids get reused between test cases, so clear the cache in setUp().
+    """
+    from django.test import override_settings
+
+    return override_settings(
+        CACHES={
+            **settings.CACHES,
+            "sessions": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "sessions"},
+        },
+        SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+        AUTHENTICATION_BACKENDS=["main_app.auth.CachedModelBackend"],
+    )
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose get_user() reads the cache before the database."""
+
+    def get_user(self, user_id):
+        user = _cache().get(_user_key(user_id))
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                _cache().set(_user_key(user_id), user, settings.USER_CACHE_SECONDS)
+            return user
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        user = await _cache().aget(_user_key(user_id))
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is not None:
+                await _cache().aset(_user_key(user_id), user, settings.USER_CACHE_SECONDS)
+            return user
+        return user if self.user_can_authenticate(user) else None
+
+
+async def _auser(request):
+    # The same memo as the lazy request.user, so sync and async code in one
+    # request (views, templates, context processors) share a single lookup.
+    if not hasattr(request, "_cached_user"):
+        request._cached_user = await auth.aget_user(request)
+    return request._cached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        super().process_request(request)
+        request.auser = partial(_auser, request)
@@ -0,0 +1,107 @@
+"""
+Type-ahead pickers for the checkout form: available devices by asset tag,
+active students and staff by name, student id or email.
+
+A term matches as a case-insensitive prefix of UPPER(col), answered by the
+(created_by, UPPER(col)) expression indexes from migrations 0014 and 0016
+(devices use device_tag_prefix_idx, shared with device search). SQLite
+compares text bytewise, so there it is the range UPPER(col) >= UPPER(term)
+AND UPPER(col) < UPPER(term) || U+10FFFF. Postgres compares by the database
+collation, where such a range skips or lets in names with punctuation, so
+there it is UPPER(col) COLLATE "C" LIKE UPPER(term) || '%' and migrations
+0015 and 0016 build the indexes with COLLATE "C". Each column is one query that
+reads LIMIT index entries, plus any devices it skips as unavailable, however
+many rows the user has.
+"""
+from django.db import connection
+from django.db.models import Value
+from django.db.models.functions import Collate, Upper
+
+from .models import Device, Staff, Student
+
+
+LIMIT = 10
+# The highest code point: sorts after any character a tag, name or email contains.
+HIGH = "\U0010ffff"
+
+
+class Picker:
+    """What one autocomplete kind searches and how it labels a row."""
+
+    def __init__(self, model, columns, fields, label, **filters):
+        self.model = model
+        self.columns = columns
+        self.fields = fields
+        self.label = label
+        self.filters = filters
+
+    def queryset(self, user):
+        return self.model.objects.filter(created_by=user, **self.filters)
+
+    def labelled(self, queryset):
+        """The queryset reduced to the columns the label needs."""
+        return queryset.order_by().values("pk", *self.fields)
+
+
+PICKERS = {
+    "devices": Picker(
+        Device,
+        columns=("asset_tag",),
+        fields=("asset_tag", "model"),
+        label=lambda row: f"{row['asset_tag']} — {row['model'] or 'Device'}",
+        status="AVAILABLE",
+    ),
+    "students": Picker(
+        Student,
+        columns=("last_name", "first_name", "student_id"),
+        fields=("first_name", "last_name", "student_id"),
+        label=lambda row: f"{row['last_name']}, {row['first_name']} ({row['student_id']})",
+        active=True,
+    ),
+    "staff": Picker(
+        Staff,
+        columns=("last_name", "first_name", "email"),
+        fields=("first_name", "last_name", "email"),
+        label=lambda row: f"{row['last_name']}, {row['first_name']} ({row['email']})",
+        active=True,
+    ),
+}
+
+
+def _prefix_queries(picker, user, term):
+    for column in picker.columns:
+        if connection.vendor == "postgresql":
+            queryset = (
+                picker.queryset(user)
+                .alias(_key=Collate(Upper(column), "C"))
+                .filter(_key__startswith=Upper(Value(term)))
+            )
+        else:
+            queryset = (
+                picker.queryset(user)
+                .alias(_key=Upper(column))
+                .filter(_key__gte=Upper(Value(term)), _key__lt=Upper(Value(term + HIGH)))
+            )
+        yield picker.labelled(queryset).order_by("_key", "pk")[:LIMIT]
+
+
+def _merge(picker, batches):
+    # Earlier columns rank first (last name before first name before id).
+    rows = {}
+    for batch in batches:
+        for row in batch:
+            rows.setdefault(row["pk"], row)
+    return [{"id": pk, "label": picker.label(row)} for pk, row in list(rows.items())[:LIMIT]]
+
+
+def autocomplete(user, kind, q):
+    """Up to LIMIT {"id", "label"} matches for q; KeyError for an unknown kind."""
+    picker = PICKERS[kind]
+    return _merge(picker, (list(qs) for qs in _prefix_queries(picker, user, q)))
+
+
+async def aautocomplete(user, kind, q):
+    """Async autocomplete() for the ASGI read path."""
+    picker = PICKERS[kind]
+    batches = [[row async for row in qs] for qs in _prefix_queries(picker, user, q)]
+    return _merge(picker, batches)
@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Student, Device, Checkout
+
+
+# Longest due-today / overdue list rendered on the dashboard.
+DASHBOARD_LIST_LIMIT = 50
+
+
+def _cache_key(user_id):
+    return f"dashboard:{user_id}"
+
+
+def _count(queryset):
+    """Scalar subquery counting the rows of queryset for the outer user."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(created_by=OuterRef("pk"))
+            .order_by()
+            .values("created_by")
+            .annotate(n=Count("pk"))
+            .values("n"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def dashboard_querysets(user, today):
+    """(counters, due today, overdue) querysets behind the dashboard."""
+    open_checkouts = Checkout.objects.filter(returned_at__isnull=True)
+
+    # All five counters in a single query: one scalar subquery per counter
+    # against the user's row.
+    counts = (
+        get_user_model()
+        .objects.filter(pk=user.pk)
+        .annotate(
+            students_count=_count(Student.objects.all()),
+            devices_available=_count(Device.objects.filter(status="AVAILABLE")),
+            devices_out=_count(Device.objects.filter(status="CHECKED_OUT")),
+            due_today_count=_count(open_checkouts.filter(due_back_at=today)),
+            overdue_count=_count(open_checkouts.filter(due_back_at__lt=today)),
+        )
+        .values(
+            "students_count",
+            "devices_available",
+            "devices_out",
+            "due_today_count",
+            "overdue_count",
+        )
+    )
+
+    mine = open_checkouts.filter(created_by=user)
+    due_today = mine.filter(due_back_at=today).order_by("device__asset_tag")
+    overdue = mine.filter(due_back_at__lt=today).order_by("due_back_at", "device__asset_tag")
+    return counts, due_today, overdue
+
+
+def compute_dashboard(user):
+    today = timezone.localdate()
+    counts, due_today, overdue = dashboard_querysets(user, today)
+    data = counts.get()
+    data["due_today"] = list(due_today[:DASHBOARD_LIST_LIMIT])
+    data["overdue"] = list(overdue[:DASHBOARD_LIST_LIMIT])
+    data["date"] = today
+    return data
+
+
+def get_dashboard(user):
+    """
+    Dashboard context for user, cached with a shared cache
+    (DASHBOARD_CACHE_SECONDS); recomputed after invalidation or at midnight.
+    """
+    if settings.DASHBOARD_CACHE_SECONDS <= 0:
+        return compute_dashboard(user)
+    key = _cache_key(user.pk)
+    data = cache.get(key)
+    if data is None or data["date"] != timezone.localdate():
+        data = compute_dashboard(user)
+        cache.set(key, data, settings.DASHBOARD_CACHE_SECONDS)
+    return data
+
+
+async def aget_dashboard(user):
+    """Async get_dashboard() for the ASGI read path."""
+    cached = settings.DASHBOARD_CACHE_SECONDS > 0
+    key = _cache_key(user.pk)
+    data = await cache.aget(key) if cached else None
+    today = timezone.localdate()
+    if data is None or data["date"] != today:
+        counts, due_today, overdue = dashboard_querysets(user, today)
+        data = await counts.aget()
+        data["due_today"] = [c async for c in due_today[:DASHBOARD_LIST_LIMIT]]
+        data["overdue"] = [c async for c in overdue[:DASHBOARD_LIST_LIMIT]]
+        data["date"] = today
+        if cached:
+            await cache.aset(key, data, settings.DASHBOARD_CACHE_SECONDS)
+    return data
+
+
+def invalidate_dashboard(user_id):
+    if user_id is not None and settings.DASHBOARD_CACHE_SECONDS > 0:
+        cache.delete(_cache_key(user_id))
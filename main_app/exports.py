@@ -0,0 +1,110 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .models import ArchivedCheckout, Device, Checkout
+
+
+# Rows are pulled from the database this many at a time.
+CHUNK_SIZE = 2000
+
+# kind -> list of (column header, ORM path). Joined columns are read with
+# values_list(), so every row comes out of the one streaming query.
+EXPORT_COLUMNS = {
+    "devices": [
+        ("asset_tag", "asset_tag"),
+        ("serial_number", "serial_number"),
+        ("manufacturer", "manufacturer"),
+        ("model", "model"),
+        ("status", "status"),
+        ("condition", "condition"),
+        ("purchase_date", "purchase_date"),
+        ("warranty_expires_on", "warranty_expires_on"),
+        ("notes", "notes"),
+    ],
+    "checkouts": [
+        ("id", "pk"),
+        ("asset_tag", "device__asset_tag"),
+        ("serial_number", "device__serial_number"),
+        ("model", "device__model"),
+        ("student_id", "student__student_id"),
+        ("student_first_name", "student__first_name"),
+        ("student_last_name", "student__last_name"),
+        ("grade_level", "student__grade_level"),
+        ("staff_email", "staff__email"),
+        ("staff_first_name", "staff__first_name"),
+        ("staff_last_name", "staff__last_name"),
+        ("checked_out_at", "checked_out_at"),
+        ("due_back_at", "due_back_at"),
+        ("returned_at", "returned_at"),
+        ("condition_out", "condition_out"),
+        ("condition_in", "condition_in"),
+        ("comments", "comments"),
+    ],
+}
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_queryset(kind, user, status=None, start=None, end=None):
+    """
+    The rows to export for user. For devices status is a Device status; for
+    checkouts it is "open" or "returned" and start/end (dates, inclusive)
+    bound checked_out_at.
+    """
+    paths = [path for _, path in EXPORT_COLUMNS[kind]]
+    if kind == "devices":
+        qs = Device.objects.filter(created_by=user).order_by("asset_tag")
+        if status:
+            qs = qs.filter(status=status)
+        return qs.values_list(*paths)
+
+    def checkouts(qs):
+        qs = qs.filter(created_by=user).order_by()
+        if status == "open":
+            qs = qs.filter(returned_at__isnull=True)
+        elif status == "returned":
+            qs = qs.filter(returned_at__isnull=False)
+        if start:
+            qs = qs.filter(checked_out_at__gte=_start_of(start))
+        if end:
+            qs = qs.filter(checked_out_at__lt=_start_of(end + timedelta(days=1)))
+        return qs.values_list(*paths)
+
+    # Archived checkouts are only ever returned ones.
+    if status == "open":
+        return checkouts(Checkout.objects).order_by("pk")
+    return checkouts(Checkout.objects).union(checkouts(ArchivedCheckout.objects), all=True).order_by("pk")
+
+
+def _json(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def _text(value):
+    return "" if value is None else _json(value)
+
+
+class Echo:
+    """File-like object that hands back what is written (for csv.writer)."""
+
+    def write(self, value):
+        return value
+
+
+def stream_rows(kind, queryset, fmt="csv"):
+    """Yield the export as CSV lines or JSON lines, one row at a time."""
+    headers = [name for name, _ in EXPORT_COLUMNS[kind]]
+    rows = queryset.iterator(chunk_size=CHUNK_SIZE)
+    if fmt == "jsonl":
+        for row in rows:
+            yield json.dumps(dict(zip(headers, map(_json, row)))) + "\n"
+    else:
+        writer = csv.writer(Echo())
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow([_text(value) for value in row])
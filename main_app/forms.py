@@ -0,0 +1,108 @@
+from django import forms
+from django.db.models import Q
+from django.urls import reverse
+
+from .autocomplete import PICKERS
+from .models import Checkout, Device
+from .services import UNLENDABLE_STATUSES
+
+
+# ======================
+#  AUTOCOMPLETE WIDGET
+# ======================
+class AutocompleteInput(forms.Widget):
+    """
+    A search box backed by the autocomplete endpoint plus a hidden input for
+    the picked pk. Unlike Select it never iterates the field's queryset;
+    rendering looks up the label of the current value only.
+    """
+
+    template_name = "main_app/widgets/autocomplete.html"
+
+    class Media:
+        js = ["js/autocomplete.js"]
+
+    def __init__(self, kind, attrs=None):
+        super().__init__(attrs)
+        self.kind = kind
+        # Set by ModelChoiceField to an iterator over its queryset.
+        self.choices = ()
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"]["url"] = reverse("autocomplete", args=[self.kind])
+        context["widget"]["label"] = self.label_for(value)
+        return context
+
+    def label_for(self, value):
+        queryset = getattr(self.choices, "queryset", None)
+        if value in (None, "") or queryset is None:
+            return ""
+        picker = PICKERS[self.kind]
+        try:
+            row = picker.labelled(queryset.filter(pk=value)).first()
+        except (TypeError, ValueError):
+            return ""
+        return picker.label(row) if row else ""
+
+
+# ======================
+#  CHECKOUT FORMS
+# ======================
+class CheckoutForm(forms.ModelForm):
+    """
+    Checkout form with autocomplete pickers, limited to the user's devices
+    and active borrowers. Validating a pick is a single get() on that
+    queryset, never a load of the whole table.
+    """
+
+    class Meta:
+        model = Checkout
+        fields = [
+            "device",
+            "student",
+            "staff",
+            "due_back_at",
+            "condition_out",
+            "comments",
+        ]
+        widgets = {
+            "device": AutocompleteInput("devices"),
+            "student": AutocompleteInput("students"),
+            "staff": AutocompleteInput("staff"),
+        }
+
+    def __init__(self, *args, user, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Devices out on another checkout are left to
+        # unique_open_checkout_per_device, whose error says why; ones in
+        # repair, lost or retired can't be lent at all, as in bulk checkout.
+        # The picker only offers available devices.
+        devices = Device.objects.filter(created_by=user)
+        lendable = ~Q(status__in=UNLENDABLE_STATUSES)
+        if self.instance.device_id is not None:
+            # Keep the saved device valid even if it has gone to repair since.
+            lendable |= Q(pk=self.instance.device_id)
+        self.fields["device"].queryset = devices.filter(lendable)
+        for name in ("student", "staff"):
+            picker = PICKERS[self.fields[name].widget.kind]
+            queryset = picker.queryset(user)
+            current = getattr(self.instance, f"{name}_id", None)
+            if current is not None:
+                # Keep the saved borrower valid even if they've left since.
+                queryset = picker.model.objects.filter(Q(**picker.filters) | Q(pk=current), created_by=user)
+            self.fields[name].queryset = queryset
+
+
+class CheckoutUpdateForm(CheckoutForm):
+    class Meta(CheckoutForm.Meta):
+        fields = [
+            "device",
+            "student",
+            "staff",
+            "due_back_at",
+            "returned_at",
+            "condition_out",
+            "condition_in",
+            "comments",
+        ]
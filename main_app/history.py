@@ -0,0 +1,120 @@
+"""
+Hot/cold split for checkouts: returned checkouts older than
+CHECKOUT_ARCHIVE_DAYS move to ArchivedCheckout, so the live table (and its
+partial unique index and the dashboard queries) only carries recent rows.
+Pages that show history read both tables through LiveAndArchived, and
+device timelines read DeviceEvent and ArchivedDeviceEvent the same way.
+"""
+from operator import attrgetter
+
+from django.db import connection, transaction
+
+from .models import ArchivedCheckout, ArchivedDeviceEvent, Checkout, Device, DeviceEvent, OverdueNotice
+
+
+# Rows moved per transaction.
+ARCHIVE_BATCH_SIZE = 2000
+
+
+# ======================
+#  READING
+# ======================
+class LiveAndArchived:
+    """
+    Live and archived rows (checkouts or device events) read as one sequence. It supports what the
+    keyset paginator uses (filter, order_by, [:n]); every slice runs the same
+    indexed query against both tables and merges the two short results.
+    """
+
+    def __init__(self, live, archived, ordering=()):
+        self.live = live
+        self.archived = archived
+        self.ordering = ordering
+
+    @property
+    def model(self):
+        return self.live.model
+
+    def filter(self, *args, **kwargs):
+        return LiveAndArchived(
+            self.live.filter(*args, **kwargs), self.archived.filter(*args, **kwargs), self.ordering
+        )
+
+    def order_by(self, *fields):
+        return LiveAndArchived(self.live.order_by(*fields), self.archived.order_by(*fields), fields)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.start or key.step:
+            raise TypeError("LiveAndArchived only supports [:n] slices.")
+        return HistorySlice(self, key.stop)
+
+
+class HistorySlice:
+    def __init__(self, history, limit):
+        self.history = history
+        self.limit = limit
+
+    def merge(self, rows):
+        for field in reversed(self.history.ordering):
+            rows.sort(key=attrgetter(field.lstrip("-")), reverse=field.startswith("-"))
+        return rows[: self.limit]
+
+    def __iter__(self):
+        rows = list(self.history.live[: self.limit]) + list(self.history.archived[: self.limit])
+        return iter(self.merge(rows))
+
+    async def __aiter__(self):
+        rows = [row async for row in self.history.live[: self.limit]]
+        rows += [row async for row in self.history.archived[: self.limit]]
+        for row in self.merge(rows):
+            yield row
+
+
+def checkout_history(user):
+    return LiveAndArchived(
+        Checkout.objects.filter(created_by=user), ArchivedCheckout.objects.filter(created_by=user)
+    )
+
+
+def device_timeline(user, device_id):
+    return LiveAndArchived(
+        DeviceEvent.objects.filter(device_id=device_id, device__created_by=user),
+        ArchivedDeviceEvent.objects.filter(device_id=device_id, device__created_by=user),
+    )
+
+
+# ======================
+#  ARCHIVING
+# ======================
+def archive_checkouts(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move checkouts returned before cutoff into ArchivedCheckout, oldest
+    first, one short transaction per batch. Returns the number moved.
+    """
+    fields = [field.attname for field in Checkout._meta.concrete_fields]
+    due = (
+        Checkout.objects.filter(returned_at__lt=cutoff)
+        .order_by("returned_at", "id")
+        .select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+    )
+    table = connection.ops.quote_name(Checkout._meta.db_table)
+
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(due.values(*fields)[:batch_size])
+            if not rows:
+                return moved
+            ids = [row["id"] for row in rows]
+            ArchivedCheckout.objects.bulk_create(ArchivedCheckout(**row) for row in rows)
+            # Reminders only matter while a checkout is open.
+            OverdueNotice.objects.filter(checkout_id__in=ids).delete()
+            Device.objects.filter(current_checkout__in=ids).update(
+                current_checkout=None, current_borrower=""
+            )
+            # Plain DELETE: the rows still exist (archived), so none of the
+            # per-instance delete signals (event log, caches) should fire.
+            with connection.cursor() as cursor:
+                placeholders = ", ".join(["%s"] * len(ids))
+                cursor.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", ids)
+        moved += len(rows)
@@ -0,0 +1,158 @@
+"""
+Small asyncio HTTP load generator used by the server benchmarks. It needs
+nothing beyond the standard library so it runs fully offline.
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+
+# ======================
+#  HTTP CLIENT
+# ======================
+async def request(host, port, path, cookies=None, method="GET", body=b"", headers=None, slow_read=0.0):
+    """
+    Make one HTTP/1.1 request on a fresh connection and return
+    (status, response headers, response body). Header names are lower-cased
+    and repeated headers (Set-Cookie) kept in order. slow_read sleeps
+    between 1 KB reads to imitate a client on a slow network.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    lines = [f"{method} {path} HTTP/1.1", f"Host: {host}:{port}", "Connection: close"]
+    if cookies:
+        lines.append("Cookie: " + "; ".join(f"{k}={v}" for k, v in cookies.items()))
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    if body:
+        lines.append(f"Content-Length: {len(body)}")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+
+    chunks = []
+    while True:
+        chunk = await reader.read(1024)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if slow_read:
+            await asyncio.sleep(slow_read)
+    writer.close()
+    raw = b"".join(chunks)
+    head, _, content = raw.partition(b"\r\n\r\n")
+    if not head:
+        return 0, [], content
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    response_headers = []
+    for line in header_lines:
+        name, _, value = line.partition(":")
+        response_headers.append((name.strip().lower(), value.strip()))
+    return int(status_line.split(" ", 2)[1]), response_headers, content
+
+
+async def fetch(host, port, path, cookies=None, method="GET", body=b"", headers=None, slow_read=0.0):
+    """request() without the headers: (status, response body)."""
+    status, _, content = await request(host, port, path, cookies, method, body, headers, slow_read)
+    return status, content
+
+
+def response_cookies(headers):
+    """name -> value for each Set-Cookie header (expired ones included)."""
+    cookies = {}
+    for name, value in headers:
+        if name == "set-cookie":
+            pair = value.split(";", 1)[0]
+            key, _, val = pair.partition("=")
+            cookies[key.strip()] = val.strip().strip('"')
+    return cookies
+
+
+# ======================
+#  STATS
+# ======================
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    """latencies in seconds -> dict of throughput and ms percentiles."""
+    total = len(latencies) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def find_knee(steps, p95_budget_ms, max_error_rate):
+    """
+    steps: summarize() results with a "concurrency" key, in increasing
+    concurrency. The knee is the last step that kept p95 within budget and
+    errors under max_error_rate before the first one that did not; None if
+    even the first step broke down.
+    """
+    knee = None
+    for step in steps:
+        if step["p95_ms"] > p95_budget_ms or step["error_rate"] > max_error_rate:
+            break
+        knee = step
+    return knee
+
+
+# ======================
+#  SERVERS
+# ======================
+SERVER_MODES = {
+    "wsgi": (["config.wsgi"], {}),
+    "asgi": (
+        ["config.asgi:application", "-k", "uvicorn_worker.UvicornWorker"],
+        {"ASYNC_READ_VIEWS": "1"},
+    ),
+}
+
+
+def start_server(mode, port, workers=1, extra_env=None):
+    """Start gunicorn in the given mode on 127.0.0.1:port and wait for it."""
+    app_args, env = SERVER_MODES[mode]
+    env = {**os.environ, **env, **(extra_env or {})}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", *app_args, "-w", str(workers), "-b", f"127.0.0.1:{port}"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{mode} server exited with {process.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"{mode} server did not start on port {port}")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def split_url(url):
+    parts = urlsplit(url)
+    return parts.hostname, parts.port or 80
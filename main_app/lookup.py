@@ -0,0 +1,169 @@
+"""
+Scanner lookups: asset tag or serial number -> device, status and open
+checkout, served from a bounded per-process LRU cache.
+
+Each cached entry remembers the version of its device in the shared cache.
+Every write to a device or its checkouts gives the device a new version
+(see invalidate_lookups), so a hit is only served while it is still current.
+That needs a cache every worker shares, so without REDIS_URL the LRU is
+off (LOOKUP_CACHE_SIZE is 0) and every lookup reads the database.
+"""
+import threading
+from collections import OrderedDict
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Device, Checkout
+from .replicas import use_primary
+
+
+class LRUCache:
+    """Thread-safe dict that drops the least recently used key past maxsize."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# (user id, scanned code) -> (device id, version, payload)
+lookup_cache = LRUCache(settings.LOOKUP_CACHE_SIZE)
+
+
+def _version_key(device_id):
+    return f"lookup:device:{device_id}"
+
+
+def _new_version():
+    return uuid4().hex
+
+
+def _matching(code):
+    # Only the unique asset_tag/serial_number indexes; adding created_by to
+    # the WHERE makes SQLite pick device_owner_tag_idx and scan the user's
+    # devices. At most two rows match, so ownership is checked in Python.
+    return Device.objects.filter(Q(asset_tag=code) | Q(serial_number=code)).order_by().values_list(
+        "pk", "created_by_id"
+    )
+
+
+def _owned(user, matches):
+    return next((pk for pk, owner_id in matches if owner_id == user.pk), None)
+
+
+def _open_checkout(device_id):
+    return Checkout.objects.filter(device_id=device_id, returned_at__isnull=True)
+
+
+def _payload(device, checkout):
+    data = {
+        "device": {
+            "id": device.pk,
+            "asset_tag": device.asset_tag,
+            "serial_number": device.serial_number,
+            "manufacturer": device.manufacturer,
+            "model": device.model,
+            "status": device.status,
+            "condition": device.condition,
+            "url": device.get_absolute_url(),
+        },
+        "checkout": None,
+    }
+    if checkout is not None:
+        data["checkout"] = {
+            "id": checkout.pk,
+            "borrower": str(checkout.borrower),
+            "borrower_type": "student" if checkout.student_id else "staff",
+            "checked_out_at": checkout.checked_out_at.isoformat(),
+            "due_back_at": checkout.due_back_at.isoformat() if checkout.due_back_at else None,
+            "url": checkout.get_absolute_url(),
+        }
+    return data
+
+
+def lookup_device(user, code):
+    """Lookup payload for the user's device with this asset tag or serial, or None."""
+    key = (user.pk, code)
+    cached = lookup_cache.maxsize > 0
+    entry = lookup_cache.get(key) if cached else None
+    if entry is not None and cache.get(_version_key(entry[0])) == entry[1]:
+        return entry[2]
+
+    # The primary: a lagging replica could cache old rows under a new version.
+    with use_primary():
+        device_id = _owned(user, _matching(code))
+        if device_id is None:
+            return None
+        if cached:
+            # Read the version before the rows, so a write that lands in
+            # between leaves this entry already out of date rather than stale.
+            cache.add(_version_key(device_id), _new_version(), None)
+            version = cache.get(_version_key(device_id))
+        device = Device.objects.get(pk=device_id)
+        payload = _payload(device, _open_checkout(device_id).first())
+    if cached:
+        lookup_cache.set(key, (device_id, version, payload))
+    return payload
+
+
+async def alookup_device(user, code):
+    """Async lookup_device() for the ASGI read path."""
+    key = (user.pk, code)
+    cached = lookup_cache.maxsize > 0
+    entry = lookup_cache.get(key) if cached else None
+    if entry is not None and await cache.aget(_version_key(entry[0])) == entry[1]:
+        return entry[2]
+
+    with use_primary():
+        device_id = _owned(user, [row async for row in _matching(code)])
+        if device_id is None:
+            return None
+        if cached:
+            await cache.aadd(_version_key(device_id), _new_version(), None)
+            version = await cache.aget(_version_key(device_id))
+        device = await Device.objects.aget(pk=device_id)
+        payload = _payload(device, await _open_checkout(device_id).afirst())
+    if cached:
+        lookup_cache.set(key, (device_id, version, payload))
+    return payload
+
+
+def invalidate_lookups(device_ids):
+    """
+    Retire cached lookups of these devices now and again on commit, so a
+    lookup that read the rows before the commit can't keep serving them.
+    """
+    device_ids = [pk for pk in device_ids if pk is not None]
+    if not device_ids or lookup_cache.maxsize <= 0:
+        return
+
+    def bump():
+        cache.set_many({_version_key(pk): _new_version() for pk in device_ids}, None)
+
+    bump()
+    transaction.on_commit(bump)
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from main_app.history import ARCHIVE_BATCH_SIZE, archive_checkouts
+from main_app.models import Checkout
+
+
+class Command(BaseCommand):
+    help = (
+        "Move checkouts returned more than --days ago (CHECKOUT_ARCHIVE_DAYS) into the "
+        "archive table in small batches. Safe to run while the app is serving."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.CHECKOUT_ARCHIVE_DAYS)
+        parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Only count what would move.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        if options["dry_run"]:
+            count = Checkout.objects.filter(returned_at__lt=cutoff).count()
+            self.stdout.write(f"{count} checkouts returned before {cutoff:%Y-%m-%d} would be archived")
+            return
+        moved = archive_checkouts(cutoff, options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"archived {moved} checkouts returned before {cutoff:%Y-%m-%d}"))
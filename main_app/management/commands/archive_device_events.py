@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from main_app.models import ArchivedDeviceEvent, DeviceEvent
+
+
+class Command(BaseCommand):
+    help = "Move device events older than --days into the archive table, oldest first, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        fields = [field.attname for field in DeviceEvent._meta.concrete_fields]
+        old = DeviceEvent.objects.filter(created_at__lt=cutoff).order_by("created_at", "id")
+
+        moved = 0
+        while True:
+            # Short transactions: writers are never blocked for long.
+            with transaction.atomic():
+                rows = list(old.values(*fields)[: options["batch_size"]])
+                if not rows:
+                    break
+                ArchivedDeviceEvent.objects.bulk_create(ArchivedDeviceEvent(**row) for row in rows)
+                DeviceEvent.objects.filter(pk__in=[row["id"] for row in rows]).delete()
+            moved += len(rows)
+        self.stdout.write(self.style.SUCCESS(f"archived {moved} events older than {cutoff:%Y-%m-%d}"))
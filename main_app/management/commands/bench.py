@@ -0,0 +1,325 @@
+import json
+import statistics
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from main_app.auth import cached_auth
+from main_app.dashboard import invalidate_dashboard
+from main_app.models import Student, Device, Checkout, DeviceEvent
+from main_app.pagination import encode_cursor
+
+
+# name -> (query budget, latency budget in ms for the median run)
+# Session and user come from the cache, so only the views' own queries count.
+BUDGETS = {
+    "dashboard": (3, 150),
+    "device-list": (1, 150),
+    "device-list-deep": (1, 150),
+    # Searches first fetch the ids of up to 1,000 matches to rank outright.
+    # device-search looks for the tail of one serial number. -broad looks for
+    # a fragment every one of the user's seeded serials shares, so it also
+    # checks for rows to rank and then pages through the matches unranked.
+    "device-search": (2, 20),
+    "device-search-broad": (3, 150),
+    "student-list": (1, 150),
+    "student-search": (2, 150),
+    "checkout-list": (2, 250),
+    "device-detail": (2, 50),
+    "device-lookup": (3, 20),
+    "device-timeline": (2, 50),
+    "checkout-form": (0, 50),
+    "autocomplete": (3, 50),
+    "checkout-create": (7, 100),
+    "checkout-return": (8, 100),
+    "analytics": (2, 100),
+    # Row estimate, page, and an exact count only when the table is small.
+    "admin-checkouts": (3, 250),
+    "admin-search": (2, 100),
+    "admin-add": (1, 50),
+    "admin-devices": (3, 250),
+    "admin-events": (3, 250),
+}
+ADMIN_USER = "bench-admin"
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the main views against the current database (seed it with "
+        "`manage.py seed_bench`), write the results as JSON and fail on "
+        "query/latency budgets or regressions against a baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", default="bench1")
+        parser.add_argument("--repeat", type=int, default=7)
+        parser.add_argument("--output", help="Defaults to benchmarks/<vendor>.json.")
+        parser.add_argument("--baseline", help="Earlier results to compare against.")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.5,
+            help="Allowed slowdown against the baseline median (0.5 = 50%%).",
+        )
+        parser.add_argument("--only", nargs="*", choices=sorted(BUDGETS))
+
+    def handle(self, *args, **options):
+        # Budgets are for the deployed setup, where sessions and users are
+        # cached (REDIS_URL); a local cache stands in for Redis here.
+        with cached_auth():
+            caches[settings.SESSION_CACHE_ALIAS].clear()
+            self.measure_all(options)
+
+    def measure_all(self, options):
+        # Read the baseline first: it is usually the file this run writes.
+        baseline = None
+        if options["baseline"]:
+            baseline = json.loads(Path(options["baseline"]).read_text())["results"]
+        try:
+            self.user = get_user_model().objects.get(username=options["user"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user {options['user']!r}; run `manage.py seed_bench` first.")
+        self.client = Client()
+        self.client.force_login(self.user)
+        # Like any request after the login one: session and user cached.
+        self.get(reverse("device-list"))
+        admin, _ = get_user_model().objects.get_or_create(
+            username=ADMIN_USER, defaults={"is_staff": True, "is_superuser": True}
+        )
+        self.admin_client = Client()
+        self.admin_client.force_login(admin)
+        self.get(reverse("admin:index"), self.admin_client)
+        self.prepare()
+
+        results = {}
+        for name in options["only"] or BUDGETS:
+            queries = self.count_queries(name)
+            timings = [self.time(name) for _ in range(options["repeat"])]
+            results[name] = {
+                "queries": queries,
+                "median_ms": round(statistics.median(timings), 2),
+                "max_ms": round(max(timings), 2),
+            }
+            self.stdout.write(
+                f"{name:<18} {queries:>3} queries  "
+                f"median {results[name]['median_ms']:>8.2f} ms  max {results[name]['max_ms']:>8.2f} ms"
+            )
+
+        report = {
+            "vendor": connection.vendor,
+            "rows": {
+                "devices": Device.objects.count(),
+                "students": Student.objects.count(),
+                "checkouts": Checkout.objects.count(),
+            },
+            "results": results,
+        }
+        output = Path(options["output"] or Path(settings.BASE_DIR) / "benchmarks" / f"{connection.vendor}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2) + "\n")
+        self.stdout.write(f"wrote {output}")
+
+        failures = self.check_budgets(results)
+        if baseline is not None:
+            failures += self.check_baseline(results, baseline, options["tolerance"])
+        if failures:
+            raise CommandError("\n".join(failures))
+        self.stdout.write(self.style.SUCCESS("all views within budget"))
+
+    # ----------------------
+    #  measurement
+    # ----------------------
+    def run(self, name, measure):
+        # before_/after_ hooks set up and undo state outside the measurement.
+        method = name.replace("-", "_")
+        getattr(self, "before_" + method, lambda: None)()
+        with measure():
+            getattr(self, "bench_" + method)()
+        getattr(self, "after_" + method, lambda: None)()
+
+    def count_queries(self, name):
+        counter = QueryCounter(connection)
+        self.run(name, lambda: counter)
+        return counter.count
+
+    def time(self, name):
+        timer = Timer()
+        self.run(name, lambda: timer)
+        return timer.ms
+
+    def check_budgets(self, results):
+        failures = []
+        for name, result in results.items():
+            max_queries, max_ms = BUDGETS[name]
+            if result["queries"] > max_queries:
+                failures.append(f"{name}: {result['queries']} queries (budget {max_queries})")
+            if result["median_ms"] > max_ms:
+                failures.append(f"{name}: {result['median_ms']} ms (budget {max_ms} ms)")
+        return failures
+
+    def check_baseline(self, results, baseline, tolerance):
+        failures = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if not before:
+                continue
+            if result["queries"] > before["queries"]:
+                failures.append(f"{name}: {result['queries']} queries (baseline {before['queries']})")
+            if result["median_ms"] > before["median_ms"] * (1 + tolerance):
+                failures.append(f"{name}: {result['median_ms']} ms (baseline {before['median_ms']} ms)")
+        return failures
+
+    # ----------------------
+    #  views
+    # ----------------------
+    def prepare(self):
+        devices = Device.objects.filter(created_by=self.user)
+        self.device = devices.order_by("pk").first()
+        self.spare_device = devices.filter(status="AVAILABLE").order_by("-pk").first()
+        self.student = Student.objects.filter(created_by=self.user).order_by("pk").first()
+        if not (self.device and self.spare_device and self.student):
+            raise CommandError(f"{self.user} has no seeded devices/students.")
+        # A cursor roughly in the middle of the device list.
+        middle = devices.count() // 2
+        self.deep_tag = devices.order_by("asset_tag").values_list("asset_tag", flat=True)[middle]
+        # Seeded serials are the username, "SN", random hex and a counter: the
+        # tail picks out one device, the head matches all of the user's.
+        self.partial_serial = self.device.serial_number[-7:]
+        self.shared_serial = self.device.serial_number[2:9]
+        # Not the spare device: the checkout benches add events to it, so it
+        # would become the busiest one after a run or two.
+        self.busiest_device = (
+            DeviceEvent.objects.filter(device__created_by=self.user)
+            .exclude(device=self.spare_device)
+            .values("device")
+            .annotate(n=Count("pk"))
+            .order_by("-n")
+            .values_list("device", flat=True)
+            .first()
+        ) or self.device.pk
+
+    def before_dashboard(self):
+        invalidate_dashboard(self.user.pk)
+
+    def bench_dashboard(self):
+        self.get(reverse("dashboard"))
+
+    def bench_device_list(self):
+        self.get(reverse("device-list"))
+
+    def bench_device_list_deep(self):
+        cursor = encode_cursor(Device(asset_tag=self.deep_tag), ("asset_tag",))
+        self.get(reverse("device-list") + f"?after={cursor}")
+
+    def bench_device_search(self):
+        self.get(reverse("device-list") + f"?q={self.partial_serial}")
+
+    def bench_device_search_broad(self):
+        self.get(reverse("device-list") + f"?q={self.shared_serial}")
+
+    def bench_student_list(self):
+        self.get(reverse("student-list"))
+
+    def bench_student_search(self):
+        self.get(reverse("student-list") + f"?q={self.student.student_id[-5:]}")
+
+    def bench_checkout_list(self):
+        self.get(reverse("checkout-list"))
+
+    def bench_analytics(self):
+        self.get(reverse("analytics"))
+
+    def bench_device_detail(self):
+        self.get(reverse("device-detail", args=[self.device.pk]))
+
+    def bench_device_lookup(self):
+        # Counted cold; with REDIS_URL the timed repeats come from the LRU cache.
+        self.get(reverse("device-lookup") + f"?code={self.device.serial_number}")
+
+    def bench_device_timeline(self):
+        self.get(reverse("device-timeline", args=[self.busiest_device]))
+
+    def bench_checkout_form(self):
+        self.get(reverse("checkout-create"))
+
+    def bench_autocomplete(self):
+        # Student pickers search three columns, one query each.
+        self.get(reverse("autocomplete", args=["students"]) + f"?q={self.student.last_name[:4]}")
+
+    def bench_checkout_create(self):
+        self.post(
+            reverse("checkout-create"),
+            {"device": self.spare_device.pk, "student": self.student.pk, "condition_out": "GOOD"},
+        )
+
+    def after_checkout_create(self):
+        self.open_checkout = Checkout.objects.get(device=self.spare_device, returned_at__isnull=True)
+        self.bench_checkout_return()
+
+    def before_checkout_return(self):
+        self.bench_checkout_create()
+        self.open_checkout = Checkout.objects.get(device=self.spare_device, returned_at__isnull=True)
+
+    def bench_checkout_return(self):
+        self.post(
+            reverse("checkout-update", args=[self.open_checkout.pk]),
+            {
+                "device": self.spare_device.pk,
+                "student": self.student.pk,
+                "returned_at": timezone.now().strftime("%Y-%m-%d %H:%M"),
+                "condition_out": "GOOD",
+                "condition_in": "GOOD",
+            },
+        )
+
+    def bench_admin_checkouts(self):
+        self.get(reverse("admin:main_app_checkout_changelist"), self.admin_client)
+
+    def bench_admin_search(self):
+        self.get(reverse("admin:main_app_checkout_changelist") + f"?q={self.device.asset_tag}", self.admin_client)
+
+    def bench_admin_add(self):
+        self.get(reverse("admin:main_app_checkout_add"), self.admin_client)
+
+    def bench_admin_devices(self):
+        self.get(reverse("admin:main_app_device_changelist"), self.admin_client)
+
+    def bench_admin_events(self):
+        self.get(reverse("admin:main_app_deviceevent_changelist"), self.admin_client)
+
+    def get(self, url, client=None):
+        response = (client or self.client).get(url)
+        if response.status_code != 200:
+            raise CommandError(f"GET {url} returned {response.status_code}")
+
+    def post(self, url, data):
+        response = self.client.post(url, data)
+        if response.status_code != 302:
+            raise CommandError(f"POST {url} returned {response.status_code}")
+
+
+class QueryCounter(CaptureQueriesContext):
+    def __exit__(self, *exc):
+        super().__exit__(*exc)
+        # Read the log now: the next test-client request resets it. Savepoints
+        # depend on the caller's transaction, not on the view, so skip them.
+        self.count = sum(1 for q in self.captured_queries if "SAVEPOINT" not in q["sql"])
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.ms = (time.perf_counter() - self.start) * 1000
@@ -0,0 +1,181 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.utils import timezone
+
+from config.database import PROFILES
+from main_app.models import Checkout, Device, Student
+from main_app.services import bulk_check_in, bulk_check_out
+
+
+WORKER_USER = "concurrency"
+DEVICES_PER_THREAD = 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer a fresh SQLite database with parallel checkouts and returns from "
+        "several processes under each DB_PROFILE and compare throughput and "
+        "'database is locked' errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", nargs="*", choices=PROFILES, default=list(PROFILES))
+        parser.add_argument("--processes", type=int, default=4)
+        parser.add_argument("--threads", type=int, default=2, help="Per process.")
+        parser.add_argument("--seconds", type=float, default=5)
+        parser.add_argument("--output", help="Defaults to benchmarks/concurrency.json.")
+        # Internal: what the child processes run.
+        parser.add_argument("--setup", action="store_true", help=argparse.SUPPRESS)
+        parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options["setup"]:
+            return self.setup(options)
+        if options["worker"] is not None:
+            return self.work(options)
+
+        results = {}
+        for profile in options["profiles"]:
+            with tempfile.TemporaryDirectory() as tmp:
+                results[profile] = self.run_profile(profile, Path(tmp) / "bench.sqlite3", options)
+            r = results[profile]
+            self.stdout.write(
+                f"{profile:<6} {r['ops_per_second']:>8.1f} checkouts/s  "
+                f"locked {r['lock_errors']:>4}  other errors {r['errors']}"
+            )
+
+        output = Path(options["output"] or Path(settings.BASE_DIR) / "benchmarks" / "concurrency.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        report = {
+            "processes": options["processes"],
+            "threads": options["threads"],
+            "seconds": options["seconds"],
+            "results": results,
+        }
+        output.write_text(json.dumps(report, indent=2) + "\n")
+        self.stdout.write(f"wrote {output}")
+
+        if results.get("tuned", {}).get("lock_errors"):
+            raise CommandError(f"tuned profile hit {results['tuned']['lock_errors']} lock errors")
+
+    # ----------------------
+    #  parent
+    # ----------------------
+    def run_profile(self, profile, path, options):
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": "config.settings",
+            "DATABASE_URL": f"sqlite:///{path}",
+            "DB_PROFILE": profile,
+        }
+        env.pop("REPLICA_DATABASE_URL", None)
+        manage = [sys.executable, str(Path(settings.BASE_DIR) / "manage.py")]
+        counts = ["--processes", str(options["processes"]), "--threads", str(options["threads"])]
+        subprocess.run(manage + ["migrate", "-v0"], env=env, check=True, capture_output=True)
+        subprocess.run(manage + ["bench_concurrency", "--setup", *counts], env=env, check=True)
+
+        workers = [
+            subprocess.Popen(
+                manage
+                + ["bench_concurrency", "--worker", str(n), *counts, "--seconds", str(options["seconds"])],
+                env=env,
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+            for n in range(options["processes"])
+        ]
+        totals = {"ops": 0, "lock_errors": 0, "errors": 0, "elapsed": 0.0}
+        for worker in workers:
+            out, _ = worker.communicate()
+            if worker.returncode:
+                raise CommandError(f"{profile} worker exited with {worker.returncode}")
+            result = json.loads(out.strip().splitlines()[-1])
+            for key in ("ops", "lock_errors", "errors"):
+                totals[key] += result[key]
+            totals["elapsed"] = max(totals["elapsed"], result["elapsed"])
+        totals["ops_per_second"] = round(totals["ops"] / totals["elapsed"], 1) if totals["elapsed"] else 0.0
+        totals["elapsed"] = round(totals["elapsed"], 2)
+        return totals
+
+    # ----------------------
+    #  children
+    # ----------------------
+    def setup(self, options):
+        user = get_user_model().objects.create_user(WORKER_USER)
+        Student.objects.create(
+            first_name="Load", last_name="Test", student_id="LOAD-1", grade_level="5", created_by=user
+        )
+        Device.objects.bulk_create(
+            Device(asset_tag=tag, serial_number=f"SN-{tag}", created_by=user)
+            for worker in range(options["processes"])
+            for thread in range(options["threads"])
+            for tag in self.tags(worker, thread)
+        )
+
+    def tags(self, worker, thread):
+        return [f"CC-{worker}-{thread}-{n}" for n in range(DEVICES_PER_THREAD)]
+
+    def work(self, options):
+        user = get_user_model().objects.get(username=WORKER_USER)
+        student = Student.objects.get(created_by=user)
+        counts = {"ops": 0, "lock_errors": 0, "errors": 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options["seconds"]
+
+        def run(thread):
+            devices = list(Device.objects.filter(asset_tag__in=self.tags(options["worker"], thread)))
+            done = Counter()
+            n = 0
+            while time.monotonic() < deadline:
+                device = devices[n % len(devices)]
+                n += 1
+                try:
+                    self.cycle(user, device, student)
+                    done["ops"] += 1
+                except OperationalError as exc:
+                    done["lock_errors" if "locked" in str(exc) else "errors"] += 1
+                except ValidationError:
+                    # Left open by a failed return; close it and move on.
+                    done["errors"] += 1
+                    Checkout.objects.filter(device=device, returned_at__isnull=True).update(
+                        returned_at=timezone.now()
+                    )
+            connection.close()
+            with lock:
+                for key, value in done.items():
+                    counts[key] += value
+
+        start = time.monotonic()
+        threads = [threading.Thread(target=run, args=(t,)) for t in range(options["threads"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counts["elapsed"] = time.monotonic() - start
+        self.stdout.write(json.dumps(counts))
+
+    def cycle(self, user, device, student):
+        """
+        A one-device cart checkout, a dashboard-style read and the return,
+        through the same services as the scanner views. Both transactions
+        read before they write, which is where stock SQLite gives up.
+        """
+        checked_out = bulk_check_out(user, [(device.asset_tag, student.student_id)])
+        Device.objects.filter(created_by=user, status="CHECKED_OUT").count()
+        returned = bulk_check_in(user, [device.asset_tag])
+        if checked_out[0]["result"] != "ok" or returned[0]["result"] != "ok":
+            raise ValidationError(f"{device.asset_tag}: {checked_out[0]} {returned[0]}")
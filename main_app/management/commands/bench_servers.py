@@ -0,0 +1,95 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from main_app.loadtest import SERVER_MODES, fetch, start_server, stop_server, summarize
+
+
+READ_PATHS = ["dashboard", "device-list", "student-list", "checkout-list"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the read views under the sync (WSGI) and async (ASGI) deployment "
+        "modes against the current database and compare throughput and tail "
+        "latency with many concurrent, slow-reading clients."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", default="bench1")
+        parser.add_argument("--modes", nargs="*", choices=sorted(SERVER_MODES), default=["wsgi", "asgi"])
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument(
+            "--slow-read-ms",
+            type=float,
+            default=20,
+            help="Pause between 1 KB reads on every client connection.",
+        )
+        parser.add_argument("--port", type=int, default=8701)
+        parser.add_argument("--output", help="Defaults to benchmarks/servers.json.")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options["user"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user {options['user']!r}; run `manage.py seed_bench` first.")
+        client = Client()
+        client.force_login(user)
+        cookies = {settings.SESSION_COOKIE_NAME: client.cookies[settings.SESSION_COOKIE_NAME].value}
+        paths = [reverse(name) for name in READ_PATHS]
+
+        results = {}
+        for offset, mode in enumerate(options["modes"]):
+            port = options["port"] + offset
+            process = start_server(mode, port)
+            try:
+                results[mode] = asyncio.run(
+                    self.load(port, paths, cookies, options)
+                )
+            finally:
+                stop_server(process)
+            r = results[mode]
+            self.stdout.write(
+                f"{mode:<5} {r['rps']:>8.1f} req/s  p50 {r['p50_ms']:>8.1f} ms  "
+                f"p95 {r['p95_ms']:>8.1f} ms  errors {r['errors']}"
+            )
+
+        output = Path(options["output"] or Path(settings.BASE_DIR) / "benchmarks" / "servers.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        report = {
+            "concurrency": options["concurrency"],
+            "slow_read_ms": options["slow_read_ms"],
+            "results": results,
+        }
+        output.write_text(json.dumps(report, indent=2) + "\n")
+        self.stdout.write(f"wrote {output}")
+
+    async def load(self, port, paths, cookies, options):
+        remaining = iter(range(options["requests"]))
+        latencies, errors = [], 0
+        slow_read = options["slow_read_ms"] / 1000
+
+        async def worker():
+            nonlocal errors
+            for n in remaining:
+                start = time.perf_counter()
+                try:
+                    status, _ = await fetch("127.0.0.1", port, paths[n % len(paths)], cookies, slow_read=slow_read)
+                except OSError:
+                    status = 0
+                if status == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(options["concurrency"])))
+        return summarize(latencies, errors, time.perf_counter() - start)
@@ -0,0 +1,46 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from main_app.exports import EXPORT_COLUMNS, export_queryset, stream_rows
+from main_app.replicas import use_replica
+
+
+class Command(BaseCommand):
+    help = "Stream a user's devices or checkout history as CSV or JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(EXPORT_COLUMNS))
+        parser.add_argument("--user", required=True)
+        parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+        parser.add_argument("--status", help="Device status, or open/returned for checkouts.")
+        parser.add_argument("--start", help="First checkout date (YYYY-MM-DD).")
+        parser.add_argument("--end", help="Last checkout date (YYYY-MM-DD).")
+        parser.add_argument("--output", help="File to write; defaults to stdout.")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options["user"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user named {options['user']!r}.")
+        dates = {}
+        for name in ("start", "end"):
+            if options[name]:
+                try:
+                    dates[name] = parse_date(options[name])
+                except ValueError:
+                    dates[name] = None
+                if dates[name] is None:
+                    raise CommandError(f"--{name} must be YYYY-MM-DD.")
+
+        queryset = export_queryset(options["kind"], user, status=options["status"], **dates)
+        out = open(options["output"], "w", newline="", encoding="utf-8") if options["output"] else sys.stdout
+        try:
+            with use_replica():
+                for chunk in stream_rows(options["kind"], queryset, options["format"]):
+                    out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
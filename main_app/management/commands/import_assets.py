@@ -0,0 +1,225 @@
+import csv
+import json
+from contextlib import nullcontext
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from main_app.dashboard import invalidate_dashboard
+from main_app.lookup import invalidate_lookups
+from main_app.models import Device, DeviceEvent, Student, Staff
+
+
+# Each import kind: model, the unique fields used to match existing rows,
+# and the columns we accept from the file (same as the create forms).
+IMPORT_SPECS = {
+    "devices": (
+        Device,
+        ("asset_tag", "serial_number"),
+        [
+            "asset_tag",
+            "serial_number",
+            "manufacturer",
+            "model",
+            "purchase_date",
+            "warranty_expires_on",
+            "status",
+            "condition",
+            "notes",
+        ],
+    ),
+    "students": (
+        Student,
+        ("student_id",),
+        [
+            "first_name",
+            "last_name",
+            "student_id",
+            "grade_level",
+            "guardian_name",
+            "guardian_phone",
+            "guardian_email",
+            "active",
+        ],
+    ),
+    "staff": (
+        Staff,
+        ("email",),
+        ["first_name", "last_name", "email", "role", "active"],
+    ),
+}
+
+
+class RowError(Exception):
+    pass
+
+
+def read_rows(path, fmt):
+    """Yield (line_number, dict) pairs one at a time from a CSV or JSONL file."""
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        if fmt == "csv":
+            reader = csv.DictReader(fh)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_num, line in enumerate(fh, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as exc:
+                    yield line_num, RowError(f"invalid JSON: {exc}")
+                    continue
+                if not isinstance(row, dict):
+                    yield line_num, RowError("expected a JSON object")
+                    continue
+                yield line_num, row
+
+
+def clean_row(model, columns, row):
+    """Validate one raw row against the model fields and return clean values."""
+    values = {}
+    errors = []
+    for name in columns:
+        field = model._meta.get_field(name)
+        raw = row.get(name)
+        if isinstance(raw, str):
+            raw = raw.strip()
+        if raw is None or raw == "":
+            if field.has_default():
+                raw = field.get_default()
+            elif field.null:
+                raw = None
+            else:
+                raw = ""
+        try:
+            values[name] = field.clean(raw, None)
+        except ValidationError as exc:
+            errors.append(f"{name}: {' '.join(exc.messages)}")
+    if errors:
+        raise RowError("; ".join(errors))
+    return values
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV or JSONL export into devices, students or staff, upserting in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(IMPORT_SPECS))
+        parser.add_argument("path")
+        parser.add_argument("--user", required=True, help="Username recorded as created_by.")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Validate and count the rows, then roll everything back."
+        )
+
+    def handle(self, *args, **options):
+        model, keys, columns = IMPORT_SPECS[options["kind"]]
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"{path} does not exist.")
+        fmt = options["format"] or ("jsonl" if path.suffix in (".jsonl", ".json") else "csv")
+        try:
+            user = get_user_model().objects.get(username=options["user"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user named {options['user']!r}.")
+
+        totals = {"created": 0, "updated": 0, "unchanged": 0, "rejected": 0}
+        rows = read_rows(path, fmt)
+        # A dry run keeps every batch in one transaction and rolls it back.
+        with transaction.atomic() if options["dry_run"] else nullcontext():
+            while True:
+                batch = list(islice(rows, options["batch_size"]))
+                if not batch:
+                    break
+                created, updated, unchanged, rejected = self.import_batch(model, keys, columns, user, batch)
+                totals["created"] += created
+                totals["updated"] += updated
+                totals["unchanged"] += unchanged
+                totals["rejected"] += len(rejected)
+                for line_num, reason in rejected:
+                    self.stderr.write(f"line {line_num}: {reason}")
+            if options["dry_run"]:
+                transaction.set_rollback(True)
+
+        summary = "{created} created, {updated} updated, {unchanged} unchanged, {rejected} rejected".format(**totals)
+        if options["dry_run"]:
+            summary += " (dry run, nothing saved)"
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def import_batch(self, model, keys, columns, user, batch):
+        rejected = []
+        cleaned = []
+        seen = {}
+        for line_num, row in batch:
+            if isinstance(row, RowError):
+                rejected.append((line_num, str(row)))
+                continue
+            try:
+                values = clean_row(model, columns, row)
+                for key in keys:
+                    earlier = seen.get((key, values[key]))
+                    if earlier:
+                        raise RowError(f"duplicate {key} {values[key]!r} (line {earlier})")
+            except RowError as exc:
+                rejected.append((line_num, str(exc)))
+                continue
+            for key in keys:
+                seen[(key, values[key])] = line_num
+            cleaned.append((line_num, values))
+
+        with transaction.atomic():
+            # One query finds every existing row matching any key in the batch.
+            match = Q()
+            for key in keys:
+                match |= Q(**{f"{key}__in": [values[key] for _, values in cleaned]})
+            existing = {}
+            if cleaned:
+                for obj in model.objects.filter(match).select_for_update():
+                    for key in keys:
+                        existing[(key, getattr(obj, key))] = obj
+
+            to_create = []
+            to_update = []
+            updated_pks = set()
+            for line_num, values in cleaned:
+                matches = {existing.get((key, values[key])) for key in keys} - {None}
+                if len(matches) > 1:
+                    rejected.append((line_num, "matches more than one existing record"))
+                    continue
+                if not matches:
+                    to_create.append(model(created_by=user, **values))
+                    continue
+                obj = matches.pop()
+                if obj.created_by_id != user.pk:
+                    rejected.append((line_num, "matches a record owned by another user"))
+                    continue
+                if obj.pk in updated_pks:
+                    rejected.append((line_num, "updates the same record as an earlier row"))
+                    continue
+                updated_pks.add(obj.pk)
+                if all(getattr(obj, name) == value for name, value in values.items()):
+                    # Re-imports of unchanged rows cost nothing.
+                    continue
+                for name, value in values.items():
+                    setattr(obj, name, value)
+                to_update.append(obj)
+
+            model.objects.bulk_create(to_create)
+            model.objects.bulk_update(to_update, columns, batch_size=500)
+            if model is Device:
+                DeviceEvent.objects.bulk_create(
+                    event for obj in to_create + to_update for event in obj.change_events()
+                )
+                invalidate_lookups([obj.pk for obj in to_update])
+        invalidate_dashboard(user.pk)
+
+        rejected.sort()
+        return len(to_create), len(to_update), len(updated_pks) - len(to_update), rejected
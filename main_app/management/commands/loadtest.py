@@ -0,0 +1,310 @@
+import asyncio
+import json
+import math
+import random
+import time
+from collections import deque
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from main_app.loadtest import (
+    SERVER_MODES,
+    find_knee,
+    request,
+    response_cookies,
+    split_url,
+    start_server,
+    stop_server,
+    summarize,
+)
+from main_app.models import Device, Student
+from main_app.services import bulk_check_in
+
+
+DEFAULT_MIX = "dashboard=30,search=25,lookup=25,checkout=10,return=10"
+POOL_SIZE = 500
+
+
+def parse_mix(value):
+    """"dashboard=30,search=25" -> {"dashboard": 30, "search": 25}"""
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in Session.ACTIONS:
+            raise CommandError(f"Unknown action {kind!r} in --mix; choose from {', '.join(Session.ACTIONS)}.")
+        try:
+            mix[kind] = int(weight)
+        except ValueError:
+            raise CommandError(f"--mix weight for {kind!r} must be a whole number.")
+        if mix[kind] < 0:
+            raise CommandError(f"--mix weight for {kind!r} can't be negative.")
+    if sum(mix.values()) <= 0:
+        raise CommandError("--mix needs at least one positive weight.")
+    return mix
+
+
+class Session:
+    """
+    One logged-in account: its cookies and the devices and students its
+    virtual users pick from. Devices it checked out move from ``available``
+    to ``out`` and back on return; ``ours`` remembers them for the cleanup.
+    """
+
+    ACTIONS = ("dashboard", "search", "lookup", "checkout", "return")
+
+    def __init__(self, user):
+        self.user = user
+        self.cookies = {}
+        devices = Device.objects.filter(created_by=user, status="AVAILABLE").order_by("pk")
+        self.available = deque(devices.values_list("asset_tag", flat=True)[:POOL_SIZE])
+        self.out = deque()
+        self.ours = set()
+        self.students = list(
+            Student.objects.filter(created_by=user).order_by("pk").values("student_id", "last_name")[:POOL_SIZE]
+        )
+        self.codes = list(self.available)
+
+    def headers(self):
+        return {"X-CSRFToken": self.cookies.get(settings.CSRF_COOKIE_NAME, "")}
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a school-morning mix of dashboard, search, scanner lookup, "
+        "checkout and return requests as several logged-in users against a "
+        "local server, stepping up the concurrency to find where p95 latency "
+        "or the error rate breaks down (writes benchmarks/loadtest.json)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=4, help="Log in as bench1..benchN.")
+        parser.add_argument("--password", default="bench")
+        parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Action weights (default {DEFAULT_MIX}).")
+        parser.add_argument("--levels", type=int, nargs="*", default=[1, 2, 4, 8, 16, 32, 64])
+        parser.add_argument("--step-seconds", type=float, default=10)
+        parser.add_argument("--think-ms", type=float, default=0, help="Pause between a user's requests.")
+        parser.add_argument("--p95-budget-ms", type=float, default=500)
+        parser.add_argument("--max-error-rate", type=float, default=0.01)
+        parser.add_argument(
+            "--target-rps",
+            type=float,
+            help="Expected peak load; prints how many servers like this one it needs.",
+        )
+        parser.add_argument("--mode", choices=sorted(SERVER_MODES), default="wsgi")
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--port", type=int, default=8711)
+        parser.add_argument("--url", help="Use a server that is already running instead of starting one.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Defaults to benchmarks/loadtest.json.")
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options["mix"])
+        users = list(
+            get_user_model().objects.filter(
+                username__in=[f"bench{n}" for n in range(1, options["users"] + 1)]
+            ).order_by("pk")
+        )
+        if len(users) < options["users"]:
+            raise CommandError(f"Need bench1..bench{options['users']}; run `manage.py seed_bench` first.")
+        sessions = [Session(user) for user in users]
+
+        process = None
+        if options["url"]:
+            host, port = split_url(options["url"])
+        else:
+            host, port = "127.0.0.1", options["port"]
+            process = start_server(options["mode"], port, workers=options["workers"])
+        try:
+            steps = asyncio.run(self.run(host, port, sessions, mix, options))
+        finally:
+            if process is not None:
+                stop_server(process)
+            self.clean_up(sessions)
+
+        knee = find_knee(steps, options["p95_budget_ms"], options["max_error_rate"])
+        breaks_at = steps[-1]["concurrency"] if steps and steps[-1] is not knee else None
+        report = {
+            "server": options["url"] or f"{options['mode']} x{options['workers']} workers",
+            "users": options["users"],
+            "mix": mix,
+            "step_seconds": options["step_seconds"],
+            "think_ms": options["think_ms"],
+            "p95_budget_ms": options["p95_budget_ms"],
+            "max_error_rate": options["max_error_rate"],
+            "steps": steps,
+            "knee": knee and {key: knee[key] for key in ("concurrency", "rps", "p95_ms")},
+            "breaks_at": breaks_at,
+        }
+        if knee is None:
+            self.stdout.write(self.style.WARNING("Over budget even at the lowest concurrency."))
+        else:
+            self.stdout.write(
+                f"knee: {knee['concurrency']} concurrent users, {knee['rps']:.1f} req/s at p95 {knee['p95_ms']:.1f} ms"
+            )
+            if options["target_rps"]:
+                report["servers_needed"] = math.ceil(options["target_rps"] / knee["rps"])
+                self.stdout.write(f"{options['target_rps']:g} req/s needs {report['servers_needed']} of these servers")
+        if breaks_at is not None:
+            self.stdout.write(f"breaks down at {breaks_at} concurrent users")
+
+        output = Path(options["output"] or Path(settings.BASE_DIR) / "benchmarks" / "loadtest.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2) + "\n")
+        self.stdout.write(f"wrote {output}")
+
+    # ======================
+    #  LOAD
+    # ======================
+    async def run(self, host, port, sessions, mix, options):
+        for session in sessions:
+            await self.log_in(host, port, session, options["password"])
+
+        rng = random.Random(options["seed"])
+        kinds, weights = list(mix), list(mix.values())
+        steps = []
+        for concurrency in options["levels"]:
+            step = await self.step(host, port, sessions, kinds, weights, concurrency, rng, options)
+            steps.append(step)
+            self.stdout.write(
+                f"{concurrency:>4} users {step['rps']:>8.1f} req/s  p50 {step['p50_ms']:>8.1f} ms  "
+                f"p95 {step['p95_ms']:>8.1f} ms  p99 {step['p99_ms']:>8.1f} ms  errors {step['error_rate']:.2%}"
+            )
+            if step["p95_ms"] > options["p95_budget_ms"] or step["error_rate"] > options["max_error_rate"]:
+                break
+        return steps
+
+    async def log_in(self, host, port, session, password):
+        """The real login form: GET it for the CSRF cookie, then POST it."""
+        path = reverse("login")
+        _, headers, _ = await request(host, port, path)
+        session.cookies.update(response_cookies(headers))
+        body = urlencode(
+            {
+                "username": session.user.username,
+                "password": password,
+                "csrfmiddlewaretoken": session.cookies.get(settings.CSRF_COOKIE_NAME, ""),
+            }
+        ).encode()
+        status, headers, _ = await request(
+            host,
+            port,
+            path,
+            session.cookies,
+            method="POST",
+            body=body,
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        session.cookies.update(response_cookies(headers))
+        if status != 302 or settings.SESSION_COOKIE_NAME not in session.cookies:
+            raise CommandError(f"Could not log in as {session.user.username} (status {status}).")
+
+    async def step(self, host, port, sessions, kinds, weights, concurrency, rng, options):
+        # act() can swap one action for another, so count every one.
+        latencies = {kind: [] for kind in Session.ACTIONS}
+        errors = dict.fromkeys(Session.ACTIONS, 0)
+        think = options["think_ms"] / 1000
+        deadline = time.perf_counter() + options["step_seconds"]
+
+        async def user(session):
+            while time.perf_counter() < deadline:
+                kind = rng.choices(kinds, weights)[0]
+                start = time.perf_counter()
+                try:
+                    kind, ok = await self.act(host, port, session, kind, rng)
+                except OSError:
+                    ok = False
+                if ok:
+                    latencies[kind].append(time.perf_counter() - start)
+                else:
+                    errors[kind] += 1
+                if think:
+                    await asyncio.sleep(think)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user(sessions[n % len(sessions)]) for n in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+        step = {
+            "concurrency": concurrency,
+            **summarize([s for kind in Session.ACTIONS for s in latencies[kind]], sum(errors.values()), elapsed),
+        }
+        step["by_action"] = {
+            kind: summarize(latencies[kind], errors[kind], elapsed)
+            for kind in Session.ACTIONS
+            if latencies[kind] or errors[kind]
+        }
+        return step
+
+    async def act(self, host, port, session, kind, rng):
+        """Send one request; returns the action actually taken and whether it succeeded."""
+        # Nothing to return yet (or nothing left to lend): do the other one.
+        if kind == "return" and not session.out:
+            kind = "checkout"
+        if kind == "checkout" and not session.available:
+            kind = "return" if session.out else "lookup"
+
+        if kind == "dashboard":
+            status, _, _ = await request(host, port, reverse("dashboard"), session.cookies)
+        elif kind == "search":
+            if rng.random() < 0.5:
+                path, q = reverse("device-list"), rng.choice(session.codes)[:-3]
+            else:
+                path, q = reverse("student-list"), rng.choice(session.students)["last_name"][:-2]
+            status, _, _ = await request(host, port, f"{path}?{urlencode({'q': q})}", session.cookies)
+        elif kind == "lookup":
+            query = urlencode({"code": rng.choice(session.codes)})
+            status, _, _ = await request(host, port, f"{reverse('device-lookup')}?{query}", session.cookies)
+        elif kind == "checkout":
+            return kind, await self.check_out(host, port, session, rng)
+        else:
+            return kind, await self.check_in(host, port, session)
+        return kind, status == 200
+
+    async def post_json(self, host, port, session, path, payload):
+        headers = {"Content-Type": "application/json", **session.headers()}
+        status, _, body = await request(
+            host, port, path, session.cookies, method="POST", body=json.dumps(payload).encode(), headers=headers
+        )
+        return status, json.loads(body) if status == 200 else None
+
+    async def check_out(self, host, port, session, rng):
+        tag = session.available.popleft()
+        borrower = rng.choice(session.students)["student_id"]
+        session.ours.add(tag)
+        status, data = await self.post_json(
+            host,
+            port,
+            session,
+            reverse("checkout-bulk"),
+            {
+                "items": [{"asset_tag": tag, "borrower": borrower}],
+                "due_back_at": (timezone.localdate() + timedelta(days=7)).isoformat(),
+            },
+        )
+        if data and data["results"][0]["result"] == "ok":
+            session.out.append(tag)
+        # A conflict means someone else lent it: drop it from the pool.
+        return status == 200
+
+    async def check_in(self, host, port, session):
+        tag = session.out.popleft()
+        status, data = await self.post_json(
+            host, port, session, reverse("checkout-bulk-return"), {"asset_tags": [tag]}
+        )
+        if data and data["results"][0]["result"] == "ok":
+            session.available.append(tag)
+        return status == 200
+
+    def clean_up(self, sessions):
+        """Return whatever the run left checked out, so the next run starts the same."""
+        for session in sessions:
+            if session.ours:
+                bulk_check_in(session.user, sorted(session.ours))
@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.models import Device
+from main_app.services import rebuild_current_checkouts
+
+
+class Command(BaseCommand):
+    help = "Rebuild each device's current checkout and borrower from the open checkouts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Only this user's devices.")
+
+    def handle(self, *args, **options):
+        devices = Device.objects.all()
+        if options["user"]:
+            try:
+                user = get_user_model().objects.get(username=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user {options['user']!r}.")
+            devices = devices.filter(created_by=user)
+
+        updated = rebuild_current_checkouts(devices)
+        held = devices.filter(current_checkout__isnull=False).count()
+        self.stdout.write(self.style.SUCCESS(f"rebuilt {updated} devices; {held} checked out"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from main_app.analytics import run_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the daily analytics rollups for every day that changed since the "
+        "last run. Schedule it nightly; --full rebuilds every day."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Re-roll all history (e.g. after renaming models or grade levels).",
+        )
+
+    def handle(self, *args, **options):
+        run = run_rollups(full=options["full"])
+        elapsed = (run.finished_at - run.started_at).total_seconds()
+        kind = "full rebuild" if run.full else "incremental"
+        self.stdout.write(self.style.SUCCESS(f"rolled up {run.days} days ({kind}) in {elapsed:.1f}s"))
@@ -0,0 +1,190 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from main_app.analytics import run_rollups
+from main_app.dashboard import invalidate_dashboard
+from main_app.models import Student, Staff, Device, Checkout, DeviceEvent
+from main_app.services import rebuild_current_checkouts
+
+
+BATCH_SIZE = 5000
+MODELS = ["Chromebook 3110", "Chromebook 3120", "Chromebook Plus", "Latitude 3140", "IdeaPad Flex 3i"]
+MANUFACTURERS = ["Dell", "Lenovo", "HP", "Acer", "ASUS"]
+
+
+@contextmanager
+def historical_checked_out_at():
+    """Let bulk_create keep the checked_out_at we set instead of auto_now_add."""
+    field = Checkout._meta.get_field("checked_out_at")
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def batched(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = "Seed a large, realistic dataset for the benchmark suite (see `manage.py bench`)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=4)
+        parser.add_argument("--devices", type=int, default=200_000)
+        parser.add_argument("--students", type=int, default=100_000)
+        parser.add_argument("--staff", type=int, default=2_000)
+        parser.add_argument("--checkouts", type=int, default=1_000_000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        User = get_user_model()
+        password = make_password("bench")
+        users = []
+        for n in range(1, options["users"] + 1):
+            user, _ = User.objects.get_or_create(username=f"bench{n}", defaults={"password": password})
+            users.append(user)
+
+        per_user = {
+            "devices": options["devices"] // len(users),
+            "students": options["students"] // len(users),
+            "staff": options["staff"] // len(users),
+            "checkouts": options["checkouts"] // len(users),
+        }
+        for user in users:
+            self.seed_user(user, per_user, rng)
+            invalidate_dashboard(user.pk)
+            self.stdout.write(f"seeded {user.username}")
+        run_rollups(full=True)
+        self.stdout.write(self.style.SUCCESS("done; log in as bench1..benchN with password 'bench'"))
+
+    def seed_user(self, user, counts, rng):
+        prefix = user.username.upper()
+        today = timezone.now()
+
+        self.bulk(
+            Student,
+            (
+                Student(
+                    first_name=rng.choice(["Ava", "Liam", "Noah", "Mia", "Zoe", "Eli", "Ivy", "Leo"]),
+                    last_name=f"Student{i:06}",
+                    student_id=f"{prefix}-S{i:07}",
+                    grade_level=str(rng.randint(1, 12)),
+                    guardian_email=f"guardian{i}@example.com",
+                    created_by=user,
+                )
+                for i in range(counts["students"])
+            ),
+        )
+        self.bulk(
+            Staff,
+            (
+                Staff(
+                    first_name="Staff",
+                    last_name=f"Member{i:05}",
+                    email=f"{prefix.lower()}-staff{i}@example.com",
+                    role=rng.choice(Staff.ROLE_CHOICES)[0],
+                    created_by=user,
+                )
+                for i in range(counts["staff"])
+            ),
+        )
+        self.bulk(
+            Device,
+            (
+                Device(
+                    asset_tag=f"{prefix}-{i:07}",
+                    serial_number=f"{prefix}SN{rng.getrandbits(40):012X}{i}",
+                    manufacturer=rng.choice(MANUFACTURERS),
+                    model=rng.choice(MODELS),
+                    status=rng.choices(["AVAILABLE", "REPAIR", "LOST"], [96, 3, 1])[0],
+                    created_by=user,
+                )
+                for i in range(counts["devices"])
+            ),
+        )
+
+        device_ids = list(Device.objects.filter(created_by=user).values_list("pk", flat=True))
+        student_ids = list(Student.objects.filter(created_by=user).values_list("pk", flat=True))
+        staff_ids = list(Staff.objects.filter(created_by=user).values_list("pk", flat=True))
+        if not (device_ids and student_ids):
+            return
+
+        # Returned history spread over two years, then one open checkout on
+        # ~10% of devices (some due today, some overdue).
+        open_ids = set(rng.sample(device_ids, len(device_ids) // 10))
+        history = max(counts["checkouts"] - len(open_ids), 0)
+
+        def checkout(device_id, checked_out_at, returned):
+            staff = staff_ids and rng.random() < 0.05
+            return Checkout(
+                device_id=device_id,
+                student_id=None if staff else rng.choice(student_ids),
+                staff_id=rng.choice(staff_ids) if staff else None,
+                checked_out_at=checked_out_at,
+                due_back_at=(checked_out_at + timedelta(days=14)).date(),
+                returned_at=checked_out_at + timedelta(days=rng.randint(1, 30)) if returned else None,
+                condition_out="GOOD",
+                condition_in="GOOD" if returned else None,
+                created_by=user,
+            )
+
+        def all_checkouts():
+            for _ in range(history):
+                at = today - timedelta(days=rng.randint(31, 730), seconds=rng.randint(0, 86400))
+                yield checkout(rng.choice(device_ids), at, True)
+            for device_id in open_ids:
+                at = today - timedelta(days=rng.randint(0, 28), seconds=rng.randint(0, 86400))
+                yield checkout(device_id, at, False)
+
+        with historical_checked_out_at():
+            self.bulk(Checkout, all_checkouts())
+        for batch in batched(open_ids):
+            Device.objects.filter(pk__in=batch).update(status="CHECKED_OUT")
+        rebuild_current_checkouts(Device.objects.filter(created_by=user))
+
+        # The event log those checkouts would have written.
+        def events():
+            for pk, device_id, out_at, returned_at in (
+                Checkout.objects.filter(created_by=user)
+                .values_list("pk", "device_id", "checked_out_at", "returned_at")
+                .iterator(chunk_size=BATCH_SIZE)
+            ):
+                yield DeviceEvent(
+                    device_id=device_id,
+                    kind="CHECKED_OUT",
+                    new_value="CHECKED_OUT",
+                    checkout_id=pk,
+                    created_at=out_at,
+                )
+                if returned_at:
+                    yield DeviceEvent(
+                        device_id=device_id,
+                        kind="RETURNED",
+                        new_value="AVAILABLE",
+                        checkout_id=pk,
+                        created_at=returned_at,
+                    )
+
+        self.bulk(DeviceEvent, events())
+
+    def bulk(self, model, objects):
+        for batch in batched(objects):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
@@ -0,0 +1,91 @@
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from main_app.models import Checkout, OverdueNotice
+
+
+class Command(BaseCommand):
+    help = (
+        "Email guardians (students) and staff one message each listing every "
+        "overdue device they hold. Checkouts already noticed within "
+        "--repeat-after days are skipped, so reruns send nothing new."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat-after", type=int, default=7, help="Days before reminding again.")
+        parser.add_argument("--batch-size", type=int, default=200, help="Messages per send.")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        recently_noticed = OverdueNotice.objects.filter(
+            checkout=OuterRef("pk"),
+            sent_at__gt=now - timedelta(days=options["repeat_after"]),
+        )
+        # One query: every open, past-due checkout with its device and
+        # borrower joined, ordered so each recipient's rows are adjacent.
+        overdue = (
+            Checkout.objects.filter(returned_at__isnull=True, due_back_at__lt=timezone.localdate(now))
+            .annotate(
+                recipient=Coalesce(
+                    NullIf("student__guardian_email", Value("")), NullIf("staff__email", Value(""))
+                )
+            )
+            .filter(recipient__isnull=False)
+            .exclude(Exists(recently_noticed))
+            .order_by("recipient", "due_back_at", "device__asset_tag")
+        )
+
+        sent = 0
+        batch = []
+        connection = None if options["dry_run"] else get_connection()
+        if connection is not None:
+            connection.open()
+        try:
+            for recipient, checkouts in groupby(overdue.iterator(chunk_size=2000), lambda c: c.recipient):
+                batch.append((recipient, list(checkouts)))
+                if len(batch) >= options["batch_size"]:
+                    sent += self.send(connection, batch)
+                    batch = []
+            if batch:
+                sent += self.send(connection, batch)
+        finally:
+            if connection is not None:
+                connection.close()
+
+        verb = "would send" if options["dry_run"] else "sent"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {sent} overdue notices"))
+
+    def send(self, connection, batch):
+        if connection is None:
+            for recipient, checkouts in batch:
+                self.stdout.write(f"{recipient}: {', '.join(c.device.asset_tag for c in checkouts)}")
+            return len(batch)
+
+        messages = [
+            EmailMessage(
+                subject=f"Overdue device reminder ({len(checkouts)})",
+                body=render_to_string("main_app/emails/overdue_notice.txt", {"checkouts": checkouts}),
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[recipient],
+            )
+            for recipient, checkouts in batch
+        ]
+        connection.send_messages(messages)
+        # Record only once the batch is out, so a crash resends at most one batch.
+        with transaction.atomic():
+            OverdueNotice.objects.bulk_create(
+                OverdueNotice(checkout=checkout, recipient=recipient)
+                for recipient, checkouts in batch
+                for checkout in checkouts
+            )
+        return len(messages)
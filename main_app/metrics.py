@@ -0,0 +1,193 @@
+"""
+Prometheus metrics, served at /metrics in the text exposition format.
+
+Per request: latency and query-count/SQL-time histograms by URL name, and
+a counter by URL name and status. Domain gauges (open and overdue
+checkouts, devices by status) come from a snapshot that is kept in the
+default cache and refreshed at most every METRICS_SNAPSHOT_SECONDS, by
+one scrape at a time, so scrapes don't run the counting queries.
+
+Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+(set in gunicorn.conf.py) and a scrape, whichever worker answers it, adds
+them all up. Without that variable the metrics are this process's own.
+"""
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.models import Count
+from django.utils import timezone
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    disable_created_metrics,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from .models import Checkout, Device
+from .profiling import recording_sql, watch_connections
+from .replicas import use_replica
+
+
+# No *_created series: they double the output and multiprocess mode drops them.
+disable_created_metrics()
+
+registry = CollectorRegistry()
+
+REQUEST_SECONDS = Histogram(
+    "assetally_request_duration_seconds",
+    "Time to produce a response, by URL name.",
+    ["view", "method"],
+    registry=registry,
+)
+RESPONSES = Counter(
+    "assetally_responses",
+    "Responses by URL name and status code.",
+    ["view", "method", "status"],
+    registry=registry,
+)
+REQUEST_QUERIES = Histogram(
+    "assetally_request_db_queries",
+    "Database queries per request, by URL name.",
+    ["view"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+    registry=registry,
+)
+REQUEST_SQL_SECONDS = Histogram(
+    "assetally_request_db_duration_seconds",
+    "Time spent in SQL per request, by URL name.",
+    ["view"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+    registry=registry,
+)
+
+
+# ======================
+#  DOMAIN SNAPSHOT
+# ======================
+SNAPSHOT_KEY = "metrics:snapshot"
+REFRESH_LOCK_KEY = "metrics:snapshot:refreshing"
+
+
+def take_snapshot():
+    """The counting queries behind the domain gauges."""
+    with use_replica():
+        open_checkouts = Checkout.objects.filter(returned_at__isnull=True)
+        return {
+            "taken_at": time.time(),
+            "open_checkouts": open_checkouts.count(),
+            "overdue_checkouts": open_checkouts.filter(due_back_at__lt=timezone.localdate()).count(),
+            "devices": dict(Device.objects.order_by().values_list("status").annotate(n=Count("pk"))),
+        }
+
+
+def get_snapshot():
+    """
+    The cached snapshot, refreshed when older than METRICS_SNAPSHOT_SECONDS.
+    While one scrape refreshes it, the others keep serving the old one.
+    """
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot and time.time() - snapshot["taken_at"] < settings.METRICS_SNAPSHOT_SECONDS:
+        return snapshot
+    if cache.add(REFRESH_LOCK_KEY, True, 60):
+        try:
+            snapshot = take_snapshot()
+            cache.set(SNAPSHOT_KEY, snapshot, None)
+        finally:
+            cache.delete(REFRESH_LOCK_KEY)
+    return snapshot
+
+
+class DomainCollector:
+    def collect(self):
+        snapshot = get_snapshot()
+        if snapshot is None:
+            return
+        yield GaugeMetricFamily(
+            "assetally_open_checkouts", "Checkouts not yet returned.", value=snapshot["open_checkouts"]
+        )
+        yield GaugeMetricFamily(
+            "assetally_overdue_checkouts",
+            "Open checkouts past their due date.",
+            value=snapshot["overdue_checkouts"],
+        )
+        devices = GaugeMetricFamily("assetally_devices", "Devices by status.", labels=["status"])
+        for status, _ in Device.STATUS_CHOICES:
+            devices.add_metric([status], snapshot["devices"].get(status, 0))
+        yield devices
+        yield GaugeMetricFamily(
+            "assetally_snapshot_age_seconds",
+            "Age of the snapshot behind the domain gauges.",
+            value=time.time() - snapshot["taken_at"],
+        )
+
+
+def render_metrics():
+    scrape = CollectorRegistry()
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.MultiProcessCollector(scrape)
+    else:
+        scrape.register(registry)
+    scrape.register(DomainCollector())
+    return generate_latest(scrape)
+
+
+# ======================
+#  MIDDLEWARE
+# ======================
+class QueryTally:
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def record_query(self, sql, duration):
+        self.queries += 1
+        self.seconds += duration
+
+
+class MetricsMiddleware:
+    """Records every request; METRICS_ENABLED=0 removes it."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        watch_connections()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with recording_sql(QueryTally()) as tally:
+            response = self.get_response(request)
+        self.observe(request, response, tally, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with recording_sql(QueryTally()) as tally:
+            response = await self.get_response(request)
+        self.observe(request, response, tally, time.perf_counter() - start)
+        return response
+
+    def observe(self, request, response, tally, seconds):
+        # URL names only, so unmatched paths can't grow the label set.
+        match = request.resolver_match
+        view = (match.view_name if match else None) or "unmatched"
+        method = request.method if request.method in ("GET", "HEAD", "POST") else "other"
+        REQUEST_SECONDS.labels(view, method).observe(seconds)
+        RESPONSES.labels(view, method, str(response.status_code)).inc()
+        REQUEST_QUERIES.labels(view).observe(tally.queries)
+        REQUEST_SQL_SECONDS.labels(view).observe(tally.seconds)
@@ -0,0 +1,117 @@
+from django.db import migrations
+
+
+# The DDL is written out here rather than imported from main_app.search, so
+# the migration keeps doing exactly what it did when it was first applied.
+
+# pg_trgm GIN indexes on UPPER(col), which is what icontains compiles to.
+POSTGRES_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    (
+        'CREATE INDEX IF NOT EXISTS main_app_device_asset_tag_trgm ON main_app_device '
+        'USING gin (UPPER(asset_tag) gin_trgm_ops)'
+    ),
+    (
+        'CREATE INDEX IF NOT EXISTS main_app_device_serial_number_trgm ON main_app_device '
+        'USING gin (UPPER(serial_number) gin_trgm_ops)'
+    ),
+    (
+        'CREATE INDEX IF NOT EXISTS main_app_device_model_trgm ON main_app_device '
+        'USING gin (UPPER(model) gin_trgm_ops)'
+    ),
+    (
+        'CREATE INDEX IF NOT EXISTS main_app_student_first_name_trgm ON main_app_student '
+        'USING gin (UPPER(first_name) gin_trgm_ops)'
+    ),
+    (
+        'CREATE INDEX IF NOT EXISTS main_app_student_last_name_trgm ON main_app_student '
+        'USING gin (UPPER(last_name) gin_trgm_ops)'
+    ),
+    (
+        'CREATE INDEX IF NOT EXISTS main_app_student_student_id_trgm ON main_app_student '
+        'USING gin (UPPER(student_id) gin_trgm_ops)'
+    ),
+]
+
+POSTGRES_REVERSE_SQL = [
+    'DROP INDEX IF EXISTS main_app_device_asset_tag_trgm',
+    'DROP INDEX IF EXISTS main_app_device_serial_number_trgm',
+    'DROP INDEX IF EXISTS main_app_device_model_trgm',
+    'DROP INDEX IF EXISTS main_app_student_first_name_trgm',
+    'DROP INDEX IF EXISTS main_app_student_last_name_trgm',
+    'DROP INDEX IF EXISTS main_app_student_student_id_trgm',
+]
+
+# External-content FTS5 tables (trigram tokenizer, so substrings of serial
+# numbers match) kept in sync with triggers, then filled from the tables.
+SQLITE_SQL = [
+    (
+        'CREATE VIRTUAL TABLE IF NOT EXISTS main_app_device_fts '
+        "USING fts5(asset_tag, serial_number, model, content='main_app_device', content_rowid='id', tokenize='trigram')"
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS main_app_device_fts_ai AFTER INSERT ON main_app_device BEGIN '
+        'INSERT INTO main_app_device_fts(rowid, asset_tag, serial_number, model) VALUES (new.id, new.asset_tag, new.serial_number, new.model); END'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS main_app_device_fts_ad AFTER DELETE ON main_app_device BEGIN '
+        "INSERT INTO main_app_device_fts(main_app_device_fts, rowid, asset_tag, serial_number, model) VALUES ('delete', old.id, old.asset_tag, old.serial_number, old.model); END"
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS main_app_device_fts_au AFTER UPDATE OF asset_tag, serial_number, model ON main_app_device BEGIN '
+        "INSERT INTO main_app_device_fts(main_app_device_fts, rowid, asset_tag, serial_number, model) VALUES ('delete', old.id, old.asset_tag, old.serial_number, old.model); "
+        'INSERT INTO main_app_device_fts(rowid, asset_tag, serial_number, model) VALUES (new.id, new.asset_tag, new.serial_number, new.model); END'
+    ),
+    (
+        'CREATE VIRTUAL TABLE IF NOT EXISTS main_app_student_fts '
+        "USING fts5(first_name, last_name, student_id, content='main_app_student', content_rowid='id', tokenize='trigram')"
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS main_app_student_fts_ai AFTER INSERT ON main_app_student BEGIN '
+        'INSERT INTO main_app_student_fts(rowid, first_name, last_name, student_id) VALUES (new.id, new.first_name, new.last_name, new.student_id); END'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS main_app_student_fts_ad AFTER DELETE ON main_app_student BEGIN '
+        "INSERT INTO main_app_student_fts(main_app_student_fts, rowid, first_name, last_name, student_id) VALUES ('delete', old.id, old.first_name, old.last_name, old.student_id); END"
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS main_app_student_fts_au AFTER UPDATE OF first_name, last_name, student_id ON main_app_student BEGIN '
+        "INSERT INTO main_app_student_fts(main_app_student_fts, rowid, first_name, last_name, student_id) VALUES ('delete', old.id, old.first_name, old.last_name, old.student_id); "
+        'INSERT INTO main_app_student_fts(rowid, first_name, last_name, student_id) VALUES (new.id, new.first_name, new.last_name, new.student_id); END'
+    ),
+    "INSERT INTO main_app_device_fts(main_app_device_fts) VALUES ('rebuild')",
+    "INSERT INTO main_app_student_fts(main_app_student_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE_SQL = [
+    'DROP TRIGGER IF EXISTS main_app_device_fts_ai',
+    'DROP TRIGGER IF EXISTS main_app_device_fts_ad',
+    'DROP TRIGGER IF EXISTS main_app_device_fts_au',
+    'DROP TABLE IF EXISTS main_app_device_fts',
+    'DROP TRIGGER IF EXISTS main_app_student_fts_ai',
+    'DROP TRIGGER IF EXISTS main_app_student_fts_ad',
+    'DROP TRIGGER IF EXISTS main_app_student_fts_au',
+    'DROP TABLE IF EXISTS main_app_student_fts',
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(sql)
+
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0005_checkout_created_by_staff_created_by_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({"postgresql": POSTGRES_SQL, "sqlite": SQLITE_SQL}),
+            run({"postgresql": POSTGRES_REVERSE_SQL, "sqlite": SQLITE_REVERSE_SQL}),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0006_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterConstraint(
+            model_name='checkout',
+            name='unique_open_checkout_per_device',
+            constraint=models.UniqueConstraint(condition=models.Q(('returned_at__isnull', True)), fields=('device',), name='unique_open_checkout_per_device', violation_error_message='This device is already checked out.'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0007_checkout_violation_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OverdueNotice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.EmailField(max_length=254)),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+                ('checkout', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='overdue_notices', to='main_app.checkout')),
+            ],
+            options={
+                'ordering': ['-sent_at'],
+                'indexes': [models.Index(fields=['checkout', 'sent_at'], name='main_app_ov_checkou_4f526a_idx')],
+            },
+        ),
+    ]
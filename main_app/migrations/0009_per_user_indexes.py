@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0008_overduenotice'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='checkout',
+            index=models.Index(fields=['created_by', '-checked_out_at', '-id'], name='checkout_owner_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checkout',
+            index=models.Index(condition=models.Q(('returned_at__isnull', True)), fields=['created_by', 'due_back_at'], name='checkout_owner_open_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checkout',
+            index=models.Index(condition=models.Q(('returned_at__isnull', True)), fields=['due_back_at'], name='checkout_open_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['created_by', 'status'], name='device_owner_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['created_by', 'asset_tag'], name='device_owner_tag_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['created_by', 'last_name', 'first_name', 'id'], name='student_owner_name_idx'),
+        ),
+    ]
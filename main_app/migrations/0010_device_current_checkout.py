@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Concat
+
+
+def fill_current_checkouts(apps, schema_editor):
+    # Same pass as services.rebuild_current_checkouts, on the historical models.
+    Device = apps.get_model("main_app", "Device")
+    Checkout = apps.get_model("main_app", "Checkout")
+    open_checkout = Checkout.objects.filter(device=OuterRef("pk"), returned_at__isnull=True).order_by()
+    borrower_name = Case(
+        When(student__isnull=False, then=Concat("student__first_name", Value(" "), "student__last_name")),
+        When(staff__isnull=False, then=Concat("staff__first_name", Value(" "), "staff__last_name")),
+        default=Value(""),
+    )
+    Device.objects.update(
+        current_checkout=Subquery(open_checkout.values("pk")[:1]),
+        current_borrower=Coalesce(
+            Subquery(open_checkout.annotate(name=borrower_name).values("name")[:1]), Value("")
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0009_per_user_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='device',
+            name='current_borrower',
+            field=models.CharField(blank=True, editable=False, max_length=101),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='current_checkout',
+            field=models.OneToOneField(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='main_app.checkout'),
+        ),
+        migrations.RunPython(fill_current_checkouts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:21
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0010_device_current_checkout'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedDeviceEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('STATUS', 'Status changed'), ('CONDITION', 'Condition changed'), ('CHECKED_OUT', 'Checked out'), ('RETURNED', 'Returned'), ('CHECKOUT_DELETED', 'Checkout deleted')], max_length=20)),
+                ('old_value', models.CharField(blank=True, max_length=20)),
+                ('new_value', models.CharField(blank=True, max_length=20)),
+                ('borrower', models.CharField(blank=True, max_length=101)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('checkout', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='main_app.checkout')),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main_app.device')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['device', '-created_at', '-id'], name='archived_event_timeline_idx'), models.Index(fields=['created_at', 'id'], name='archived_event_created_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DeviceEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('STATUS', 'Status changed'), ('CONDITION', 'Condition changed'), ('CHECKED_OUT', 'Checked out'), ('RETURNED', 'Returned'), ('CHECKOUT_DELETED', 'Checkout deleted')], max_length=20)),
+                ('old_value', models.CharField(blank=True, max_length=20)),
+                ('new_value', models.CharField(blank=True, max_length=20)),
+                ('borrower', models.CharField(blank=True, max_length=101)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('checkout', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='main_app.checkout')),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main_app.device')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['device', '-created_at', '-id'], name='device_event_timeline_idx'), models.Index(fields=['created_at', 'id'], name='device_event_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0011_device_events'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedCheckout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_back_at', models.DateField(blank=True, null=True)),
+                ('returned_at', models.DateTimeField(blank=True, null=True)),
+                ('condition_out', models.CharField(choices=[('NEW', 'New'), ('GOOD', 'Good'), ('FAIR', 'Fair'), ('POOR', 'Poor')], max_length=10)),
+                ('condition_in', models.CharField(blank=True, choices=[('NEW', 'New'), ('GOOD', 'Good'), ('FAIR', 'Fair'), ('POOR', 'Poor')], max_length=10, null=True)),
+                ('comments', models.TextField(blank=True)),
+                ('checked_out_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-checked_out_at'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='checkout',
+            name='created_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='%(class)ss', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='checkout',
+            name='device',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(class)ss', to='main_app.device'),
+        ),
+        migrations.AlterField(
+            model_name='checkout',
+            name='staff',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)ss', to='main_app.staff'),
+        ),
+        migrations.AlterField(
+            model_name='checkout',
+            name='student',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)ss', to='main_app.student'),
+        ),
+        migrations.AddIndex(
+            model_name='checkout',
+            index=models.Index(condition=models.Q(('returned_at__isnull', False)), fields=['returned_at', 'id'], name='checkout_returned_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedcheckout',
+            name='created_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='%(class)ss', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedcheckout',
+            name='device',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(class)ss', to='main_app.device'),
+        ),
+        migrations.AddField(
+            model_name='archivedcheckout',
+            name='staff',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)ss', to='main_app.staff'),
+        ),
+        migrations.AddField(
+            model_name='archivedcheckout',
+            name='student',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)ss', to='main_app.student'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcheckout',
+            index=models.Index(fields=['created_by', '-checked_out_at', '-id'], name='archived_owner_recent_idx'),
+        ),
+    ]
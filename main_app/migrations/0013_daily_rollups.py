@@ -0,0 +1,74 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0012_archived_checkout'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('dimension', models.CharField(choices=[('MODEL', 'Model'), ('MANUFACTURER', 'Manufacturer'), ('GRADE', 'Grade level')], max_length=12)),
+                ('key', models.CharField(blank=True, max_length=80)),
+                ('fleet', models.PositiveIntegerField(default=0)),
+                ('devices_out', models.PositiveIntegerField(default=0)),
+                ('checkouts', models.PositiveIntegerField(default=0)),
+                ('returns', models.PositiveIntegerField(default=0)),
+                ('return_seconds', models.BigIntegerField(default=0)),
+                ('repairs', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupDirtyDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField()),
+                ('days', models.PositiveIntegerField(default=0)),
+                ('full', models.BooleanField(default=False)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedcheckout',
+            index=models.Index(fields=['created_by', 'returned_at'], name='archived_owner_returned_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyrollup',
+            name='created_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='rollupdirtyday',
+            name='created_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(fields=('created_by', 'dimension', 'day', 'key'), name='daily_rollup_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='rollupdirtyday',
+            constraint=models.UniqueConstraint(fields=('created_by', 'day'), name='rollup_dirty_day_unique'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:46
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0013_daily_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(models.F('created_by'), django.db.models.functions.text.Upper('asset_tag'), condition=models.Q(('status', 'AVAILABLE')), name='device_available_tag_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staff',
+            index=models.Index(models.F('created_by'), django.db.models.functions.text.Upper('last_name'), name='staff_last_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staff',
+            index=models.Index(models.F('created_by'), django.db.models.functions.text.Upper('first_name'), name='staff_first_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staff',
+            index=models.Index(models.F('created_by'), django.db.models.functions.text.Upper('email'), name='staff_email_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(models.F('created_by'), django.db.models.functions.text.Upper('last_name'), name='student_last_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(models.F('created_by'), django.db.models.functions.text.Upper('first_name'), name='student_first_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(models.F('created_by'), django.db.models.functions.text.Upper('student_id'), name='student_id_prefix_idx'),
+        ),
+    ]
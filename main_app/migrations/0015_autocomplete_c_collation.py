@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+# Postgres only: rebuild the autocomplete indexes from 0014 under the same
+# names with COLLATE "C", so UPPER(col) COLLATE "C" LIKE 'PREFIX%' and its
+# ORDER BY are answered from them. SQLite already compares bytewise.
+INDEXES = [
+    ("device_available_tag_idx", "main_app_device", "asset_tag", " WHERE \"status\" = 'AVAILABLE'"),
+    ("staff_last_prefix_idx", "main_app_staff", "last_name", ""),
+    ("staff_first_prefix_idx", "main_app_staff", "first_name", ""),
+    ("staff_email_prefix_idx", "main_app_staff", "email", ""),
+    ("student_last_prefix_idx", "main_app_student", "last_name", ""),
+    ("student_first_prefix_idx", "main_app_student", "first_name", ""),
+    ("student_id_prefix_idx", "main_app_student", "student_id", ""),
+]
+
+
+def rebuild(collate):
+    def apply(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for name, table, column, condition in INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+            schema_editor.execute(
+                f'CREATE INDEX "{name}" ON "{table}" ("created_by_id", (UPPER("{column}")){collate}){condition}'
+            )
+
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0014_autocomplete_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild(' COLLATE "C"'), rebuild("")),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:23
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Postgres only, as in 0015: autocomplete compares asset tags as
+# UPPER(asset_tag) COLLATE "C", so whichever index it reads is built that way.
+def rebuild(name, collate, condition=""):
+    def apply(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+        schema_editor.execute(
+            f'CREATE INDEX "{name}" ON "main_app_device" ("created_by_id", (UPPER("asset_tag")){collate}){condition}'
+        )
+
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0015_autocomplete_c_collation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Backwards, this runs last and restores 0015's collated partial index.
+        migrations.RunPython(
+            migrations.RunPython.noop,
+            rebuild("device_available_tag_idx", ' COLLATE "C"', " WHERE \"status\" = 'AVAILABLE'"),
+        ),
+        migrations.RemoveIndex(
+            model_name='device',
+            name='device_available_tag_idx',
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(models.F('created_by'), django.db.models.functions.text.Upper('asset_tag'), name='device_tag_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(models.F('created_by'), django.db.models.functions.text.Upper('serial_number'), name='device_serial_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(models.F('created_by'), django.db.models.functions.text.Upper('model'), name='device_model_prefix_idx'),
+        ),
+        migrations.RunPython(rebuild("device_tag_prefix_idx", ' COLLATE "C"'), rebuild("device_tag_prefix_idx", "")),
+    ]
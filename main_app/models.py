@@ -1,8 +1,10 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.db.models import F, Q
+from django.db.models.functions import Upper
 from django.urls import reverse
+from django.utils import timezone
 
 
 # ======================
@@ -27,6 +29,18 @@ class Student(models.Model):
         related_name="students",
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["created_by", "last_name", "first_name", "id"],
+                name="student_owner_name_idx",
+            ),
+            # Borrower autocomplete: case-insensitive prefix per column.
+            models.Index(F("created_by"), Upper("last_name"), name="student_last_prefix_idx"),
+            models.Index(F("created_by"), Upper("first_name"), name="student_first_prefix_idx"),
+            models.Index(F("created_by"), Upper("student_id"), name="student_id_prefix_idx"),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name} (Grade {self.grade_level})"
 
@@ -59,6 +73,14 @@ class Staff(models.Model):
         related_name="staff_members",
     )
 
+    class Meta:
+        indexes = [
+            # Borrower autocomplete: case-insensitive prefix per column.
+            models.Index(F("created_by"), Upper("last_name"), name="staff_last_prefix_idx"),
+            models.Index(F("created_by"), Upper("first_name"), name="staff_first_prefix_idx"),
+            models.Index(F("created_by"), Upper("email"), name="staff_email_prefix_idx"),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.role})"
 
@@ -91,6 +113,19 @@ class Device(models.Model):
     condition = models.CharField(max_length=10, choices=CONDITION_CHOICES, default="GOOD")
     notes = models.TextField(blank=True)
 
+    # The open checkout and its borrower's name, kept in step by
+    # Checkout.save() and the bulk services so pages can show who has the
+    # device without a join. `manage.py repair_current_checkouts` rebuilds them.
+    current_checkout = models.OneToOneField(
+        "Checkout",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="+",
+    )
+    current_borrower = models.CharField(max_length=101, blank=True, editable=False)
+
     
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -100,8 +135,53 @@ class Device(models.Model):
         related_name="devices",
     )
 
+    # Changes to these are written to the device's event log.
+    TRACKED_FIELDS = ("status", "condition")
+
     class Meta:
         ordering = ["asset_tag"]
+        # Every view filters by created_by first.
+        indexes = [
+            models.Index(fields=["created_by", "status"], name="device_owner_status_idx"),
+            models.Index(fields=["created_by", "asset_tag"], name="device_owner_tag_idx"),
+            # Case-insensitive prefixes: checkout form autocomplete by asset
+            # tag, and search ranking (is the query a prefix of any tag,
+            # serial or model?).
+            models.Index(F("created_by"), Upper("asset_tag"), name="device_tag_prefix_idx"),
+            models.Index(F("created_by"), Upper("serial_number"), name="device_serial_prefix_idx"),
+            models.Index(F("created_by"), Upper("model"), name="device_model_prefix_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded = {
+            name: instance.__dict__[name] for name in cls.TRACKED_FIELDS if name in field_names
+        }
+        return instance
+
+    def change_events(self):
+        """Unsaved DeviceEvents for tracked fields changed since this device was loaded."""
+        loaded = getattr(self, "_loaded", {})
+        return [
+            DeviceEvent(
+                device_id=self.pk,
+                kind=name.upper(),
+                old_value=loaded.get(name) or "",
+                new_value=getattr(self, name),
+            )
+            for name in self.TRACKED_FIELDS
+            if getattr(self, name) != loaded.get(name)
+        ]
+
+    def save(self, *args, **kwargs):
+        saved = kwargs.get("update_fields") or self.TRACKED_FIELDS
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            events = [event for event in self.change_events() if event.kind.lower() in saved]
+            DeviceEvent.objects.bulk_create(events)
+        self._loaded = getattr(self, "_loaded", {})
+        self._loaded.update((event.kind.lower(), event.new_value) for event in events)
 
     def __str__(self):
         return f"{self.asset_tag} — {self.model or 'Device'}"
@@ -113,7 +193,23 @@ class Device(models.Model):
 # ======================
 #  CHECKOUT MODEL
 # ======================
-class Checkout(models.Model):
+ALREADY_CHECKED_OUT = "This device is already checked out."
+
+
+class CheckoutQuerySet(models.QuerySet):
+    def with_related(self):
+        # Everything __str__, borrower and the templates touch.
+        return self.select_related("device", "student", "staff")
+
+
+class CheckoutManager(models.Manager.from_queryset(CheckoutQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().with_related()
+
+
+class CheckoutRecord(models.Model):
+    """Fields shared by live checkouts and ArchivedCheckout."""
+
     CONDITION_CHOICES = [
         ("NEW", "New"),
         ("GOOD", "Good"),
@@ -121,15 +217,14 @@ class Checkout(models.Model):
         ("POOR", "Poor"),
     ]
 
-    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name="checkouts")
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name="%(class)ss")
     student = models.ForeignKey(
-        Student, on_delete=models.CASCADE, null=True, blank=True, related_name="checkouts"
+        Student, on_delete=models.CASCADE, null=True, blank=True, related_name="%(class)ss"
     )
     staff = models.ForeignKey(
-        Staff, on_delete=models.CASCADE, null=True, blank=True, related_name="checkouts"
+        Staff, on_delete=models.CASCADE, null=True, blank=True, related_name="%(class)ss"
     )
 
-    checked_out_at = models.DateTimeField(auto_now_add=True)
     due_back_at = models.DateField(null=True, blank=True)
     returned_at = models.DateTimeField(null=True, blank=True)
     condition_out = models.CharField(max_length=10, choices=CONDITION_CHOICES)
@@ -142,9 +237,36 @@ class Checkout(models.Model):
         on_delete=models.PROTECT,
         null=True,
         blank=True,
-        related_name="checkouts",
+        related_name="%(class)ss",
     )
 
+    class Meta:
+        abstract = True
+
+    @property
+    def borrower(self):
+        return self.student or self.staff
+
+    @property
+    def borrower_name(self):
+        borrower = self.borrower
+        return f"{borrower.first_name} {borrower.last_name}" if borrower else ""
+
+    def __str__(self):
+        status = "Returned" if self.returned_at else "Out"
+        return f"{self.device.asset_tag} → {self.borrower} ({status})"
+
+    def get_absolute_url(self):
+        return reverse("checkout-detail", args=[self.pk])
+
+
+class Checkout(CheckoutRecord):
+    checked_out_at = models.DateTimeField(auto_now_add=True)
+
+    is_archived = False
+
+    objects = CheckoutManager()
+
     class Meta:
         # Postgres partial unique index: only one open checkout per device
         constraints = [
@@ -152,36 +274,316 @@ class Checkout(models.Model):
                 fields=["device"],
                 condition=Q(returned_at__isnull=True),
                 name="unique_open_checkout_per_device",
+                violation_error_message=ALREADY_CHECKED_OUT,
             )
         ]
         ordering = ["-checked_out_at"]
+        indexes = [
+            # Checkout list: newest first per user.
+            models.Index(
+                fields=["created_by", "-checked_out_at", "-id"], name="checkout_owner_recent_idx"
+            ),
+            # Dashboard due today / overdue: only open checkouts matter.
+            models.Index(
+                fields=["created_by", "due_back_at"],
+                condition=Q(returned_at__isnull=True),
+                name="checkout_owner_open_due_idx",
+            ),
+            # Overdue notices across all users.
+            models.Index(
+                fields=["due_back_at"],
+                condition=Q(returned_at__isnull=True),
+                name="checkout_open_due_idx",
+            ),
+            # Archiving: oldest returned checkouts first.
+            models.Index(
+                fields=["returned_at", "id"],
+                condition=Q(returned_at__isnull=False),
+                name="checkout_returned_idx",
+            ),
+        ]
 
-    @property
-    def borrower(self):
-        return self.student or self.staff
+    # Loaded values of the fields the daily rollups depend on, so a save
+    # can tell which past days it changed (analytics.checkout_changed_days).
+    ROLLUP_FIELDS = ("device_id", "student_id", "staff_id", "checked_out_at", "returned_at")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded = {
+            name: instance.__dict__[name] for name in cls.ROLLUP_FIELDS if name in field_names
+        }
+        return instance
 
     def clean(self):
-        # (1) Exactly one borrower: either a student OR a staff member
-        if bool(self.student) == bool(self.staff):
+        # Exactly one borrower: either a student OR a staff member.
+        # "One open checkout per device" is unique_open_checkout_per_device,
+        # checked by full_clean() and enforced race-free by save().
+        if bool(self.student_id) == bool(self.staff_id):
             raise ValidationError(
                 "Assign this checkout to exactly one borrower: a Student OR a Staff member."
             )
 
-        # (2) Prevent multiple open checkouts for the same device
-        if not self.returned_at:
-            open_checkouts = Checkout.objects.filter(device=self.device, returned_at__isnull=True)
-            if self.pk:
-                open_checkouts = open_checkouts.exclude(pk=self.pk)
-            if open_checkouts.exists():
-                raise ValidationError(f"{self.device} is already checked out.")
+    def clean_fields(self, exclude=None):
+        # Related objects assigned by the form's choice fields were already
+        # fetched; don't SELECT them again just to validate the FK.
+        exclude = set(exclude or ())
+        for name in ("device", "student", "staff"):
+            field = self._meta.get_field(name)
+            if field.is_cached(self) and field.get_cached_value(self) is not None:
+                exclude.add(name)
+        super().clean_fields(exclude=exclude)
+
+    def save(self, *args, **kwargs):
+        self.clean()
+        adding = self._state.adding
+        loaded = getattr(self, "_loaded", {})
+        takes_device = (
+            adding
+            or loaded.get("device_id", self.device_id) != self.device_id
+            or (loaded.get("returned_at") is not None and self.returned_at is None)
+        )
+        try:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                self.sync_device(adding, takes_device, loaded.get("device_id"))
+        except IntegrityError as exc:
+            if is_open_checkout_conflict(exc):
+                raise ValidationError(ALREADY_CHECKED_OUT)
+            raise
+        self._loaded = {name: getattr(self, name) for name in self.ROLLUP_FIELDS}
+
+    def sync_device(self, adding=False, takes_device=False, previous_device_id=None):
+        """
+        Point the device at this checkout while it is open, and mark it
+        checked out when the checkout is new, reopened or moved to it (other
+        edits leave a status such as REPAIR alone); on return (or a move to
+        another device) clear the pointer and mark the old device available.
+        """
+        events = []
+        if not adding:
+            stale = Device.objects.filter(current_checkout=self)
+            if self.returned_at is None:
+                # Still open: only a move leaves the pointer on another device.
+                moved_from = list(stale.exclude(pk=self.device_id).values_list("pk", flat=True))
+                stale = Device.objects.filter(pk__in=moved_from)
+            else:
+                moved_from = [previous_device_id] if previous_device_id not in (None, self.device_id) else []
+            if self.returned_at is not None or moved_from:
+                freed = stale.update(current_checkout=None, current_borrower="", status="AVAILABLE")
+                if freed and self.returned_at is not None:
+                    events.append(DeviceEvent.for_checkout(self, "RETURNED"))
+            if moved_from:
+                # The update sends no signals and post_save only covers
+                # self.device_id, so retire the old device's lookups here.
+                from .lookup import invalidate_lookups
+
+                invalidate_lookups(moved_from)
+        if self.returned_at is None:
+            changes = {"current_checkout": self, "current_borrower": self.borrower_name}
+            if takes_device:
+                changes["status"] = "CHECKED_OUT"
+            Device.objects.filter(pk=self.device_id).update(**changes)
+            if adding:
+                events.append(DeviceEvent.for_checkout(self, "CHECKED_OUT"))
+        DeviceEvent.objects.bulk_create(events)
+
+
+class ArchivedCheckout(CheckoutRecord):
+    """
+    Returned checkouts moved out of the live table by `manage.py
+    archive_checkouts`. Read-only; they keep their original ids.
+    """
+
+    checked_out_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    is_archived = True
+
+    objects = CheckoutManager()
+
+    class Meta:
+        ordering = ["-checked_out_at"]
+        indexes = [
+            models.Index(
+                fields=["created_by", "-checked_out_at", "-id"], name="archived_owner_recent_idx"
+            ),
+            # Daily rollups: checkouts returned on or after a day.
+            models.Index(fields=["created_by", "returned_at"], name="archived_owner_returned_idx"),
+        ]
+
+
+# ======================
+#  DEVICE EVENT LOG
+# ======================
+class DeviceEventBase(models.Model):
+    """
+    One change to a device. Rows are only ever inserted (in the same
+    transaction as the change) and later moved to ArchivedDeviceEvent.
+    """
+
+    KIND_CHOICES = [
+        ("STATUS", "Status changed"),
+        ("CONDITION", "Condition changed"),
+        ("CHECKED_OUT", "Checked out"),
+        ("RETURNED", "Returned"),
+        ("CHECKOUT_DELETED", "Checkout deleted"),
+    ]
+
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name="+")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    old_value = models.CharField(max_length=20, blank=True)
+    new_value = models.CharField(max_length=20, blank=True)
+    # Kept after the checkout is deleted or archived, hence no constraint;
+    # the borrower is copied so a timeline never has to join.
+    checkout = models.ForeignKey(
+        Checkout,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    borrower = models.CharField(max_length=101, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        abstract = True
+        ordering = ["-created_at", "-id"]
+
+    def __str__(self):
+        return f"{self.device_id} {self.kind} {self.old_value}→{self.new_value} ({self.created_at:%Y-%m-%d})"
+
+
+class DeviceEvent(DeviceEventBase):
+    class Meta(DeviceEventBase.Meta):
+        indexes = [
+            # One device's timeline, newest first.
+            models.Index(fields=["device", "-created_at", "-id"], name="device_event_timeline_idx"),
+            # Everything in a date range, and archiving the oldest.
+            models.Index(fields=["created_at", "id"], name="device_event_created_idx"),
+        ]
+
+    @classmethod
+    def for_checkout(cls, checkout, kind):
+        status = {"CHECKED_OUT": "CHECKED_OUT", "RETURNED": "AVAILABLE"}.get(kind, "")
+        return cls(
+            device_id=checkout.device_id,
+            kind=kind,
+            new_value=status,
+            checkout_id=checkout.pk,
+            borrower=checkout.borrower_name,
+        )
 
     def save(self, *args, **kwargs):
-        self.full_clean()  
+        if not self._state.adding:
+            raise ValueError("Device events are append-only.")
         super().save(*args, **kwargs)
 
+
+class ArchivedDeviceEvent(DeviceEventBase):
+    """Events moved out of DeviceEvent by `manage.py archive_device_events`."""
+
+    class Meta(DeviceEventBase.Meta):
+        indexes = [
+            models.Index(fields=["device", "-created_at", "-id"], name="archived_event_timeline_idx"),
+            models.Index(fields=["created_at", "id"], name="archived_event_created_idx"),
+        ]
+
+
+# ======================
+#  ANALYTICS ROLLUPS
+# ======================
+class DailyRollup(models.Model):
+    """
+    One day's figures for one device model, manufacturer or grade level,
+    written by `manage.py rollup_analytics`. The analytics page only reads
+    these, never the checkouts themselves.
+    """
+
+    DIMENSION_CHOICES = [
+        ("MODEL", "Model"),
+        ("MANUFACTURER", "Manufacturer"),
+        ("GRADE", "Grade level"),
+    ]
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    day = models.DateField()
+    dimension = models.CharField(max_length=12, choices=DIMENSION_CHOICES)
+    key = models.CharField(max_length=80, blank=True)
+
+    fleet = models.PositiveIntegerField(default=0)  # devices on hand (not retired)
+    devices_out = models.PositiveIntegerField(default=0)  # checkouts open at any time that day
+    checkouts = models.PositiveIntegerField(default=0)  # checkouts started
+    returns = models.PositiveIntegerField(default=0)
+    return_seconds = models.BigIntegerField(default=0)  # total length of those returned
+    repairs = models.PositiveIntegerField(default=0)  # devices sent to repair
+    losses = models.PositiveIntegerField(default=0)  # devices marked lost
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["created_by", "dimension", "day", "key"], name="daily_rollup_unique"
+            )
+        ]
+
     def __str__(self):
-        status = "Returned" if self.returned_at else "Out"
-        return f"{self.device.asset_tag} → {self.borrower} ({status})"
+        return f"{self.day} {self.dimension} {self.key or '—'}"
 
-    def get_absolute_url(self):
-        return reverse("checkout-detail", args=[self.pk])
+
+class RollupDirtyDay(models.Model):
+    """A past day whose rollups a backdated edit changed; cleared by the next run."""
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    day = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["created_by", "day"], name="rollup_dirty_day_unique")
+        ]
+
+
+class RollupRun(models.Model):
+    """One run of the rollup job; the next run starts from started_at."""
+
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+    days = models.PositiveIntegerField(default=0)
+    full = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ["-started_at"]
+
+    def __str__(self):
+        return f"{self.started_at:%Y-%m-%d %H:%M} ({self.days} days)"
+
+
+# ======================
+#  OVERDUE NOTICE MODEL
+# ======================
+class OverdueNotice(models.Model):
+    """One overdue reminder sent for one checkout (see send_overdue_notices)."""
+
+    checkout = models.ForeignKey(Checkout, on_delete=models.CASCADE, related_name="overdue_notices")
+    recipient = models.EmailField()
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["checkout", "sent_at"])]
+        ordering = ["-sent_at"]
+
+    def __str__(self):
+        return f"{self.checkout_id} → {self.recipient} ({self.sent_at:%Y-%m-%d})"
+
+
+def is_open_checkout_conflict(exc):
+    """True if an IntegrityError came from unique_open_checkout_per_device."""
+    # Postgres names the constraint; SQLite only names the column.
+    diag = getattr(exc.__cause__, "diag", None)
+    if diag is not None:
+        return getattr(diag, "constraint_name", None) == "unique_open_checkout_per_device"
+    return "main_app_checkout.device_id" in str(exc)
@@ -0,0 +1,139 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+
+# ======================
+#  KEYSET PAGINATION
+# ======================
+def encode_cursor(obj, keyset):
+    values = []
+    for field in keyset:
+        value = getattr(obj, field.lstrip("-"))
+        values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def _keyset_field(queryset, name):
+    """The model field (or annotation output field) a keyset entry orders by."""
+    if name == "pk":
+        return queryset.model._meta.pk
+    annotations = getattr(getattr(queryset, "query", None), "annotations", {})
+    if name in annotations:
+        return annotations[name].output_field
+    return queryset.model._meta.get_field(name)
+
+
+def decode_cursor(cursor, keyset, queryset):
+    """
+    The keyset values in a cursor, converted to their fields' Python types.
+    A cursor that doesn't decode to one valid value per field is a 404.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise Http404("Invalid page cursor.")
+    if not isinstance(values, list) or len(values) != len(keyset):
+        raise Http404("Invalid page cursor.")
+    try:
+        values = [
+            _keyset_field(queryset, field.lstrip("-")).to_python(value)
+            for field, value in zip(keyset, values)
+        ]
+    except (ValidationError, ValueError, TypeError):
+        raise Http404("Invalid page cursor.")
+    if None in values:
+        raise Http404("Invalid page cursor.")
+    return values
+
+
+def keyset_filter(keyset, values, forward=True):
+    """
+    Build the "rows after this cursor" condition for a (possibly mixed
+    direction) ordering: (a > x) OR (a = x AND b > y) OR ...
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(keyset, values):
+        descending = field.startswith("-")
+        name = field.lstrip("-")
+        lookup = "lt" if descending == forward else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def _page_query(queryset, keyset, params, page_size):
+    """The page_size + 1 row slice to fetch, and whether it runs backwards."""
+    after = params.get("after")
+    before = params.get("before")
+    if before:
+        reverse = [f[1:] if f.startswith("-") else f"-{f}" for f in keyset]
+        queryset = queryset.filter(keyset_filter(keyset, decode_cursor(before, keyset, queryset), forward=False))
+        return queryset.order_by(*reverse)[: page_size + 1], True
+    if after:
+        queryset = queryset.filter(keyset_filter(keyset, decode_cursor(after, keyset, queryset)))
+    return queryset.order_by(*keyset)[: page_size + 1], False
+
+
+def _page_result(rows, keyset, params, page_size, backwards):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows = rows[::-1]
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = bool(params.get("after")), has_more
+
+    prev_cursor = encode_cursor(rows[0], keyset) if rows and has_prev else None
+    next_cursor = encode_cursor(rows[-1], keyset) if rows and has_next else None
+    return rows, prev_cursor, next_cursor
+
+
+def keyset_page(queryset, keyset, params, page_size):
+    """
+    Return (rows, prev_cursor, next_cursor) for the page selected by the
+    ``after``/``before`` query parameters. Every page is one indexed range
+    scan of page_size + 1 rows; there is no COUNT and no OFFSET.
+    """
+    query, backwards = _page_query(queryset, keyset, params, page_size)
+    return _page_result(list(query), keyset, params, page_size, backwards)
+
+
+async def akeyset_page(queryset, keyset, params, page_size):
+    """Async keyset_page()."""
+    query, backwards = _page_query(queryset, keyset, params, page_size)
+    return _page_result([row async for row in query], keyset, params, page_size, backwards)
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin that pages object_list by cursor instead of page number.
+    ``keyset`` must be a unique ordering (end it with the primary key).
+    """
+
+    page_size = 50
+    keyset = ("pk",)
+    cursors = None
+
+    def get_keyset(self):
+        return self.keyset
+
+    def get_context_data(self, **kwargs):
+        if self.cursors is None:
+            self.object_list, *self.cursors = keyset_page(
+                self.object_list, self.get_keyset(), self.request.GET, self.page_size
+            )
+        ctx = super().get_context_data(**kwargs)
+        ctx["prev_cursor"], ctx["next_cursor"] = self.cursors
+        return ctx
+
+    async def apaginate(self):
+        """Fetch the page with the async ORM; get_context_data() then reuses it."""
+        self.object_list, *self.cursors = await akeyset_page(
+            self.object_list, self.get_keyset(), self.request.GET, self.page_size
+        )
@@ -0,0 +1,194 @@
+"""
+Opt-in request profiling. With PROFILE_SAMPLE_RATE above 0, that fraction
+of requests records its query count, SQL time and slowest statements, the
+view and template render times, and returns them as Server-Timing headers
+(shown in the browser's network panel) plus one JSON line on the
+"main_app.profiling" logger.
+
+At 0 (the default) the middleware removes itself at startup, so nothing is
+installed. Unsampled requests only pay for one random() call, and one
+context variable read per query. The SQL hooks (recording_sql) are shared
+with the metrics middleware.
+
+The view and template timings include the SQL they run. A class-based view
+returns a TemplateResponse that is rendered after the view returns, so
+"view" stops there and "template" covers the render.
+"""
+import heapq
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+logger = logging.getLogger(__name__)
+
+# Everything recording the SQL of the current request (see recording_sql).
+_recorders = ContextVar("sql_recorders", default=())
+
+
+class Profile:
+    """Timings of one sampled request, in seconds."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql = 0.0
+        self.slowest = []  # min-heap of (duration, n, sql)
+        self.view_start = self.view_end = self.render_end = None
+        self.total = None
+
+    def record_query(self, sql, duration):
+        self.queries += 1
+        self.sql += duration
+        entry = (duration, self.queries, sql)
+        if len(self.slowest) < settings.PROFILE_SLOWEST_QUERIES:
+            heapq.heappush(self.slowest, entry)
+        elif self.slowest and duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    @property
+    def view(self):
+        if self.view_start is None:
+            return None
+        return (self.view_end or self.start + self.total) - self.view_start
+
+    @property
+    def template(self):
+        if self.view_end is None or self.render_end is None:
+            return None
+        return self.render_end - self.view_end
+
+    def server_timing(self):
+        timings = [f'db;dur={self.sql * 1000:.1f};desc="{self.queries} queries"']
+        if self.view is not None:
+            timings.append(f"view;dur={self.view * 1000:.1f}")
+        if self.template is not None:
+            timings.append(f"tpl;dur={self.template * 1000:.1f}")
+        timings.append(f"total;dur={self.total * 1000:.1f}")
+        return ", ".join(timings)
+
+    def as_dict(self, request, response):
+        def ms(seconds):
+            return None if seconds is None else round(seconds * 1000, 2)
+
+        match = request.resolver_match
+        return {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "total_ms": ms(self.total),
+            "view_ms": ms(self.view),
+            "template_ms": ms(self.template),
+            "sql_ms": ms(self.sql),
+            "queries": self.queries,
+            "slowest": [
+                {"ms": ms(duration), "sql": sql[:500]}
+                for duration, _, sql in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+
+def record_sql(execute, sql, params, many, context):
+    recorders = _recorders.get()
+    if not recorders:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        for recorder in recorders:
+            recorder.record_query(sql, duration)
+
+
+def install_wrapper(connection, **kwargs):
+    if record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_sql)
+
+
+def watch_connections():
+    """
+    Put record_sql on every connection opened from now on, in any thread;
+    it reports to the recorders of the context the query runs in.
+    """
+    connection_created.connect(install_wrapper, dispatch_uid="record_sql")
+
+
+@contextmanager
+def recording_sql(recorder):
+    """Call recorder.record_query(sql, seconds) for each query in this block."""
+    for connection in connections.all(initialized_only=True):
+        install_wrapper(connection)
+    token = _recorders.set(_recorders.get() + (recorder,))
+    try:
+        yield recorder
+    finally:
+        _recorders.reset(token)
+
+
+class ProfilingMiddleware:
+    """Put first in MIDDLEWARE so "total" covers the rest of the stack."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.PROFILE_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        watch_connections()
+
+    def sample(self, request):
+        if random.random() >= settings.PROFILE_SAMPLE_RATE:
+            return None
+        profile = request._profile = Profile()
+        return profile
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        profile = self.sample(request)
+        if profile is None:
+            return self.get_response(request)
+        with recording_sql(profile):
+            response = self.get_response(request)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        profile = self.sample(request)
+        if profile is None:
+            return await self.get_response(request)
+        with recording_sql(profile):
+            response = await self.get_response(request)
+        return self.finish(request, response, profile)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, "_profile", None)
+        if profile is not None:
+            profile.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        profile = getattr(request, "_profile", None)
+        if profile is not None:
+            profile.view_end = time.perf_counter()
+            response.add_post_render_callback(lambda r: setattr(profile, "render_end", time.perf_counter()))
+        return response
+
+    def finish(self, request, response, profile):
+        profile.total = time.perf_counter() - profile.start
+        response["Server-Timing"] = profile.server_timing()
+        logger.info(json.dumps(profile.as_dict(request, response)))
+        return response
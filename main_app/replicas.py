@@ -0,0 +1,141 @@
+"""
+Optional read replica (REPLICA_DATABASE_URL). GET and HEAD requests read
+from the replica; other requests, writes and anything inside a transaction
+use the primary. A request that writes stays on the primary for the rest
+of the request and, through a short-lived cookie, for REPLICA_PIN_SECONDS
+afterwards, so the page after a form post reads its own writes.
+
+Without a replica configured the router answers None everywhere and Django
+behaves as before.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+PIN_COOKIE = "primary_pin"
+READ_METHODS = ("GET", "HEAD")
+
+
+class ReadState:
+    """Where the current request (or block) may read from."""
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.wrote = False
+
+
+_state = ContextVar("replica_read_state", default=None)
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """Route reads in this block to the replica (if one is configured)."""
+    state = ReadState(enabled and bool(settings.REPLICA_DATABASE))
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def use_primary():
+    return use_replica(False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not settings.REPLICA_DATABASE:
+            return None
+        state = _state.get()
+        if state and state.replica and not state.wrote:
+            if not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+                return settings.REPLICA_DATABASE
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS if settings.REPLICA_DATABASE else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        if settings.REPLICA_DATABASE:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db == settings.REPLICA_DATABASE:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """Reads of GET/HEAD requests go to the replica unless the client is pinned."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def reads_replica(self, request):
+        return request.method in READ_METHODS and PIN_COOKIE not in request.COOKIES
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with use_replica(self.reads_replica(request)) as state:
+            response = self.get_response(request)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        with use_replica(self.reads_replica(request)) as state:
+            response = await self.get_response(request)
+        return self.finish(state, response)
+
+    def finish(self, state, response):
+        if state.wrote and settings.REPLICA_DATABASE:
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite="Lax"
+            )
+        if response.streaming:
+            # Streamed exports run their queries after this returns.
+            if response.is_async:
+                response.streaming_content = _astream(state, response.streaming_content)
+            else:
+                response.streaming_content = _stream(state, response.streaming_content)
+        return response
+
+
+def _stream(state, content):
+    iterator = iter(content)
+    while True:
+        token = _state.set(state)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _state.reset(token)
+        yield chunk
+
+
+async def _astream(state, content):
+    iterator = aiter(content)
+    while True:
+        token = _state.set(state)
+        try:
+            chunk = await anext(iterator)
+        except StopAsyncIteration:
+            return
+        finally:
+            _state.reset(token)
+        yield chunk
@@ -0,0 +1,185 @@
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Upper
+
+from .autocomplete import HIGH
+
+
+# ======================
+#  SEARCH INDEXES
+# ======================
+# Columns covered by the search index for each table.
+SEARCH_COLUMNS = {
+    "main_app_device": ("asset_tag", "serial_number", "model"),
+    "main_app_student": ("first_name", "last_name", "student_id"),
+}
+
+# Trigram matching needs at least three characters; shorter terms fall
+# back to a plain icontains filter.
+MIN_TERM_LENGTH = 3
+
+# On SQLite, when at most this many rows of the search index match, they
+# are all ranked: reading and sorting them costs less than paging through
+# the user's whole table. Past it, only a query some row starts with ranks.
+RANK_ALL_UP_TO = 1000
+
+
+def sqlite_fts_sql():
+    """
+    The FTS5 tables and sync triggers migration 0006 creates. Every statement
+    is idempotent so it can be re-run after a migration rebuilds one of the
+    tables; keep it in step with the migration's SQLITE_SQL.
+    """
+    statements = []
+    for table, columns in SEARCH_COLUMNS.items():
+        fts = f"{table}_fts"
+        cols = ", ".join(columns)
+        new_values = ", ".join(f"new.{c}" for c in columns)
+        old_values = ", ".join(f"old.{c}" for c in columns)
+        statements += [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{cols}, content='{table}', content_rowid='id', tokenize='trigram')",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+        ]
+    return statements
+
+
+def ensure_sqlite_triggers(sender, using="default", **kwargs):
+    """
+    post_migrate hook: SQLite drops a table's triggers whenever a migration
+    rebuilds it, so put them back. Row ids survive the rebuild, so the FTS
+    content itself is still valid.
+    """
+    from django.db import connections
+
+    conn = connections[using]
+    if conn.vendor != "sqlite":
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = %s",
+            ["main_app_device_fts"],
+        )
+        if not cursor.fetchone()[0]:
+            return
+        for sql in sqlite_fts_sql():
+            cursor.execute(sql)
+
+
+# ======================
+#  QUERIES
+# ======================
+def _terms(q):
+    return [term for term in q.split() if term]
+
+
+def _phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _term_filter(table, columns, term):
+    if connection.vendor == "sqlite" and len(term) >= MIN_TERM_LENGTH:
+        fts = f"{table}_fts"
+        return Q(pk__in=RawSQL(f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s", [_phrase(term)]))
+    # Postgres: UPPER(col) LIKE UPPER('%term%') is served by the trigram indexes.
+    match = Q()
+    for column in columns:
+        match |= Q(**{f"{column}__icontains": term})
+    return match
+
+
+def _few_matches(table, terms):
+    """
+    On SQLite, the ids of the rows matching every indexed term, from all
+    users, if there are at most RANK_ALL_UP_TO of them; otherwise None.
+    """
+    phrases = [_phrase(term) for term in terms if len(term) >= MIN_TERM_LENGTH]
+    if connection.vendor != "sqlite" or not phrases:
+        return None
+    fts = f"{table}_fts"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s LIMIT %s",
+            [" AND ".join(phrases), RANK_ALL_UP_TO + 1],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+    return ids if len(ids) <= RANK_ALL_UP_TO else None
+
+
+def _prefix_hits(queryset, field, q):
+    """Rows of queryset whose field starts with q, ignoring case."""
+    if connection.vendor == "sqlite":
+        # A bytewise range, answered by the (created_by, UPPER(col)) indexes.
+        queryset = queryset.alias(_key=Upper(field)).filter(
+            _key__gte=Upper(Value(q)), _key__lt=Upper(Value(q + HIGH))
+        )
+    else:
+        # Postgres: UPPER(col) LIKE 'Q%' is served by the trigram indexes.
+        queryset = queryset.filter(**{f"{field}__istartswith": q})
+    return queryset.order_by().values("pk")
+
+
+def _search(queryset, q, exact_fields, prefix_fields, rank):
+    table = queryset.model._meta.db_table
+    columns = SEARCH_COLUMNS[table]
+    q = q.strip()
+    terms = _terms(q)
+    ids = _few_matches(table, terms) if rank else None
+    if ids is not None:
+        # Few enough to rank them all. The page reads them by id instead of
+        # matching the indexed terms again.
+        ranked = True
+        queryset = queryset.filter(pk__in=ids)
+        terms = [term for term in terms if len(term) < MIN_TERM_LENGTH]
+    else:
+        # Only rows that start with the whole query rank above the rest (exact
+        # matches included), and such a row matches every term too. One
+        # query, one index range per field; exists() stops at the first row.
+        ranked = rank and _prefix_hits(queryset, prefix_fields[0], q).union(
+            *(_prefix_hits(queryset, field, q) for field in prefix_fields[1:]), all=True
+        ).exists()
+    for term in terms:
+        queryset = queryset.filter(_term_filter(table, columns, term))
+    if not ranked:
+        # Nothing to lift, so no search_rank: the list pages in its usual
+        # order instead of sorting every match of a broad fragment.
+        return queryset
+
+    # Rank: exact identifier match, then prefix match, then anything else.
+    whens = [When(Q(**{f"{f}__iexact": q}), then=Value(0)) for f in exact_fields]
+    whens += [When(Q(**{f"{f}__istartswith": q}), then=Value(1)) for f in prefix_fields]
+    return queryset.annotate(
+        search_rank=Case(*whens, default=Value(2), output_field=IntegerField())
+    )
+
+
+def search_devices(queryset, q, rank=True):
+    """
+    The devices matching every term of q. With rank, those whose asset tag,
+    serial or model starts with q are annotated with a search_rank to order by.
+    """
+    return _search(
+        queryset,
+        q,
+        exact_fields=("asset_tag", "serial_number"),
+        prefix_fields=("asset_tag", "serial_number", "model"),
+        rank=rank,
+    )
+
+
+def search_students(queryset, q, rank=True):
+    """search_devices() for students, ranked by student id and name."""
+    return _search(
+        queryset,
+        q,
+        exact_fields=("student_id",),
+        prefix_fields=("student_id", "last_name", "first_name"),
+        rank=rank,
+    )
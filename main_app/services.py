@@ -0,0 +1,180 @@
+from django.db import transaction
+from django.db.models import Case, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Concat
+from django.utils import timezone
+
+from .dashboard import invalidate_dashboard
+from .lookup import invalidate_lookups
+from .models import Student, Staff, Device, Checkout, DeviceEvent
+
+
+# ======================
+#  BULK CHECKOUT / RETURN
+# ======================
+# Devices in these states stay on the shelf until someone changes them.
+UNLENDABLE_STATUSES = {"REPAIR", "LOST", "RETIRED"}
+
+
+def bulk_check_out(user, items, due_back_at=None, condition_out="GOOD", comments=""):
+    """
+    Check out a cart of devices in one transaction.
+
+    ``items`` is a list of ``(asset_tag, borrower_id)`` pairs where the
+    borrower id is a student_id or a staff email. Returns one result dict
+    per item, in order, with ``result`` set to "ok", "conflict" or "not_found";
+    devices in repair, lost or retired are conflicts.
+    """
+    tags = [tag for tag, _ in items]
+    borrower_ids = {borrower_id for _, borrower_id in items}
+
+    with transaction.atomic():
+        devices = {
+            d.asset_tag: d
+            for d in Device.objects.select_for_update().filter(
+                created_by=user, asset_tag__in=tags
+            )
+        }
+        students = {
+            s.student_id: s
+            for s in Student.objects.filter(created_by=user, student_id__in=borrower_ids)
+        }
+        staff = {
+            s.email: s
+            for s in Staff.objects.filter(created_by=user, email__in=borrower_ids)
+        }
+        already_out = set(
+            Checkout.objects.filter(
+                device__in=devices.values(), returned_at__isnull=True
+            ).values_list("device_id", flat=True)
+        )
+
+        results = []
+        new_checkouts = []
+        seen = set()
+        for tag, borrower_id in items:
+            device = devices.get(tag)
+            student = students.get(borrower_id)
+            staff_member = None if student else staff.get(borrower_id)
+            if device is None:
+                results.append(_result(tag, "not_found", "Unknown asset tag."))
+            elif student is None and staff_member is None:
+                results.append(_result(tag, "not_found", f"Unknown borrower {borrower_id}."))
+            elif device.pk in already_out or device.pk in seen:
+                results.append(_result(tag, "conflict", f"{device} is already checked out."))
+            elif device.status in UNLENDABLE_STATUSES:
+                results.append(
+                    _result(tag, "conflict", f"{device} is marked {device.get_status_display().lower()}.")
+                )
+            else:
+                seen.add(device.pk)
+                new_checkouts.append(
+                    Checkout(
+                        device=device,
+                        student=student,
+                        staff=staff_member,
+                        due_back_at=due_back_at,
+                        condition_out=condition_out,
+                        comments=comments,
+                        created_by=user,
+                    )
+                )
+                results.append(_result(tag, "ok", f"Checked out to {student or staff_member}."))
+
+        Checkout.objects.bulk_create(new_checkouts)
+        for checkout in new_checkouts:
+            checkout.device.current_checkout = checkout
+            checkout.device.current_borrower = checkout.borrower_name
+            checkout.device.status = "CHECKED_OUT"
+        Device.objects.bulk_update(
+            [checkout.device for checkout in new_checkouts],
+            ["current_checkout", "current_borrower", "status"],
+        )
+        DeviceEvent.objects.bulk_create(
+            DeviceEvent.for_checkout(checkout, "CHECKED_OUT") for checkout in new_checkouts
+        )
+        invalidate_lookups(seen)
+    invalidate_dashboard(user.pk)
+    return results
+
+
+def bulk_check_in(user, asset_tags, condition_in=None):
+    """
+    Return a cart of devices in one transaction: close each open checkout
+    and flip its device back to AVAILABLE. Returns one result per tag.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        open_checkouts = {
+            tag: (pk, device_id, borrower)
+            for tag, pk, device_id, borrower in Checkout.objects.select_for_update(of=("self",))
+            .filter(
+                created_by=user,
+                device__asset_tag__in=asset_tags,
+                returned_at__isnull=True,
+            )
+            .values_list("device__asset_tag", "pk", "device_id", "device__current_borrower")
+        }
+        known_tags = set(
+            Device.objects.filter(created_by=user, asset_tag__in=asset_tags).values_list(
+                "asset_tag", flat=True
+            )
+        )
+
+        results = []
+        returned = set()
+        for tag in asset_tags:
+            if tag not in known_tags:
+                results.append(_result(tag, "not_found", "Unknown asset tag."))
+            elif tag not in open_checkouts or tag in returned:
+                results.append(_result(tag, "conflict", "Device is not checked out."))
+            else:
+                returned.add(tag)
+                results.append(_result(tag, "ok", "Returned."))
+
+        Checkout.objects.filter(pk__in=[open_checkouts[tag][0] for tag in returned]).update(
+            returned_at=now, condition_in=condition_in
+        )
+        returned_ids = [open_checkouts[tag][1] for tag in returned]
+        Device.objects.filter(pk__in=returned_ids).update(
+            status="AVAILABLE", current_checkout=None, current_borrower=""
+        )
+        DeviceEvent.objects.bulk_create(
+            DeviceEvent(
+                device_id=device_id,
+                kind="RETURNED",
+                new_value="AVAILABLE",
+                checkout_id=pk,
+                borrower=borrower,
+            )
+            for pk, device_id, borrower in (open_checkouts[tag] for tag in returned)
+        )
+        invalidate_lookups(returned_ids)
+    invalidate_dashboard(user.pk)
+    return results
+
+
+# ======================
+#  CURRENT CHECKOUT REPAIR
+# ======================
+def rebuild_current_checkouts(devices=None):
+    """
+    Recompute Device.current_checkout and current_borrower from the open
+    checkouts in a single UPDATE. Returns the number of devices written.
+    """
+    devices = Device.objects.all() if devices is None else devices
+    open_checkout = Checkout.objects.filter(device=OuterRef("pk"), returned_at__isnull=True).order_by()
+    borrower_name = Case(
+        When(student__isnull=False, then=Concat("student__first_name", Value(" "), "student__last_name")),
+        When(staff__isnull=False, then=Concat("staff__first_name", Value(" "), "staff__last_name")),
+        default=Value(""),
+    )
+    return devices.update(
+        current_checkout=Subquery(open_checkout.values("pk")[:1]),
+        current_borrower=Coalesce(
+            Subquery(open_checkout.annotate(name=borrower_name).values("name")[:1]), Value("")
+        ),
+    )
+
+
+def _result(asset_tag, result, message):
+    return {"asset_tag": asset_tag, "result": result, "message": message}
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .analytics import checkout_changed_days, mark_dirty_days
+from .auth import forget_session, forget_user
+from .dashboard import invalidate_dashboard
+from .lookup import invalidate_lookups
+from .models import Student, Staff, Device, Checkout, DeviceEvent
+
+
+@receiver([post_save, post_delete], sender=Student)
+@receiver([post_save, post_delete], sender=Staff)
+@receiver([post_save, post_delete], sender=Device)
+@receiver([post_save, post_delete], sender=Checkout)
+def refresh_dashboard(sender, instance, **kwargs):
+    invalidate_dashboard(instance.created_by_id)
+
+
+@receiver([post_save, post_delete], sender=Device)
+def refresh_device_lookup(sender, instance, **kwargs):
+    invalidate_lookups([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Checkout)
+def refresh_checkout_lookup(sender, instance, **kwargs):
+    invalidate_lookups([instance.device_id])
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Staff)
+def refresh_current_borrower(sender, instance, created, **kwargs):
+    # Keep the borrower name denormalized on Device in step with renames,
+    # and retire the scanner lookups that cached the old one.
+    if created:
+        return
+    held = list(
+        Device.objects.filter(**{f"current_checkout__{sender._meta.model_name}": instance}).values_list(
+            "pk", flat=True
+        )
+    )
+    if held:
+        Device.objects.filter(pk__in=held).update(current_borrower=f"{instance.first_name} {instance.last_name}")
+        invalidate_lookups(held)
+
+
+@receiver(post_delete, sender=Checkout)
+def log_checkout_deleted(sender, instance, origin=None, **kwargs):
+    # Deleting the device takes its events with it; nothing to log.
+    if isinstance(origin, Device):
+        return
+    DeviceEvent.objects.create(
+        device_id=instance.device_id, kind="CHECKOUT_DELETED", checkout_id=instance.pk
+    )
+
+
+@receiver(post_save, sender=Checkout)
+def mark_rollup_days(sender, instance, **kwargs):
+    # Only backdated edits touch days the nightly rollup won't re-roll anyway.
+    mark_dirty_days(instance.created_by_id, checkout_changed_days(instance))
+
+
+@receiver(post_delete, sender=Checkout)
+def mark_rollup_days_deleted(sender, instance, **kwargs):
+    mark_dirty_days(instance.created_by_id, checkout_changed_days(instance, deleted=True))
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def refresh_cached_user(sender, instance, **kwargs):
+    # Password changes and deactivation must reach every cached copy.
+    forget_user(instance.pk)
+
+
+@receiver(post_delete, sender=Session)
+def refresh_cached_session(sender, instance, **kwargs):
+    # Sessions deleted in bulk (admin, shell) must stop working at once.
+    forget_session(instance.session_key)
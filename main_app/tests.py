@@ -1,3 +1,1552 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipIf
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, router
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.test import AsyncClient, AsyncRequestFactory, Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from prometheus_client import CollectorRegistry
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from config.database import tune_database
+
+from . import async_views, metrics
+from .admin import EstimatedCountPaginator
+from .analytics import local_day, run_rollups
+from .autocomplete import PICKERS, _prefix_queries
+from .auth import CachedAuthenticationMiddleware, cached_auth, forget_session, forget_user
+from .dashboard import dashboard_querysets, get_dashboard
+from .history import archive_checkouts
+from .loadtest import find_knee, response_cookies
+from .lookup import lookup_cache, lookup_device
+from .management.commands.loadtest import parse_mix
+from .models import (
+    ArchivedCheckout,
+    ArchivedDeviceEvent,
+    Checkout,
+    DailyRollup,
+    Device,
+    DeviceEvent,
+    OverdueNotice,
+    RollupDirtyDay,
+    Staff,
+    Student,
+)
+from .pagination import keyset_filter
+from .replicas import PIN_COOKIE, ReplicaMiddleware, use_replica
+from .services import bulk_check_in, bulk_check_out
+
+
+def make_checkouts(user, count, start=0, due_back_at=None):
+    """Create count open checkouts, alternating student and staff borrowers."""
+    checkouts = []
+    for i in range(start, start + count):
+        device = Device.objects.create(
+            asset_tag=f"AT{i:05}", serial_number=f"SN{i:05}", created_by=user
+        )
+        if i % 2:
+            borrower = {
+                "staff": Staff.objects.create(
+                    first_name="Staff",
+                    last_name=f"{i}",
+                    email=f"staff{i}@example.com",
+                    role="Teacher",
+                    created_by=user,
+                )
+            }
+        else:
+            borrower = {
+                "student": Student.objects.create(
+                    first_name="Student",
+                    last_name=f"{i}",
+                    student_id=f"ST{i:05}",
+                    grade_level="5",
+                    created_by=user,
+                )
+            }
+        checkouts.append(
+            Checkout.objects.create(
+                device=device,
+                condition_out="GOOD",
+                due_back_at=due_back_at,
+                created_by=user,
+                **borrower,
+            )
+        )
+    return checkouts
+
+
+# ======================
+#  BULK IMPORT
+# ======================
+class ImportAssetsTests(TestCase):
+    CSV = (
+        "asset_tag,serial_number,model,status\n"
+        "NEW1,SN-NEW1,C100,AVAILABLE\n"  # line 2: new
+        "OLD1,SN-OLD1,C200,AVAILABLE\n"  # line 3: model changed
+        "OLD2,SN-OLD2,C100,AVAILABLE\n"  # line 4: unchanged
+        "BAD1,SN-BAD1,C100,BROKEN\n"  # line 5: invalid status
+        "THEIRS,SN-THEIRS,C100,AVAILABLE\n"  # line 6: another user's device
+        "NEW1,SN-NEW2,C100,AVAILABLE\n"  # line 7: repeats line 2's tag
+    )
+
+    def setUp(self):
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        other = User.objects.create_user("other", "other@example.com", "pw")
+        for tag, owner in (("OLD1", self.user), ("OLD2", self.user), ("THEIRS", other)):
+            Device.objects.create(asset_tag=tag, serial_number=f"SN-{tag}", model="C100", created_by=owner)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def run_import(self, content, name="devices.csv", **options):
+        path = Path(self.tmp.name) / name
+        path.write_text(content)
+        out, err = StringIO(), StringIO()
+        call_command("import_assets", "devices", str(path), user="it", stdout=out, stderr=err, **options)
+        return out.getvalue().strip(), err.getvalue().splitlines()
+
+    def test_upserts_and_reports_each_row(self):
+        out, err = self.run_import(self.CSV)
+        self.assertEqual(out, "1 created, 1 updated, 1 unchanged, 3 rejected")
+        self.assertEqual([line.split(":")[0] for line in err], ["line 5", "line 6", "line 7"])
+        self.assertIn("status", err[0])
+        self.assertIn("owned by another user", err[1])
+        self.assertEqual(Device.objects.get(asset_tag="OLD1").model, "C200")
+        self.assertEqual(Device.objects.get(asset_tag="NEW1").created_by, self.user)
+        self.assertEqual(Device.objects.get(asset_tag="THEIRS").created_by.username, "other")
+        self.assertFalse(Device.objects.filter(asset_tag="BAD1").exists())
+
+    def test_dry_run_saves_nothing(self):
+        events = DeviceEvent.objects.count()
+        out, err = self.run_import(self.CSV, dry_run=True)
+        self.assertEqual(out, "1 created, 1 updated, 1 unchanged, 3 rejected (dry run, nothing saved)")
+        self.assertEqual(len(err), 3)
+        self.assertFalse(Device.objects.filter(asset_tag="NEW1").exists())
+        self.assertEqual(Device.objects.get(asset_tag="OLD1").model, "C100")
+        self.assertEqual(DeviceEvent.objects.count(), events)
+
+    def test_jsonl(self):
+        content = '{"asset_tag": "NEW1", "serial_number": "SN-NEW1"}\nnot json\n["a list"]\n'
+        out, err = self.run_import(content, name="devices.jsonl")
+        self.assertEqual(out, "1 created, 0 updated, 0 unchanged, 2 rejected")
+        self.assertEqual([line.split(":")[0] for line in err], ["line 2", "line 3"])
+
+
+# ======================
+#  CHECKOUT QUERY COUNTS
+# ======================
+class CheckoutQueryCountTests(TestCase):
+    """Rendering checkouts must not cost extra queries per row."""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser("it", "it@example.com", "pw")
+        self.client.force_login(self.user)
+
+    def assertFlatQueries(self, url):
+        """Same number of queries for 2 rows as for 12."""
+        yesterday = timezone.now().date() - timedelta(days=1)
+        self.client.get(url)  # the first request caches the logged-in user
+        make_checkouts(self.user, 2, due_back_at=yesterday)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        make_checkouts(self.user, 10, start=2, due_back_at=yesterday)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(len(small), len(large))
+
+    def test_checkout_list(self):
+        self.assertFlatQueries(reverse("checkout-list"))
+
+    def test_dashboard(self):
+        self.assertFlatQueries(reverse("dashboard"))
+
+    def test_device_list(self):
+        self.assertFlatQueries(reverse("device-list"))
+
+    def test_admin_changelist(self):
+        self.assertFlatQueries(reverse("admin:main_app_checkout_changelist"))
+
+    def test_str_and_borrower_need_no_queries(self):
+        make_checkouts(self.user, 2)
+        checkouts = list(Checkout.objects.all())
+        with self.assertNumQueries(0):
+            for checkout in checkouts:
+                str(checkout)
+                str(checkout.borrower)
+
+
+# ======================
+#  ADMIN AT SCALE
+# ======================
+@mock.patch.object(EstimatedCountPaginator, "EXACT_LIMIT", 5)
+class AdminScalingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser("it", "it@example.com", "pw")
+        self.client.force_login(self.user)
+        self.client.get(reverse("admin:index"))  # warm the session and user cache
+        self.checkouts = make_checkouts(self.user, 8)
+
+    def changelist(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("admin:main_app_checkout_changelist"), params)
+        self.assertEqual(response.status_code, 200)
+        return response, [q["sql"] for q in queries]
+
+    def test_big_tables_are_estimated_not_counted(self):
+        response, queries = self.changelist()
+        self.assertFalse([sql for sql in queries if "COUNT(" in sql], queries)
+        self.assertEqual(response.context["cl"].result_count, 8)
+
+    def test_filtered_counts_stop_at_the_limit(self):
+        response, queries = self.changelist(returned_at__isnull="True")
+        self.assertEqual(response.context["cl"].result_count, 6)
+        self.assertIn("LIMIT 6", " ".join(queries))
+
+    def test_search_goes_through_the_device_and_student_indexes(self):
+        response, _ = self.changelist(q="AT00003")
+        self.assertEqual(list(response.context["cl"].result_list), [self.checkouts[3]])
+        response, _ = self.changelist(q="ST00002")
+        self.assertEqual(list(response.context["cl"].result_list), [self.checkouts[2]])
+
+    def test_forms_use_autocomplete_not_full_selects(self):
+        response = self.client.get(reverse("admin:main_app_checkout_add"))
+        self.assertContains(response, "admin-autocomplete")
+        self.assertNotContains(response, "AT00003")
+        response = self.client.get(reverse("admin:main_app_device_change", args=[self.checkouts[0].device_id]))
+        self.assertNotContains(response, 'name="current_checkout"')
+
+
+# ======================
+#  CHECKOUT CREATE
+# ======================
+class CheckoutCreateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        self.client.force_login(self.user)
+        self.device = Device.objects.create(asset_tag="AT1", serial_number="SN1", created_by=self.user)
+        self.student = Student.objects.create(
+            first_name="Ada", last_name="L", student_id="S1", grade_level="5", created_by=self.user
+        )
+
+    def post_checkout(self):
+        return self.client.post(
+            reverse("checkout-create"),
+            {"device": self.device.pk, "student": self.student.pk, "condition_out": "GOOD"},
+        )
+
+    def test_checks_out_device(self):
+        self.assertEqual(self.post_checkout().status_code, 302)
+        self.device.refresh_from_db()
+        self.assertEqual(self.device.status, "CHECKED_OUT")
+        self.assertEqual(self.device.current_checkout, Checkout.objects.get())
+        self.assertEqual(self.device.current_borrower, "Ada L")
+
+    def test_second_open_checkout_is_a_form_error(self):
+        self.post_checkout()
+        response = self.post_checkout()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "This device is already checked out.")
+        self.assertEqual(Checkout.objects.count(), 1)
+
+    def test_race_on_the_index_is_a_form_error(self):
+        self.post_checkout()
+        # Pretend the other request committed after our form validated.
+        with mock.patch.object(Checkout, "validate_constraints"):
+            response = self.post_checkout()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "This device is already checked out.")
+        self.assertEqual(Checkout.objects.count(), 1)
+
+    def test_unlendable_devices_are_a_form_error(self):
+        for status in ("REPAIR", "LOST", "RETIRED"):
+            Device.objects.filter(pk=self.device.pk).update(status=status)
+            response = self.post_checkout()
+            self.assertEqual(response.status_code, 200, status)
+            self.assertFormError(
+                response.context["form"],
+                "device",
+                "Select a valid choice. That choice is not one of the available choices.",
+            )
+        self.assertFalse(Checkout.objects.exists())
+
+    def test_editing_keeps_a_device_sent_to_repair_since(self):
+        self.post_checkout()
+        checkout = Checkout.objects.get()
+        Device.objects.filter(pk=self.device.pk).update(status="REPAIR")
+        response = self.client.post(
+            reverse("checkout-update", args=[checkout.pk]),
+            {"device": self.device.pk, "student": self.student.pk, "condition_out": "GOOD", "comments": "cracked"},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Checkout.objects.get().comments, "cracked")
+
+    def test_return_makes_device_available(self):
+        self.post_checkout()
+        checkout = Checkout.objects.get()
+        response = self.client.post(
+            reverse("checkout-update", args=[checkout.pk]),
+            {
+                "device": self.device.pk,
+                "student": self.student.pk,
+                "returned_at": "2026-01-01 10:00",
+                "condition_out": "GOOD",
+                "condition_in": "GOOD",
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.device.refresh_from_db()
+        self.assertEqual(self.device.status, "AVAILABLE")
+        self.assertIsNone(self.device.current_checkout)
+
+
+# ======================
+#  BULK CHECKOUT / RETURN
+# ======================
+class BulkEndpointTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        self.client.force_login(self.user)
+        make_checkouts(self.user, 2)
+        bulk_check_in(self.user, ["AT00000", "AT00001"])
+        Device.objects.create(asset_tag="AT00002", serial_number="SN00002", status="REPAIR", created_by=self.user)
+
+    def post(self, name, payload):
+        return self.client.post(reverse(name), json.dumps(payload), content_type="application/json")
+
+    def results(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [(r["asset_tag"], r["result"]) for r in response.json()["results"]]
+
+    def test_check_out_and_return(self):
+        response = self.post(
+            "checkout-bulk",
+            {
+                "items": [
+                    {"asset_tag": "AT00000", "borrower": "ST00000"},
+                    {"asset_tag": "AT00001", "borrower": "staff1@example.com"},
+                    {"asset_tag": "AT00000", "borrower": "ST00000"},
+                    {"asset_tag": "AT00002", "borrower": "ST00000"},
+                    {"asset_tag": "NOPE", "borrower": "ST00000"},
+                ],
+                "due_back_at": "2030-01-31",
+            },
+        )
+        self.assertEqual(
+            self.results(response),
+            [("AT00000", "ok"), ("AT00001", "ok"), ("AT00000", "conflict"), ("AT00002", "conflict"), ("NOPE", "not_found")],
+        )
+        self.assertEqual(Device.objects.get(asset_tag="AT00002").status, "REPAIR")
+        self.assertEqual(Checkout.objects.filter(returned_at__isnull=True).count(), 2)
+
+        response = self.post("checkout-bulk-return", {"asset_tags": ["AT00001", "AT00002"], "condition_in": "FAIR"})
+        self.assertEqual(self.results(response), [("AT00001", "ok"), ("AT00002", "conflict")])
+        self.assertEqual(Device.objects.get(asset_tag="AT00001").status, "AVAILABLE")
+
+    def test_bad_payloads_are_400(self):
+        item = {"asset_tag": "AT00000", "borrower": "ST00000"}
+        for payload in (
+            {"items": "AT00000"},
+            {"items": [item], "due_back_at": "2026-02-30"},
+            {"items": [item], "due_back_at": 5},
+            {"items": [item], "condition_out": ["GOOD"]},
+            {"items": [item], "comments": None},
+        ):
+            self.assertEqual(self.post("checkout-bulk", payload).status_code, 400, payload)
+        for payload in ({"tags": []}, {"asset_tags": ["AT00000"], "condition_in": "SHINY"}):
+            self.assertEqual(self.post("checkout-bulk-return", payload).status_code, 400, payload)
+        self.assertFalse(Checkout.objects.filter(returned_at__isnull=True).exists())
+
+    def test_needs_login(self):
+        self.client.logout()
+        self.assertEqual(self.post("checkout-bulk", {"items": []}).status_code, 302)
+
+
+# ======================
+#  CURRENT CHECKOUT POINTER
+# ======================
+class CurrentCheckoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        self.client.force_login(self.user)
+        make_checkouts(self.user, 2)
+
+    def holders(self):
+        return dict(Device.objects.values_list("asset_tag", "current_borrower"))
+
+    def test_bulk_services(self):
+        bulk_check_in(self.user, ["AT00000"])
+        self.assertEqual(self.holders(), {"AT00000": "", "AT00001": "Staff 1"})
+        bulk_check_out(self.user, [("AT00000", "ST00000")])
+        device = Device.objects.get(asset_tag="AT00000")
+        self.assertEqual(device.current_borrower, "Student 0")
+        self.assertEqual(device.current_checkout.returned_at, None)
+
+    def test_rename_updates_holder(self):
+        student = Student.objects.get()
+        student.first_name = "Renamed"
+        student.save()
+        self.assertEqual(self.holders()["AT00000"], "Renamed 0")
+
+    def test_editing_an_open_checkout_keeps_the_device_status(self):
+        checkout = Checkout.objects.get(device__asset_tag="AT00000")
+        device = checkout.device
+        device.status = "REPAIR"
+        device.save()
+        events = DeviceEvent.objects.count()
+        checkout.comments = "Cracked hinge"
+        checkout.save()
+        device.refresh_from_db()
+        self.assertEqual((device.status, device.current_borrower), ("REPAIR", "Student 0"))
+        self.assertEqual(DeviceEvent.objects.count(), events)
+
+        spare = Device.objects.create(asset_tag="AT00009", serial_number="SN00009", created_by=self.user)
+        checkout.device = spare
+        checkout.save()
+        spare.refresh_from_db()
+        self.assertEqual(spare.status, "CHECKED_OUT")
+        self.assertEqual(Device.objects.get(pk=device.pk).status, "AVAILABLE")
+
+    def test_repair_command(self):
+        expected = dict(Device.objects.values_list("asset_tag", "current_checkout"))
+        Device.objects.update(current_checkout=None, current_borrower="")
+        call_command("repair_current_checkouts", stdout=StringIO())
+        self.assertEqual(dict(Device.objects.values_list("asset_tag", "current_checkout")), expected)
+        self.assertEqual(self.holders(), {"AT00000": "Student 0", "AT00001": "Staff 1"})
+
+    def test_pages_show_holder(self):
+        self.assertContains(self.client.get(reverse("device-list")), "Staff 1")
+        device = Device.objects.get(asset_tag="AT00000")
+        self.assertContains(self.client.get(reverse("device-detail", args=[device.pk])), "Student 0")
+
+
+# ======================
+#  DEVICE EVENT LOG
+# ======================
+class DeviceEventTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        self.client.force_login(self.user)
+        self.checkout = make_checkouts(self.user, 1)[0]
+        self.device = Device.objects.get()
+
+    def kinds(self):
+        return list(
+            DeviceEvent.objects.filter(device=self.device)
+            .order_by("created_at", "id")
+            .values_list("kind", "old_value", "new_value", "borrower")
+        )
+
+    def test_change_history(self):
+        self.checkout.returned_at = timezone.now()
+        self.checkout.save()
+        device = Device.objects.get()
+        device.status = "REPAIR"
+        device.condition = "POOR"
+        device.save()
+        self.checkout.delete()
+        self.assertEqual(
+            self.kinds(),
+            [
+                ("STATUS", "", "AVAILABLE", ""),
+                ("CONDITION", "", "GOOD", ""),
+                ("CHECKED_OUT", "", "CHECKED_OUT", "Student 0"),
+                ("RETURNED", "", "AVAILABLE", "Student 0"),
+                ("STATUS", "AVAILABLE", "REPAIR", ""),
+                ("CONDITION", "GOOD", "POOR", ""),
+                ("CHECKOUT_DELETED", "", "", ""),
+            ],
+        )
+
+    def test_append_only(self):
+        event = DeviceEvent.objects.first()
+        with self.assertRaises(ValueError):
+            event.save()
+
+    def test_timeline_is_one_query(self):
+        url = reverse("device-timeline", args=[self.device.pk])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as small:
+            self.assertContains(self.client.get(url), "Student 0")
+        DeviceEvent.objects.bulk_create(
+            DeviceEvent(device=self.device, kind="STATUS", new_value="REPAIR") for _ in range(300)
+        )
+        with CaptureQueriesContext(connection) as large:
+            self.assertContains(self.client.get(url), "Next")
+        self.assertEqual(len(small), len(large))
+
+        self.client.force_login(User.objects.create_user("other"))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_archive(self):
+        DeviceEvent.objects.filter(kind="CHECKED_OUT").update(
+            created_at=timezone.now() - timedelta(days=400)
+        )
+        call_command("archive_device_events", days=365, batch_size=1, stdout=StringIO())
+        self.assertEqual(list(ArchivedDeviceEvent.objects.values_list("kind", flat=True)), ["CHECKED_OUT"])
+        self.assertFalse(DeviceEvent.objects.filter(kind="CHECKED_OUT").exists())
+
+        response = self.client.get(reverse("device-timeline", args=[self.device.pk]))
+        self.assertEqual(
+            [event.kind for event in response.context["object_list"]], ["CONDITION", "STATUS", "CHECKED_OUT"]
+        )
+
+    def test_admin_cannot_delete_events(self):
+        admin_user = User.objects.create_superuser("root", "root@example.com", "pw")
+        self.client.force_login(admin_user)
+        call_command("archive_device_events", days=0, stdout=StringIO())
+        event = ArchivedDeviceEvent.objects.first()
+        response = self.client.get(reverse("admin:main_app_archiveddeviceevent_delete", args=[event.pk]))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(
+            reverse("admin:main_app_archiveddeviceevent_changelist"),
+            {"action": "delete_selected", "_selected_action": [event.pk]},
+        )
+        self.assertEqual(ArchivedDeviceEvent.objects.count(), 3)
+        response = self.client.get(reverse("admin:main_app_deviceevent_changelist"))
+        self.assertNotContains(response, "delete_selected")
+
+
+# ======================
+#  CHECKOUT ARCHIVE
+# ======================
+class CheckoutArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        self.client.force_login(self.user)
+        self.checkouts = make_checkouts(self.user, 3)
+        # Two returned long ago, one still open.
+        for days, checkout in zip((500, 400), self.checkouts):
+            Checkout.objects.filter(pk=checkout.pk).update(
+                checked_out_at=timezone.now() - timedelta(days=days + 10),
+                returned_at=timezone.now() - timedelta(days=days),
+            )
+        self.events = DeviceEvent.objects.count()
+        call_command("archive_checkouts", days=365, batch_size=1, stdout=StringIO())
+
+    def test_moves_old_returned_checkouts(self):
+        self.assertEqual(
+            sorted(ArchivedCheckout.objects.values_list("pk", flat=True)),
+            sorted(c.pk for c in self.checkouts[:2]),
+        )
+        self.assertEqual(list(Checkout.objects.values_list("pk", flat=True)), [self.checkouts[2].pk])
+        self.assertEqual(DeviceEvent.objects.count(), self.events)
+
+    def test_list_pages_across_both_tables(self):
+        with mock.patch("main_app.views.CheckoutList.page_size", 2):
+            first = self.client.get(reverse("checkout-list")).context
+            second = self.client.get(reverse("checkout-list"), {"after": first["next_cursor"]}).context
+        newest_first = [c.pk for c in reversed(self.checkouts)]
+        self.assertEqual([c.pk for c in first["object_list"]], newest_first[:2])
+        self.assertEqual([c.pk for c in second["object_list"]], newest_first[2:])
+
+    def test_detail_and_export_read_archive(self):
+        response = self.client.get(reverse("checkout-detail", args=[self.checkouts[0].pk]))
+        self.assertContains(response, "(archived)")
+        self.assertNotContains(response, reverse("checkout-update", args=[self.checkouts[0].pk]))
+        response = self.client.get(reverse("export", args=["checkouts"]))
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 4)
+
+
+# ======================
+#  SEARCH
+# ======================
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        self.client.force_login(self.user)
+        for tag, serial, model in (
+            ("AA9", "SN-AA9", "XAB123Y"),  # contains the term
+            ("AB1234", "SN-AB1234", "C100"),  # asset tag starts with it
+            ("ZZ1", "AB123", "C100"),  # exact serial number
+            ("AB123", "SN-AB123", "C100"),  # exact asset tag
+            ("QQ1", "SN-QQ1", "C100"),  # no match
+        ):
+            Device.objects.create(asset_tag=tag, serial_number=serial, model=model, created_by=self.user)
+
+    def search(self, name, q):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name), {"q": q})
+        sql = " ".join(query["sql"] for query in queries)
+        return response.context["object_list"], sql
+
+    def test_exact_identifiers_rank_first(self):
+        devices, _ = self.search("device-list", "ab123")
+        self.assertEqual([d.asset_tag for d in devices], ["AB123", "ZZ1", "AB1234", "AA9"])
+        # Too many matches to rank outright, but some start with the term.
+        with mock.patch("main_app.search.RANK_ALL_UP_TO", 1):
+            devices, _ = self.search("device-list", "ab123")
+        self.assertEqual([d.asset_tag for d in devices], ["AB123", "ZZ1", "AB1234", "AA9"])
+
+    def test_exact_student_id_ranks_first(self):
+        for first, last, student_id in (("Ada", "S100", "S1001"), ("Bo", "Lee", "S100"), ("Cy", "Abel", "X9")):
+            Student.objects.create(
+                first_name=first, last_name=last, student_id=student_id, grade_level="5", created_by=self.user
+            )
+        students, _ = self.search("student-list", "S100")
+        self.assertEqual([s.student_id for s in students], ["S100", "S1001"])
+
+    def test_few_matches_are_ranked_by_id(self):
+        with CaptureQueriesContext(connection) as queries:
+            devices, _ = self.search("device-list", "ab123")
+        self.assertEqual([d.asset_tag for d in devices], ["AB123", "ZZ1", "AB1234", "AA9"])
+        self.assertIn("CASE", queries[-1]["sql"])
+        self.assertNotIn("MATCH", queries[-1]["sql"])
+
+    @mock.patch("main_app.search.RANK_ALL_UP_TO", 1)
+    def test_unranked_when_nothing_starts_with_the_term(self):
+        devices, sql = self.search("device-list", "-ab12")
+        self.assertNotIn("CASE", sql)
+        self.assertEqual([d.asset_tag for d in devices], ["AB123", "AB1234"])
+        with mock.patch("main_app.views.DeviceList.page_size", 1):
+            response = self.client.get(reverse("device-list"), {"q": "-ab12"})
+            second = self.client.get(
+                reverse("device-list"), {"q": "-ab12", "after": response.context["next_cursor"]}
+            )
+        self.assertEqual([d.asset_tag for d in second.context["object_list"]], ["AB1234"])
+
+    def test_long_terms_use_the_index(self):
+        devices, sql = self.search("device-list", "b12")
+        self.assertIn("MATCH", sql)
+        self.assertEqual({d.asset_tag for d in devices}, {"AA9", "AB1234", "ZZ1", "AB123"})
+
+    def test_short_terms_fall_back_to_icontains(self):
+        devices, sql = self.search("device-list", "q1")
+        self.assertNotIn("MATCH", sql)
+        self.assertEqual([d.asset_tag for d in devices], ["QQ1"])
+        devices, _ = self.search("device-list", "zz1 ab")
+        self.assertEqual([d.asset_tag for d in devices], ["ZZ1"])
+
+    def test_index_follows_edits(self):
+        Device.objects.filter(asset_tag="QQ1").update(model="NEWMODEL")
+        devices, _ = self.search("device-list", "newmod")
+        self.assertEqual([d.asset_tag for d in devices], ["QQ1"])
+
+
+# ======================
+#  KEYSET PAGINATION
+# ======================
+def cursor_for(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        self.client.force_login(self.user)
+        self.checkouts = make_checkouts(self.user, 5)
+        for days, checkout in enumerate(self.checkouts):
+            Checkout.objects.filter(pk=checkout.pk).update(checked_out_at=timezone.now() - timedelta(days=5 - days))
+
+    def page(self, **params):
+        with mock.patch("main_app.views.CheckoutList.page_size", 2):
+            ctx = self.client.get(reverse("checkout-list"), params).context
+        return [c.pk for c in ctx["object_list"]], ctx["prev_cursor"], ctx["next_cursor"]
+
+    def test_forward_back_and_last_page(self):
+        newest_first = [c.pk for c in reversed(self.checkouts)]
+        first, prev, next_cursor = self.page()
+        self.assertEqual((first, prev), (newest_first[:2], None))
+        second, _, next_cursor = self.page(after=next_cursor)
+        self.assertEqual(second, newest_first[2:4])
+        last, prev, next_cursor = self.page(after=next_cursor)
+        self.assertEqual((last, next_cursor), (newest_first[4:], None))
+        back, _, _ = self.page(before=prev)
+        self.assertEqual(back, newest_first[2:4])
+
+    def test_search_is_kept_in_cursor_links(self):
+        with mock.patch("main_app.views.DeviceList.page_size", 2):
+            response = self.client.get(reverse("device-list"), {"q": "AT000"})
+            self.assertContains(response, "?q=AT000&amp;after=")
+            second = self.client.get(
+                reverse("device-list"), {"q": "AT000", "after": response.context["next_cursor"]}
+            )
+        self.assertEqual([d.asset_tag for d in second.context["object_list"]], ["AT00002", "AT00003"])
+        self.assertContains(second, "?q=AT000&amp;before=")
+
+    def test_tampered_cursors_are_404(self):
+        for cursor in ("not-a-cursor", cursor_for(["x", 1]), cursor_for([{"a": 1}, 1]), cursor_for([None, 1]), cursor_for([1])):
+            for direction in ("after", "before"):
+                response = self.client.get(reverse("checkout-list"), {direction: cursor})
+                self.assertEqual(response.status_code, 404, (direction, cursor))
+
+
+# ======================
+#  DASHBOARD CACHE
+# ======================
+@override_settings(DASHBOARD_CACHE_SECONDS=60)
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        self.checkouts = make_checkouts(self.user, 2, due_back_at=timezone.now().date())
+        self.assertEqual(self.dashboard()["devices_out"], 2)
+
+    def dashboard(self):
+        return get_dashboard(self.user)
+
+    def borrowers(self):
+        return [checkout.borrower_name for checkout in self.dashboard()["due_today"]]
+
+    def test_cached_until_a_write(self):
+        Device.objects.filter(created_by=self.user).update(status="AVAILABLE")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.dashboard()["devices_out"], 2)
+
+    def test_uncached_without_a_shared_cache(self):
+        cache.clear()
+        with override_settings(DASHBOARD_CACHE_SECONDS=0):
+            Device.objects.filter(created_by=self.user).update(status="AVAILABLE")
+            self.assertEqual(self.dashboard()["devices_out"], 0)
+            self.assertIsNone(cache.get(f"dashboard:{self.user.pk}"))
+
+    def test_device_writes(self):
+        device = Device.objects.create(asset_tag="NEW1", serial_number="SN-NEW1", created_by=self.user)
+        self.assertEqual(self.dashboard()["devices_available"], 1)
+        device.delete()
+        self.assertEqual(self.dashboard()["devices_available"], 0)
+
+    def test_checkout_writes(self):
+        checkout = self.checkouts[0]
+        checkout.returned_at = timezone.now()
+        checkout.save()
+        data = self.dashboard()
+        self.assertEqual((data["devices_out"], data["due_today_count"]), (1, 1))
+        self.checkouts[1].delete()
+        self.assertEqual(self.dashboard()["due_today_count"], 0)
+
+    def test_bulk_check_out_and_in(self):
+        Device.objects.create(asset_tag="NEW1", serial_number="SN-NEW1", created_by=self.user)
+        self.assertEqual(self.dashboard()["devices_available"], 1)
+        bulk_check_out(self.user, [("NEW1", "ST00000")])
+        self.assertEqual(self.dashboard()["devices_out"], 3)
+        bulk_check_in(self.user, ["NEW1", "AT00000"])
+        self.assertEqual(self.dashboard()["devices_out"], 1)
+
+    def test_bulk_import(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as fh:
+            fh.write("asset_tag,serial_number\nNEW1,SN-NEW1\n")
+            fh.flush()
+            call_command("import_assets", "devices", fh.name, user="it", stdout=StringIO())
+        self.assertEqual(self.dashboard()["devices_available"], 1)
+
+    def test_borrower_renames(self):
+        self.assertEqual(self.borrowers(), ["Student 0", "Staff 1"])
+        staff = self.checkouts[1].staff
+        staff.last_name = "Lovelace"
+        staff.save()
+        self.assertEqual(self.borrowers(), ["Student 0", "Staff Lovelace"])
+        student = self.checkouts[0].student
+        student.first_name = "Ada"
+        student.save()
+        self.assertEqual(self.borrowers(), ["Ada 0", "Staff Lovelace"])
+
+
+# ======================
+#  EXPORTS
+# ======================
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        self.client.force_login(self.user)
+        self.checkouts = make_checkouts(self.user, 3)
+        Checkout.objects.filter(pk=self.checkouts[0].pk).update(
+            checked_out_at=timezone.now() - timedelta(days=30), returned_at=timezone.now()
+        )
+        Device.objects.filter(asset_tag="AT00002").update(status="REPAIR")
+        other = User.objects.create_user("other", "other@example.com", "pw")
+        make_checkouts(other, 2, start=10)
+
+    def export(self, kind, **params):
+        response = self.client.get(reverse("export", args=[kind]), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return b"".join(response.streaming_content).decode()
+
+    def test_streams_only_the_users_rows(self):
+        lines = self.export("devices").splitlines()
+        self.assertEqual(lines[0].split(",")[0], "asset_tag")
+        self.assertEqual([line.split(",")[0] for line in lines[1:]], ["AT00000", "AT00001", "AT00002"])
+        rows = [json.loads(line) for line in self.export("checkouts", format="jsonl").splitlines()]
+        self.assertEqual([row["id"] for row in rows], [c.pk for c in self.checkouts])
+        self.assertEqual(rows[1]["staff_email"], "staff1@example.com")
+
+    def test_filters(self):
+        self.assertEqual(len(self.export("devices", status="REPAIR").splitlines()), 2)
+        self.assertEqual(len(self.export("checkouts", status="open").splitlines()), 3)
+        self.assertEqual(len(self.export("checkouts", status="returned").splitlines()), 2)
+        today = timezone.localdate()
+        self.assertEqual(len(self.export("checkouts", start=today.isoformat()).splitlines()), 3)
+        self.assertEqual(len(self.export("checkouts", end=(today - timedelta(days=1)).isoformat()).splitlines()), 2)
+
+    def test_bad_dates_are_rejected(self):
+        for value in ("2026-02-30", "yesterday"):
+            response = self.client.get(reverse("export", args=["checkouts"]), {"start": value})
+            self.assertEqual(response.status_code, 400)
+        with self.assertRaises(CommandError):
+            call_command("export_data", "checkouts", user="it", end="2026-02-30", stdout=StringIO())
+
+
+# ======================
+#  ANALYTICS ROLLUPS
+# ======================
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        self.client.force_login(self.user)
+        self.checkouts = make_checkouts(self.user, 3)
+        Device.objects.update(model="C100", manufacturer="Acme")
+        now = timezone.now()
+        # A student's checkout returned a week ago after three days, and a
+        # staff checkout open for two days; the third was opened just now.
+        Checkout.objects.filter(pk=self.checkouts[0].pk).update(
+            checked_out_at=now - timedelta(days=10), returned_at=now - timedelta(days=7)
+        )
+        Checkout.objects.filter(pk=self.checkouts[1].pk).update(checked_out_at=now - timedelta(days=2))
+        self.today = timezone.localdate()
+        self.run = run_rollups()
+
+    def rollup(self, days_ago, dimension="MODEL", key="C100"):
+        day = self.today - timedelta(days=days_ago)
+        return DailyRollup.objects.filter(dimension=dimension, key=key, day=day).first()
+
+    def test_first_run_rolls_up_all_history(self):
+        self.assertTrue(self.run.full)
+        opened = self.rollup(10)
+        self.assertEqual((opened.fleet, opened.checkouts, opened.devices_out), (3, 1, 1))
+        self.assertEqual(self.rollup(10, "GRADE", "5").checkouts, 1)
+        returned = self.rollup(7)
+        self.assertEqual((returned.returns, returned.return_seconds), (1, 3 * 86400))
+        self.assertEqual(self.rollup(5).devices_out, 0)
+        self.assertEqual(self.rollup(0).devices_out, 2)
+
+    def test_backdated_edit_marks_days_for_the_next_run(self):
+        checkout = Checkout.objects.get(pk=self.checkouts[0].pk)
+        checkout.returned_at = timezone.now() - timedelta(days=5)
+        checkout.save()
+        self.assertEqual(RollupDirtyDay.objects.count(), 3)
+        # An ordinary return only touches today.
+        checkout = Checkout.objects.get(pk=self.checkouts[2].pk)
+        checkout.returned_at = timezone.now()
+        checkout.save()
+        self.assertEqual(RollupDirtyDay.objects.count(), 3)
+
+        run = run_rollups()
+        self.assertFalse(run.full)
+        self.assertEqual(run.days, 3 + (self.today - local_day(self.run.started_at)).days + 1)
+        self.assertFalse(RollupDirtyDay.objects.exists())
+        self.assertEqual(self.rollup(7).returns, 0)
+        self.assertEqual(self.rollup(5).returns, 1)
+        self.assertEqual(self.rollup(6).devices_out, 1)
+
+    def test_losses_are_charged_to_the_last_borrowers_grade(self):
+        device = Device.objects.get(pk=self.checkouts[0].device_id)
+        device.status = "LOST"
+        device.save()
+        run_rollups()
+        self.assertEqual(self.rollup(0, "GRADE", "5").losses, 1)
+        self.assertEqual(self.rollup(0, "MANUFACTURER", "Acme").losses, 1)
+
+    def test_fleet_follows_retirements_in_the_event_log(self):
+        device = Device.objects.get(pk=self.checkouts[2].device_id)
+        device.status = "RETIRED"
+        device.save()
+        DeviceEvent.objects.filter(device=device, kind="STATUS").update(created_at=timezone.now() - timedelta(days=5))
+        DailyRollup.objects.all().delete()
+        run_rollups(full=True)
+        self.assertEqual([self.rollup(days).fleet for days in (10, 6, 5, 0)], [3, 3, 2, 2])
+
+    def test_closed_days_keep_their_fleet(self):
+        Device.objects.create(asset_tag="NEW1", serial_number="NEW1", model="C100", created_by=self.user)
+        Device.objects.create(asset_tag="NEW2", serial_number="NEW2", model="C100", created_by=self.user)
+        device = Device.objects.get(pk=self.checkouts[2].device_id)
+        device.status = "RETIRED"
+        device.save()
+        run_rollups(full=True)
+        self.assertEqual(self.rollup(10).fleet, 3)
+        self.assertEqual(self.rollup(1).fleet, 3)
+        self.assertEqual(self.rollup(0).fleet, 4)
+
+    def test_analytics_page_reads_only_rollups(self):
+        self.client.get(reverse("analytics"))
+        with self.assertNumQueries(4):  # session, user, rollups by month, last run
+            response = self.client.get(reverse("analytics"))
+        self.assertContains(response, "Utilization by model")
+        utilization = response.context["charts"][0]
+        self.assertEqual(utilization["keys"], ["C100"])
+        self.assertIsNotNone(utilization["months"][-1]["cells"][0]["value"])
+
+
+# ======================
+#  BENCHMARK SUITE
+# ======================
+class BenchCommandTests(TestCase):
+    """The benchmark suite runs end to end and stays within its query budgets."""
+
+    def test_seed_and_bench(self):
+        call_command(
+            "seed_bench", users=2, devices=40, students=20, staff=4, checkouts=200, stdout=StringIO()
+        )
+        self.assertEqual(Device.objects.count(), 40)
+        self.assertEqual(Checkout.objects.count(), 200)
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / "bench.json"
+            call_command("bench", output=str(output), repeat=1, stdout=StringIO())
+            report = json.loads(output.read_text())
+        self.assertEqual(report["vendor"], connection.vendor)
+        self.assertIn("dashboard", report["results"])
+
+    def test_baseline_is_read_before_the_output_replaces_it(self):
+        call_command("seed_bench", users=1, devices=10, students=5, staff=2, checkouts=20, stdout=StringIO())
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "sqlite.json"
+            path.write_text(json.dumps({"results": {"dashboard": {"queries": 0, "median_ms": 1000}}}))
+            with self.assertRaisesRegex(CommandError, r"dashboard: \d+ queries \(baseline 0\)"):
+                call_command(
+                    "bench", only=["dashboard"], baseline=str(path), output=str(path), repeat=1, stdout=StringIO()
+                )
+            self.assertGreater(json.loads(path.read_text())["results"]["dashboard"]["queries"], 0)
+
+
+class LoadTestHelperTests(SimpleTestCase):
+    def test_response_cookies(self):
+        headers = [
+            ("content-type", "text/html"),
+            ("set-cookie", "csrftoken=abc; expires=Thu, 01 Jan 2099 00:00:00 GMT; Path=/"),
+            ("set-cookie", 'sessionid="xyz"; HttpOnly; Path=/'),
+        ]
+        self.assertEqual(response_cookies(headers), {"csrftoken": "abc", "sessionid": "xyz"})
+
+    def test_knee_is_last_step_within_budget(self):
+        steps = [
+            {"concurrency": 1, "p95_ms": 20, "error_rate": 0.0},
+            {"concurrency": 4, "p95_ms": 90, "error_rate": 0.0},
+            {"concurrency": 16, "p95_ms": 80, "error_rate": 0.05},
+            {"concurrency": 64, "p95_ms": 30, "error_rate": 0.0},
+        ]
+        self.assertEqual(find_knee(steps, 100, 0.01)["concurrency"], 4)
+        self.assertIsNone(find_knee(steps, 10, 0.01))
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix("dashboard=3, lookup=1"), {"dashboard": 3, "lookup": 1})
+        self.assertEqual(parse_mix("dashboard=0,search=1"), {"dashboard": 0, "search": 1})
+        for mix in ("dashboard=3,export=1", "dashboard=x", "dashboard=-5,search=10", "dashboard=0"):
+            with self.assertRaises(CommandError, msg=mix):
+                parse_mix(mix)
+
+
+# ======================
+#  DATABASE TUNING
+# ======================
+class DatabaseProfileTests(SimpleTestCase):
+    def test_tuned_profile_per_backend(self):
+        sqlite = tune_database({"ENGINE": "django.db.backends.sqlite3", "NAME": "x"}, "tuned")
+        self.assertIn("PRAGMA journal_mode=WAL", sqlite["OPTIONS"]["init_command"])
+        self.assertEqual(sqlite["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+        postgres = tune_database(
+            {"ENGINE": "django.db.backends.postgresql", "NAME": "x", "CONN_MAX_AGE": 600}, "tuned"
+        )
+        self.assertEqual(postgres["CONN_MAX_AGE"], 0)
+        self.assertIn("max_size", postgres["OPTIONS"]["pool"])
+        stock = {"ENGINE": "django.db.backends.sqlite3", "NAME": "x"}
+        self.assertEqual(tune_database(stock, "stock"), stock)
+
+    def test_parallel_checkouts_without_lock_errors(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / "concurrency.json"
+            call_command(
+                "bench_concurrency", processes=2, threads=2, seconds=1, output=str(output), stdout=StringIO()
+            )
+            results = json.loads(output.read_text())["results"]
+        self.assertEqual(results["tuned"]["lock_errors"], 0)
+        self.assertGreater(results["tuned"]["ops"], 0)
+
+
+# ======================
+#  OVERDUE NOTICES
+# ======================
+class OverdueNoticeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        last_week = timezone.now().date() - timedelta(days=7)
+        # Four overdue checkouts: two students (given the same guardian
+        # below) and two staff members; plus one that isn't due yet.
+        make_checkouts(self.user, 4, due_back_at=last_week)
+        make_checkouts(self.user, 1, start=4, due_back_at=timezone.now().date() + timedelta(days=1))
+        Student.objects.update(guardian_email="family@example.com")
+
+    def test_one_message_per_recipient_and_reruns_send_nothing(self):
+        call_command("send_overdue_notices", stdout=StringIO())
+        recipients = sorted(m.to[0] for m in mail.outbox)
+        self.assertEqual(
+            recipients, ["family@example.com", "staff1@example.com", "staff3@example.com"]
+        )
+        family = next(m for m in mail.outbox if m.to == ["family@example.com"])
+        self.assertIn("AT00000", family.body)
+        self.assertIn("AT00002", family.body)
+        self.assertEqual(OverdueNotice.objects.count(), 4)
+
+        call_command("send_overdue_notices", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_returned_and_unaddressed_checkouts_are_skipped(self):
+        Checkout.objects.filter(staff__isnull=False).update(returned_at=timezone.now())
+        Student.objects.update(guardian_email="")
+        call_command("send_overdue_notices", stdout=StringIO())
+        self.assertEqual(mail.outbox, [])
+
+    def test_due_dates_are_local(self):
+        # 22:00 on March 10 in Chicago is already March 11 in UTC.
+        now = datetime(2026, 3, 11, 3, 0, tzinfo=dt_timezone.utc)
+        Checkout.objects.update(due_back_at=date(2026, 3, 10))
+        with mock.patch("django.utils.timezone.now", return_value=now):
+            call_command("send_overdue_notices", stdout=StringIO())
+            self.assertEqual(mail.outbox, [])
+            Checkout.objects.update(due_back_at=date(2026, 3, 9))
+            call_command("send_overdue_notices", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+
+
+# ======================
+#  INDEX USAGE
+# ======================
+class IndexUsageTests(TestCase):
+    """EXPLAIN the per-user queries and check they hit the composite indexes."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        make_checkouts(self.user, 6, due_back_at=timezone.now().date())
+        if connection.vendor == "postgresql":
+            # Tiny test tables would otherwise always be seq-scanned.
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, name):
+        plan = queryset.explain()
+        self.assertIn(name, plan, plan)
+
+    def test_dashboard(self):
+        counts, due_today, overdue = dashboard_querysets(self.user, timezone.now().date())
+        self.assertUsesIndex(counts, "device_owner_status_idx")
+        self.assertUsesIndex(counts, "checkout_owner_open_due_idx")
+        self.assertUsesIndex(due_today, "checkout_owner_open_due_idx")
+        self.assertUsesIndex(overdue, "checkout_owner_open_due_idx")
+
+    def test_device_list(self):
+        devices = Device.objects.filter(created_by=self.user).order_by("asset_tag")
+        self.assertUsesIndex(devices[:51], "device_owner_tag_idx")
+        after = devices.filter(keyset_filter(("asset_tag",), ["AT00002"]))
+        self.assertUsesIndex(after[:51], "device_owner_tag_idx")
+
+    def test_student_list(self):
+        students = Student.objects.filter(created_by=self.user)
+        self.assertUsesIndex(
+            students.order_by("last_name", "first_name", "id")[:51], "student_owner_name_idx"
+        )
+
+    def test_checkout_list(self):
+        checkouts = Checkout.objects.filter(created_by=self.user)
+        self.assertUsesIndex(
+            checkouts.order_by("-checked_out_at", "-id")[:51], "checkout_owner_recent_idx"
+        )
+
+    def test_overdue_notices(self):
+        overdue = Checkout.objects.filter(
+            returned_at__isnull=True, due_back_at__lt=timezone.now().date()
+        )
+        self.assertUsesIndex(overdue, "checkout_open_due_idx")
+
+
+# ======================
+#  ASYNC READ VIEWS
+# ======================
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        self.checkouts = make_checkouts(self.user, 3, due_back_at=timezone.now().date())
+
+    async def get(self, view, user=None, path="/", **kwargs):
+        request = AsyncRequestFactory().get(path)
+
+        async def auser():
+            return user or self.user
+
+        request.auser = auser
+        response = await view.as_view()(request, **kwargs)
+        if hasattr(response, "render"):
+            await sync_to_async(response.render)()
+        return response
+
+    async def test_dashboard(self):
+        response = await self.get(async_views.DashboardView)
+        self.assertContains(response, "AT00000")
+
+    async def test_lists(self):
+        response = await self.get(async_views.DeviceList, path="/devices/?q=AT0000")
+        self.assertContains(response, "AT00002")
+        response = await self.get(async_views.CheckoutList)
+        self.assertContains(response, "AT00001")
+        response = await self.get(async_views.StudentList)
+        self.assertContains(response, "ST00000")
+
+    async def test_detail_is_scoped_to_owner(self):
+        device = self.checkouts[0].device
+        response = await self.get(async_views.DeviceDetail, pk=device.pk)
+        self.assertContains(response, device.asset_tag)
+        other = await User.objects.acreate(username="other")
+        with self.assertRaises(Http404):
+            await self.get(async_views.DeviceDetail, user=other, pk=device.pk)
+
+    async def test_archived_checkouts(self):
+        old = timezone.now() - timedelta(days=400)
+        await Checkout.objects.filter(pk=self.checkouts[0].pk).aupdate(returned_at=old)
+        await sync_to_async(archive_checkouts)(timezone.now() - timedelta(days=365))
+        response = await self.get(async_views.CheckoutList)
+        self.assertContains(response, "AT00000")
+        response = await self.get(async_views.CheckoutDetail, pk=self.checkouts[0].pk)
+        self.assertContains(response, "(archived)")
+
+    async def test_device_lookup(self):
+        response = await self.get(async_views.DeviceLookupView, path="/devices/lookup/?code=SN00001")
+        self.assertEqual(json.loads(response.content)["device"]["asset_tag"], "AT00001")
+
+    async def test_login_required(self):
+        response = await self.get(async_views.DeviceList, user=AnonymousUser())
+        self.assertEqual(response.status_code, 302)
+
+
+# ======================
+#  SCANNER LOOKUP
+# ======================
+@mock.patch.object(lookup_cache, "maxsize", 100)
+class DeviceLookupTests(TestCase):
+    def setUp(self):
+        lookup_cache.clear()
+        cache.clear()
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        self.client.force_login(self.user)
+        self.checkout = make_checkouts(self.user, 1)[0]
+
+    def test_hit_needs_no_queries(self):
+        lookup_device(self.user, "AT00000")
+        with self.assertNumQueries(0):
+            payload = lookup_device(self.user, "AT00000")
+        self.assertEqual(payload["checkout"]["borrower_type"], "student")
+
+    def test_return_is_seen_immediately(self):
+        self.assertIsNotNone(lookup_device(self.user, "SN00000")["checkout"])
+        bulk_check_in(self.user, ["AT00000"])
+        payload = lookup_device(self.user, "SN00000")
+        self.assertEqual(payload["device"]["status"], "AVAILABLE")
+        self.assertIsNone(payload["checkout"])
+
+        Checkout.objects.create(
+            device=self.checkout.device, student=self.checkout.student, condition_out="GOOD"
+        )
+        self.assertIsNotNone(lookup_device(self.user, "SN00000")["checkout"])
+
+    def test_moving_a_checkout_frees_the_old_devices_lookup(self):
+        self.assertEqual(lookup_device(self.user, "AT00000")["device"]["status"], "CHECKED_OUT")
+        spare = Device.objects.create(asset_tag="AT00009", serial_number="SN00009", created_by=self.user)
+        checkout = Checkout.objects.get(pk=self.checkout.pk)
+        checkout.device = spare
+        checkout.save()
+        payload = lookup_device(self.user, "AT00000")
+        self.assertEqual(payload["device"]["status"], "AVAILABLE")
+        self.assertIsNone(payload["checkout"])
+        self.assertEqual(lookup_device(self.user, "AT00009")["checkout"]["id"], checkout.pk)
+
+    def test_borrower_renames_are_seen_immediately(self):
+        lookup_device(self.user, "AT00000")
+        student = self.checkout.student
+        student.last_name = "Lovelace"
+        student.save()
+        self.assertEqual(lookup_device(self.user, "AT00000")["checkout"]["borrower"], "Student Lovelace (Grade 5)")
+        self.assertEqual(Device.objects.get(asset_tag="AT00000").current_borrower, "Student Lovelace")
+
+    def test_no_process_cache_without_a_shared_one(self):
+        with mock.patch.object(lookup_cache, "maxsize", 0):
+            lookup_device(self.user, "AT00000")
+            self.assertEqual(len(lookup_cache), 0)
+            with self.assertNumQueries(3):
+                lookup_device(self.user, "AT00000")
+
+    def test_view(self):
+        response = self.client.get(reverse("device-lookup"), {"code": "SN00000"})
+        self.assertEqual(response.json()["device"]["asset_tag"], "AT00000")
+        self.assertEqual(self.client.get(reverse("device-lookup"), {"code": "nope"}).status_code, 404)
+        self.assertEqual(self.client.get(reverse("device-lookup")).status_code, 400)
+
+    def test_scoped_to_owner(self):
+        other = User.objects.create_user("other")
+        self.client.force_login(other)
+        response = self.client.get(reverse("device-lookup"), {"code": "AT00000"})
+        self.assertEqual(response.status_code, 404)
+
+
+# ======================
+#  AUTOCOMPLETE PICKERS
+# ======================
+@cached_auth()
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        self.client.force_login(self.user)
+        self.client.get(reverse("device-list"))  # warm the session and user cache
+        make_checkouts(self.user, 2)  # AT00000 and AT00001 are out
+        for n in range(2, 5):
+            Device.objects.create(asset_tag=f"AT{n:05}", serial_number=f"SN{n:05}", created_by=self.user)
+        self.student = Student.objects.create(
+            first_name="Ada", last_name="Lovelace", student_id="L-1", grade_level="5", created_by=self.user
+        )
+        Student.objects.create(
+            first_name="Lin", last_name="Ng", student_id="N-1", grade_level="5", created_by=self.user, active=False
+        )
+        other = User.objects.create_user("other")
+        Device.objects.create(asset_tag="AT99999", serial_number="SN99999", created_by=other)
+
+    def labels(self, kind, q):
+        response = self.client.get(reverse("autocomplete", args=[kind]), {"q": q})
+        return [row["label"] for row in response.json()["results"]]
+
+    def test_available_devices_by_tag_prefix(self):
+        with self.assertNumQueries(1):
+            labels = self.labels("devices", "at0")
+        self.assertEqual(labels, ["AT00002 — Device", "AT00003 — Device", "AT00004 — Device"])
+
+    def test_active_borrowers_by_any_column(self):
+        with self.assertNumQueries(3):
+            self.assertEqual(self.labels("students", "l"), ["Lovelace, Ada (L-1)"])
+        self.assertEqual(self.labels("students", "ada"), ["Lovelace, Ada (L-1)"])
+        self.assertEqual(self.labels("students", "n-"), [])
+
+    def test_punctuation_and_mixed_case_prefixes(self):
+        for first, last, student_id in (
+            ("Liam", "O'Brien", "OB-1"),
+            ("Mia", "OBrien", "OB_2"),
+            ("Zoë", "Smith-Jones", "S.3"),
+            ("Ed", "Smith Jones", "S%4"),
+        ):
+            Student.objects.create(
+                first_name=first, last_name=last, student_id=student_id, grade_level="5", created_by=self.user
+            )
+        self.assertEqual(self.labels("students", "o'B"), ["O'Brien, Liam (OB-1)"])
+        self.assertEqual(self.labels("students", "oBr"), ["OBrien, Mia (OB_2)"])
+        self.assertEqual(self.labels("students", "SMITH-j"), ["Smith-Jones, Zoë (S.3)"])
+        self.assertEqual(self.labels("students", "smith j"), ["Smith Jones, Ed (S%4)"])
+        self.assertEqual(self.labels("students", "sMiTh"), ["Smith Jones, Ed (S%4)", "Smith-Jones, Zoë (S.3)"])
+        # LIKE wildcards in the term only match themselves.
+        self.assertEqual(self.labels("students", "ob_"), ["OBrien, Mia (OB_2)"])
+        self.assertEqual(self.labels("students", "s%"), ["Smith Jones, Ed (S%4)"])
+        self.assertEqual(self.labels("students", "s."), ["Smith-Jones, Zoë (S.3)"])
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get(reverse("autocomplete", args=["devices"])).status_code, 400)
+        self.assertEqual(self.client.get(reverse("autocomplete", args=["users"]), {"q": "a"}).status_code, 404)
+
+    def test_prefix_queries_use_the_expression_indexes(self):
+        for kind, index in (("devices", "device_tag_prefix_idx"), ("staff", "staff_last_prefix_idx")):
+            queryset = next(_prefix_queries(PICKERS[kind], self.user, "A"))
+            self.assertIn(index, queryset.explain())
+
+    def test_form_renders_without_loading_the_tables(self):
+        response = self.client.get(reverse("checkout-create"))
+        self.assertContains(response, 'data-autocomplete-url="/autocomplete/devices/"')
+        self.assertNotContains(response, "AT00002")  # no option list of devices
+        self.assertContains(response, "js/autocomplete.js")
+
+    def test_form_only_accepts_the_users_own_rows(self):
+        foreign = Device.objects.get(asset_tag="AT99999")
+        inactive = Student.objects.get(student_id="N-1")
+        response = self.client.post(
+            reverse("checkout-create"),
+            {"device": foreign.pk, "student": inactive.pk, "condition_out": "GOOD"},
+        )
+        invalid = "Select a valid choice. That choice is not one of the available choices."
+        self.assertFormError(response.context["form"], "device", invalid)
+        self.assertFormError(response.context["form"], "student", invalid)
+
+    def test_edit_keeps_the_current_device_and_shows_its_label(self):
+        checkout = Checkout.objects.get(device__asset_tag="AT00000")
+        response = self.client.get(reverse("checkout-update", args=[checkout.pk]))
+        self.assertContains(response, 'value="AT00000 — Device"')
+
+
+# ======================
+#  READ REPLICA ROUTING
+# ======================
+@override_settings(REPLICA_DATABASE="replica")
+class ReplicaRoutingTests(SimpleTestCase):
+    """Routing decisions only; no query ever reaches the (absent) replica alias."""
+
+    def serve(self, request, write=False):
+        seen = {}
+
+        def view(request):
+            seen["before"] = router.db_for_read(Device)
+            if write:
+                router.db_for_write(Device)
+            seen["after"] = router.db_for_read(Device)
+            return HttpResponse()
+
+        return seen, ReplicaMiddleware(view)(request)
+
+    def test_get_reads_replica_until_it_writes(self):
+        seen, response = self.serve(RequestFactory().get("/"), write=True)
+        self.assertEqual(seen, {"before": "replica", "after": "default"})
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        seen, response = self.serve(RequestFactory().get("/"))
+        self.assertEqual(seen, {"before": "replica", "after": "replica"})
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_posts_and_pinned_clients_read_primary(self):
+        seen, _ = self.serve(RequestFactory().post("/"))
+        self.assertEqual(seen["before"], "default")
+        request = RequestFactory().get("/")
+        request.COOKIES[PIN_COOKIE] = "1"
+        seen, _ = self.serve(request)
+        self.assertEqual(seen["before"], "default")
+
+    def test_outside_requests_and_transactions_use_primary(self):
+        self.assertEqual(router.db_for_read(Device), "default")
+        with use_replica():
+            self.assertEqual(router.db_for_read(Device), "replica")
+            with mock.patch.object(connections["default"], "in_atomic_block", True):
+                self.assertEqual(router.db_for_read(Device), "default")
+
+    def test_streamed_reports_keep_reading_replica(self):
+        def view(request):
+            return StreamingHttpResponse(router.db_for_read(Device) for _ in range(2))
+
+        response = ReplicaMiddleware(view)(RequestFactory().get("/"))
+        self.assertEqual(b"".join(response.streaming_content), b"replicareplica")
+
+    async def test_async_views_route_the_same(self):
+        async def view(request):
+            read = await sync_to_async(router.db_for_read)(Device)
+            await sync_to_async(router.db_for_write)(Device)
+            return HttpResponse(read)
+
+        response = await ReplicaMiddleware(view)(AsyncRequestFactory().get("/"))
+        self.assertEqual(response.content, b"replica")
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    @override_settings(REPLICA_DATABASE=None)
+    def test_without_a_replica_nothing_changes(self):
+        seen, response = self.serve(RequestFactory().get("/"), write=True)
+        self.assertEqual(seen, {"before": "default", "after": "default"})
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+# ======================
+#  CACHED SESSIONS AND AUTH
+# ======================
+@cached_auth()
+class CachedAuthTests(TestCase):
+    def setUp(self):
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        self.client.login(username="it", password="pw")
+        self.url = reverse("device-list")
+
+    def assertLoggedOut(self):
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_warm_requests_skip_session_and_user_queries(self):
+        forget_session(self.client.session.session_key)
+        forget_user(self.user.pk)
+        with self.assertNumQueries(3):  # session, user, devices
+            self.client.get(self.url)
+        with self.assertNumQueries(1):  # devices
+            self.client.get(self.url)
+
+    def test_user_is_loaded_once_per_request(self):
+        request = RequestFactory().get("/")
+        request.session = self.client.session
+        CachedAuthenticationMiddleware(lambda request: None).process_request(request)
+        forget_user(self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(async_to_sync(request.auser)().pk, self.user.pk)
+            self.assertEqual(request.user.pk, self.user.pk)
+
+    def test_logout_ends_the_session(self):
+        self.client.get(self.url)
+        cookie = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.client.post(reverse("logout"))
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = cookie
+        self.assertLoggedOut()
+
+    def test_deleted_sessions_stop_working(self):
+        self.client.get(self.url)
+        Session.objects.all().delete()
+        self.assertLoggedOut()
+
+    def test_password_change_and_deactivation_log_out(self):
+        self.client.get(self.url)
+        self.user.set_password("new")
+        self.user.save()
+        self.assertLoggedOut()
+
+        self.client.login(username="it", password="new")
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertLoggedOut()
+
+
+@skipIf("REDIS_URL" in os.environ, "sessions are cached with REDIS_URL")
+class UncachedAuthTests(TestCase):
+    def test_bulk_deactivation_logs_out_without_a_shared_cache(self):
+        user = User.objects.create_user("it", "it@example.com", "pw")
+        self.client.login(username="it", password="pw")
+        self.assertEqual(self.client.get(reverse("device-list")).status_code, 200)
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        self.assertEqual(self.client.get(reverse("device-list")).status_code, 302)
+
+
+# ======================
+#  REQUEST PROFILING
+# ======================
+@override_settings(PROFILE_SAMPLE_RATE=1.0)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        self.client.force_login(self.user)
+        make_checkouts(self.user, 3)
+        self.get(reverse("device-list"))  # warm the session and user cache
+
+    def get(self, url, fetch=None):
+        with self.assertLogs("main_app.profiling", "INFO") as logs:
+            with CaptureQueriesContext(connection) as queries:
+                response = (fetch or self.client.get)(url)
+        return response, json.loads(logs.records[-1].getMessage()), len(queries)
+
+    def test_template_view(self):
+        response, line, queries = self.get(reverse("device-list"))
+        timing = response["Server-Timing"]
+        self.assertIn("db;dur=", timing)
+        self.assertIn(f'desc="{queries} queries"', timing)
+        self.assertIn("tpl;dur=", timing)
+        self.assertEqual(line["view"], "device-list")
+        self.assertEqual(line["queries"], queries)
+        self.assertEqual(len(line["slowest"]), min(queries, settings.PROFILE_SLOWEST_QUERIES))
+        self.assertGreaterEqual(line["total_ms"], line["view_ms"])
+
+    def test_json_view_has_no_template_time(self):
+        response, line, _ = self.get(reverse("device-lookup") + "?code=AT00001")
+        self.assertNotIn("tpl;", response["Server-Timing"])
+        self.assertIsNone(line["template_ms"])
+
+    def test_async_requests(self):
+        async_client = AsyncClient()
+        async_client.force_login(self.user)
+        response, line, _ = self.get(reverse("checkout-list"), async_to_sync(async_client.get))
+        self.assertIn("view;dur=", response["Server-Timing"])
+        self.assertGreater(line["queries"], 0)
+
+    @override_settings(PROFILE_SAMPLE_RATE=0)
+    def test_off_by_default(self):
+        with self.assertNoLogs("main_app.profiling"):
+            response = Client().get(reverse("login"))
+        self.assertNotIn("Server-Timing", response)
+
+
+# ======================
+#  PROMETHEUS METRICS
+# ======================
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN="s3cret")
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.delete(metrics.SNAPSHOT_KEY)
+        self.user = User.objects.create_user("it", "it@example.com", "pw")
+        self.client.force_login(self.user)
+        make_checkouts(self.user, 3, due_back_at=timezone.now().date() - timedelta(days=1))
+
+    def sample(self, name, **labels):
+        return metrics.registry.get_sample_value(name, labels) or 0
+
+    def scrape(self):
+        return self.client.get(reverse("metrics"), headers={"Authorization": "Bearer s3cret"})
+
+    def test_requests_by_url_name(self):
+        before = self.sample("assetally_responses_total", view="device-list", method="GET", status="200")
+        self.client.get(reverse("device-list"))
+        self.client.get("/no-such-page/")
+        after = self.sample("assetally_responses_total", view="device-list", method="GET", status="200")
+        self.assertEqual(after - before, 1)
+        self.assertGreater(self.sample("assetally_request_db_queries_count", view="device-list"), 0)
+        self.assertGreater(self.sample("assetally_responses_total", view="unmatched", method="GET", status="404"), 0)
+
+    def test_domain_gauges_come_from_the_snapshot(self):
+        body = self.scrape().content.decode()
+        self.assertIn("assetally_open_checkouts 3.0", body)
+        self.assertIn("assetally_overdue_checkouts 3.0", body)
+        self.assertIn('assetally_devices{status="CHECKED_OUT"} 3.0', body)
+
+        bulk_check_in(self.user, ["AT00000"])
+        with self.assertNumQueries(0):
+            body = self.scrape().content.decode()
+        self.assertIn("assetally_open_checkouts 3.0", body)
+
+    def test_token(self):
+        self.assertEqual(Client().get(reverse("metrics")).status_code, 401)
+        response = Client().get(reverse("metrics"), headers={"Authorization": "Bearer guess"})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.scrape().status_code, 200)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_never_served_without_a_token(self):
+        self.assertEqual(Client().get(reverse("metrics")).status_code, 404)
+
+    def test_off_by_default(self):
+        env = {key: value for key, value in os.environ.items() if not key.startswith("METRICS_")}
+        script = "import django; django.setup(); from django.conf import settings; print(settings.METRICS_ENABLED)"
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            env={**env, "DJANGO_SETTINGS_MODULE": "config.settings"},
+            cwd=settings.BASE_DIR,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.stdout.strip(), "False")
+        with override_settings(METRICS_ENABLED=False, METRICS_TOKEN=""):
+            self.assertEqual(Client().get(reverse("metrics")).status_code, 404)
+
+    def test_workers_add_up(self):
+        script = (
+            "import django; django.setup()\n"
+            "from main_app.metrics import RESPONSES\n"
+            "RESPONSES.labels('dashboard', 'GET', '200').inc(2)\n"
+        )
+        with tempfile.TemporaryDirectory() as path:
+            env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": path, "DJANGO_SETTINGS_MODULE": "config.settings"}
+            for _ in range(2):
+                subprocess.run(
+                    [sys.executable, "-c", script], env=env, cwd=settings.BASE_DIR, check=True, capture_output=True
+                )
+            registry = CollectorRegistry()
+            MultiProcessCollector(registry, path=path)
+            total = registry.get_sample_value(
+                "assetally_responses_total", {"view": "dashboard", "method": "GET", "status": "200"}
+            )
+        self.assertEqual(total, 4)
@@ -1,29 +1,49 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Read-only pages: async under ASGI (ASYNC_READ_VIEWS=1), sync otherwise.
+read_views = async_views if settings.ASYNC_READ_VIEWS else views
 
 urlpatterns = [
-    path("dashboard/", views.DashboardView.as_view(), name="dashboard"),
+    path("dashboard/", read_views.DashboardView.as_view(), name="dashboard"),
 
     # Students
-    path("students/", views.StudentList.as_view(), name="student-list"),
+    path("students/", read_views.StudentList.as_view(), name="student-list"),
     path("students/create/", views.StudentCreate.as_view(), name="student-create"),
-    path("students/<int:pk>/", views.StudentDetail.as_view(), name="student-detail"),
+    path("students/<int:pk>/", read_views.StudentDetail.as_view(), name="student-detail"),
     path("students/<int:pk>/update/", views.StudentUpdate.as_view(), name="student-update"),
     path("students/<int:pk>/delete/", views.StudentDelete.as_view(), name="student-delete"),
 
     # Devices
-    path("devices/", views.DeviceList.as_view(), name="device-list"),
+    path("devices/", read_views.DeviceList.as_view(), name="device-list"),
+    path("devices/lookup/", read_views.DeviceLookupView.as_view(), name="device-lookup"),
     path("devices/create/", views.DeviceCreate.as_view(), name="device-create"),
-    path("devices/<int:pk>/", views.DeviceDetail.as_view(), name="device-detail"),
+    path("devices/<int:pk>/", read_views.DeviceDetail.as_view(), name="device-detail"),
+    path("devices/<int:pk>/history/", views.DeviceTimeline.as_view(), name="device-timeline"),
     path("devices/<int:pk>/update/", views.DeviceUpdate.as_view(), name="device-update"),
     path("devices/<int:pk>/delete/", views.DeviceDelete.as_view(), name="device-delete"),
 
     # Checkouts
-    path("checkouts/", views.CheckoutList.as_view(), name="checkout-list"),
+    path("checkouts/", read_views.CheckoutList.as_view(), name="checkout-list"),
     path("checkouts/create/", views.CheckoutCreate.as_view(), name="checkout-create"),
-    path("checkouts/<int:pk>/", views.CheckoutDetail.as_view(), name="checkout-detail"),
+    path("checkouts/<int:pk>/", read_views.CheckoutDetail.as_view(), name="checkout-detail"),
     path("checkouts/<int:pk>/update/", views.CheckoutUpdate.as_view(), name="checkout-update"),
     path("checkouts/<int:pk>/delete/", views.CheckoutDelete.as_view(), name="checkout-delete"),
+    path("checkouts/bulk/", views.BulkCheckoutView.as_view(), name="checkout-bulk"),
+    path("checkouts/bulk/return/", views.BulkReturnView.as_view(), name="checkout-bulk-return"),
+
+    # Checkout form pickers
+    path("autocomplete/<str:kind>/", read_views.AutocompleteView.as_view(), name="autocomplete"),
+
+    # Analytics
+    path("analytics/", views.AnalyticsView.as_view(), name="analytics"),
+
+    # Monitoring: Prometheus scrapes /metrics, without a trailing slash.
+    path("metrics", views.MetricsView.as_view(), name="metrics"),
+
+    # Exports
+    path("export/<str:kind>/", views.ExportView.as_view(), name="export"),
 ]
 
 
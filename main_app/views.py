@@ -1,6 +1,15 @@
+import json
+
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.urls import reverse_lazy
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date
+from django.views import View
 from django.views.generic import (
     TemplateView,
     ListView,
@@ -9,9 +18,20 @@ from django.views.generic import (
     UpdateView,
     DeleteView,
 )
-from django.db.models import Q
-
-from .models import Student, Staff, Device, Checkout
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from .analytics import monthly_charts
+from .autocomplete import PICKERS, autocomplete
+from .dashboard import get_dashboard
+from .forms import CheckoutForm, CheckoutUpdateForm
+from .exports import EXPORT_COLUMNS, export_queryset, stream_rows
+from .lookup import lookup_device
+from .metrics import render_metrics
+from .history import checkout_history, device_timeline
+from .models import ArchivedCheckout, Student, Staff, Device, Checkout, DeviceEvent, RollupRun
+from .pagination import KeysetPaginationMixin
+from .search import search_devices, search_students
+from . import services
 
 
 class DashboardView(LoginRequiredMixin, TemplateView):
@@ -19,42 +39,31 @@ class DashboardView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        user = self.request.user
-        ctx["students_count"] = Student.objects.filter(created_by=user).count()
-        ctx["devices_available"] = Device.objects.filter(
-            created_by=user, status="AVAILABLE"
-        ).count()
-        ctx["devices_out"] = Device.objects.filter(
-            created_by=user, status="CHECKED_OUT"
-        ).count()
-        today = timezone.now().date()
-        ctx["due_today"] = Checkout.objects.filter(
-            created_by=user, due_back_at=today, returned_at__isnull=True
-        )
-        ctx["overdue"] = Checkout.objects.filter(
-            created_by=user, due_back_at__lt=today, returned_at__isnull=True
-        )
+        ctx.update(get_dashboard(self.request.user))
         return ctx
 
 
 # ======================
 #  STUDENT VIEWS
 # ======================
-class StudentList(LoginRequiredMixin, ListView):
+class StudentList(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Student
     template_name = "main_app/student_list.html"
+    keyset = ("last_name", "first_name", "id")
 
     def get_queryset(self):
         qs = super().get_queryset().filter(created_by=self.request.user)
-        q = self.request.GET.get("q")
+        q = self.request.GET.get("q", "").strip()
         if q:
-            qs = qs.filter(
-                Q(first_name__icontains=q)
-                | Q(last_name__icontains=q)
-                | Q(student_id__icontains=q)
-            )
+            qs = search_students(qs, q)
         return qs
 
+    def get_keyset(self):
+        # Searches rank only when some row starts with the query.
+        if "search_rank" in self.object_list.query.annotations:
+            return ("search_rank",) + self.keyset
+        return self.keyset
+
 
 class StudentDetail(LoginRequiredMixin, DetailView):
     model = Student
@@ -113,21 +122,24 @@ class StudentDelete(LoginRequiredMixin, DeleteView):
 # ======================
 #  DEVICE VIEWS
 # ======================
-class DeviceList(LoginRequiredMixin, ListView):
+class DeviceList(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Device
     template_name = "main_app/device_list.html"
+    keyset = ("asset_tag",)
 
     def get_queryset(self):
         qs = super().get_queryset().filter(created_by=self.request.user)
-        q = self.request.GET.get("q")
+        q = self.request.GET.get("q", "").strip()
         if q:
-            qs = qs.filter(
-                Q(asset_tag__icontains=q)
-                | Q(serial_number__icontains=q)
-                | Q(model__icontains=q)
-            )
+            qs = search_devices(qs, q)
         return qs
 
+    def get_keyset(self):
+        # Searches rank only when some row starts with the query.
+        if "search_rank" in self.object_list.query.annotations:
+            return ("search_rank",) + self.keyset
+        return self.keyset
+
 
 class DeviceDetail(LoginRequiredMixin, DetailView):
     model = Device
@@ -137,6 +149,30 @@ class DeviceDetail(LoginRequiredMixin, DetailView):
         return super().get_queryset().filter(created_by=self.request.user)
 
 
+class DeviceTimeline(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+    """
+    A device's event log, live and archived, newest first. Each page is one
+    indexed query per table.
+    """
+
+    model = DeviceEvent
+    template_name = "main_app/device_timeline.html"
+    keyset = ("-created_at", "-id")
+    page_size = 100
+
+    def get_queryset(self):
+        return device_timeline(self.request.user, self.kwargs["pk"])
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        # Only an empty page needs to tell "no events" from "not your device".
+        if not ctx["object_list"] and not self.request.GET.get("before"):
+            if not Device.objects.filter(pk=self.kwargs["pk"], created_by=self.request.user).exists():
+                raise Http404("No device found matching the query")
+        ctx["device_id"] = self.kwargs["pk"]
+        return ctx
+
+
 class DeviceCreate(LoginRequiredMixin, CreateView):
     model = Device
     fields = [
@@ -188,12 +224,14 @@ class DeviceDelete(LoginRequiredMixin, DeleteView):
 # ======================
 #  CHECKOUT VIEWS
 # ======================
-class CheckoutList(LoginRequiredMixin, ListView):
+class CheckoutList(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Checkout
     template_name = "main_app/checkout_list.html"
+    keyset = ("-checked_out_at", "-id")
 
     def get_queryset(self):
-        return super().get_queryset().filter(created_by=self.request.user)
+        # Live and archived checkouts, newest first.
+        return checkout_history(self.request.user)
 
 
 class CheckoutDetail(LoginRequiredMixin, DetailView):
@@ -203,56 +241,52 @@ class CheckoutDetail(LoginRequiredMixin, DetailView):
     def get_queryset(self):
         return super().get_queryset().filter(created_by=self.request.user)
 
+    def get_object(self, queryset=None):
+        try:
+            return super().get_object(queryset)
+        except Http404:
+            return super().get_object(self.get_archived_queryset())
+
+    def get_archived_queryset(self):
+        return ArchivedCheckout.objects.filter(created_by=self.request.user)
+
+
+class CheckoutFormMixin:
+    def get_form_kwargs(self):
+        return {**super().get_form_kwargs(), "user": self.request.user}
+
 
-class CheckoutCreate(LoginRequiredMixin, CreateView):
+class CheckoutCreate(LoginRequiredMixin, CheckoutFormMixin, CreateView):
     model = Checkout
-    fields = [
-        "device",
-        "student",
-        "staff",
-        "due_back_at",
-        "condition_out",
-        "comments",
-    ]
+    form_class = CheckoutForm
     template_name = "main_app/form.html"
 
     def form_valid(self, form):
+        # Checkout.save() marks the device checked out in the same transaction.
         form.instance.created_by = self.request.user
-        resp = super().form_valid(form)
-        device = self.object.device
-        device.status = "CHECKED_OUT"
-        device.save(update_fields=["status"])
-        return resp
+        try:
+            return super().form_valid(form)
+        except ValidationError as e:
+            # Lost a race for unique_open_checkout_per_device.
+            form.add_error(None, e)
+            return self.form_invalid(form)
 
 
-class CheckoutUpdate(LoginRequiredMixin, UpdateView):
+class CheckoutUpdate(LoginRequiredMixin, CheckoutFormMixin, UpdateView):
     model = Checkout
-    fields = [
-        "device",
-        "student",
-        "staff",
-        "due_back_at",
-        "returned_at",
-        "condition_out",
-        "condition_in",
-        "comments",
-    ]
+    form_class = CheckoutUpdateForm
     template_name = "main_app/form.html"
 
     def get_queryset(self):
         return super().get_queryset().filter(created_by=self.request.user)
 
     def form_valid(self, form):
-        was_returned = (
-            form.instance.returned_at is None
-            and form.cleaned_data.get("returned_at") is not None
-        )
-        resp = super().form_valid(form)
-        if was_returned:
-            device = self.object.device
-            device.status = "AVAILABLE"
-            device.save(update_fields=["status"])
-        return resp
+        # Checkout.save() frees the device when returned_at is set.
+        try:
+            return super().form_valid(form)
+        except ValidationError as e:
+            form.add_error(None, e)
+            return self.form_invalid(form)
 
 
 class CheckoutDelete(LoginRequiredMixin, DeleteView):
@@ -262,3 +296,172 @@ class CheckoutDelete(LoginRequiredMixin, DeleteView):
 
     def get_queryset(self):
         return super().get_queryset().filter(created_by=self.request.user)
+
+
+# ======================
+#  BULK CART VIEWS
+# ======================
+class BulkCheckoutView(LoginRequiredMixin, View):
+    """
+    POST JSON: {"items": [{"asset_tag": ..., "borrower": ...}, ...],
+    "due_back_at": "YYYY-MM-DD", "condition_out": "GOOD", "comments": ""}
+    where borrower is a student_id or staff email.
+    """
+
+    def post(self, request):
+        try:
+            data = json.loads(request.body)
+            items = [(str(i["asset_tag"]), str(i["borrower"])) for i in data["items"]]
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({"error": "Expected a JSON body with an items list."}, status=400)
+
+        due_back_at = data.get("due_back_at")
+        if due_back_at:
+            try:
+                due_back_at = parse_date(due_back_at) if isinstance(due_back_at, str) else None
+            except ValueError:
+                due_back_at = None
+            if due_back_at is None:
+                return JsonResponse({"error": "due_back_at must be YYYY-MM-DD."}, status=400)
+        condition_out = data.get("condition_out", "GOOD")
+        if not isinstance(condition_out, str) or condition_out not in dict(Checkout.CONDITION_CHOICES):
+            return JsonResponse({"error": "Unknown condition_out."}, status=400)
+        comments = data.get("comments", "")
+        if not isinstance(comments, str):
+            return JsonResponse({"error": "comments must be a string."}, status=400)
+
+        try:
+            results = services.bulk_check_out(
+                request.user,
+                items,
+                due_back_at=due_back_at or None,
+                condition_out=condition_out,
+                comments=comments,
+            )
+        except IntegrityError:
+            return JsonResponse(
+                {"error": "Another checkout for one of these devices was saved first. Rescan the cart."},
+                status=409,
+            )
+        return JsonResponse({"results": results})
+
+
+class BulkReturnView(LoginRequiredMixin, View):
+    """POST JSON: {"asset_tags": [...], "condition_in": "GOOD"}"""
+
+    def post(self, request):
+        try:
+            data = json.loads(request.body)
+            asset_tags = [str(tag) for tag in data["asset_tags"]]
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({"error": "Expected a JSON body with an asset_tags list."}, status=400)
+
+        condition_in = data.get("condition_in")
+        if condition_in and (not isinstance(condition_in, str) or condition_in not in dict(Checkout.CONDITION_CHOICES)):
+            return JsonResponse({"error": "Unknown condition_in."}, status=400)
+
+        results = services.bulk_check_in(request.user, asset_tags, condition_in=condition_in or None)
+        return JsonResponse({"results": results})
+
+
+# ======================
+#  SCANNER LOOKUP
+# ======================
+class DeviceLookupView(LoginRequiredMixin, View):
+    """GET ?code=<asset tag or serial> -> the device, its status and open checkout."""
+
+    def get(self, request):
+        code = request.GET.get("code", "").strip()
+        if not code:
+            return JsonResponse({"error": "Pass the scanned asset tag or serial as ?code=."}, status=400)
+        return self.respond(code, lookup_device(request.user, code))
+
+    def respond(self, code, payload):
+        if payload is None:
+            return JsonResponse({"error": f"No device {code!r}."}, status=404)
+        return JsonResponse(payload)
+
+
+# ======================
+#  AUTOCOMPLETE
+# ======================
+class AutocompleteView(LoginRequiredMixin, View):
+    """GET ?q=<prefix> -> {"results": [{"id", "label"}, ...]} for the checkout form pickers."""
+
+    def get(self, request, kind):
+        if kind not in PICKERS:
+            raise Http404("Unknown autocomplete.")
+        q = request.GET.get("q", "").strip()
+        if not q:
+            return JsonResponse({"error": "Pass the start of a name or tag as ?q=."}, status=400)
+        return JsonResponse({"results": autocomplete(request.user, kind, q)})
+
+
+# ======================
+#  ANALYTICS
+# ======================
+class AnalyticsView(LoginRequiredMixin, TemplateView):
+    """Month-over-month charts read from the daily rollups only (?months=, default 12)."""
+
+    template_name = "main_app/analytics.html"
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        try:
+            months = min(max(int(self.request.GET.get("months", 12)), 1), 36)
+        except ValueError:
+            months = 12
+        ctx["months"] = months
+        ctx["charts"] = monthly_charts(self.request.user, months)
+        ctx["last_run"] = RollupRun.objects.first()
+        return ctx
+
+
+# ======================
+#  METRICS
+# ======================
+class MetricsView(View):
+    """Prometheus scrape target; only served with METRICS_TOKEN set, to scrapes that send it."""
+
+    def get(self, request):
+        token = settings.METRICS_TOKEN
+        if not settings.METRICS_ENABLED or not token:
+            raise Http404("Metrics are off.")
+        if not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            return HttpResponse("Unauthorized.\n", status=401, content_type="text/plain")
+        return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
+
+
+# ======================
+#  EXPORT VIEWS
+# ======================
+class ExportView(LoginRequiredMixin, View):
+    """
+    GET /export/devices/ or /export/checkouts/ streams the user's rows.
+    Query params: format=csv|jsonl, status, start, end (YYYY-MM-DD).
+    """
+
+    def get(self, request, kind):
+        if kind not in EXPORT_COLUMNS:
+            raise Http404("Unknown export.")
+        fmt = request.GET.get("format", "csv")
+        if fmt not in ("csv", "jsonl"):
+            fmt = "csv"
+        dates = {}
+        for name in ("start", "end"):
+            value = request.GET.get(name)
+            if value:
+                try:
+                    dates[name] = parse_date(value)
+                except ValueError:
+                    dates[name] = None
+                if dates[name] is None:
+                    return HttpResponseBadRequest(f"{name} must be a date, YYYY-MM-DD.")
+        queryset = export_queryset(kind, request.user, status=request.GET.get("status") or None, **dates)
+        response = StreamingHttpResponse(
+            stream_rows(kind, queryset, fmt),
+            content_type="text/csv" if fmt == "csv" else "application/x-ndjson",
+        )
+        filename = f"{kind}-{timezone.now():%Y%m%d}.{fmt}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
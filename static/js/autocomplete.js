@@ -0,0 +1,49 @@
+// Type-ahead pickers for the checkout form (see main_app/forms.py).
+// The search box fills its datalist from the autocomplete endpoint; picking
+// a suggestion copies its id into the hidden input that is submitted.
+(function () {
+  const DELAY_MS = 200;
+
+  function setup(box) {
+    const hidden = box.querySelector("input[type=hidden]");
+    const search = box.querySelector("input[type=search]");
+    const list = box.querySelector("datalist");
+    const ids = new Map();
+    let timer = null;
+    let controller = null;
+
+    async function suggest(q) {
+      if (controller) controller.abort();
+      controller = new AbortController();
+      const url = box.dataset.autocompleteUrl + "?q=" + encodeURIComponent(q);
+      try {
+        const response = await fetch(url, { signal: controller.signal });
+        if (!response.ok) return;
+        const { results } = await response.json();
+        ids.clear();
+        list.replaceChildren(
+          ...results.map(({ id, label }) => {
+            ids.set(label, id);
+            const option = document.createElement("option");
+            option.value = label;
+            return option;
+          })
+        );
+      } catch (err) {
+        if (err.name !== "AbortError") throw err;
+      }
+    }
+
+    search.addEventListener("input", () => {
+      const q = search.value.trim();
+      // A typed label is only valid once it matches a suggestion.
+      hidden.value = ids.get(search.value) ?? "";
+      clearTimeout(timer);
+      if (q && !hidden.value) timer = setTimeout(() => suggest(q), DELAY_MS);
+    });
+  }
+
+  document.addEventListener("DOMContentLoaded", () => {
+    document.querySelectorAll(".autocomplete").forEach(setup);
+  });
+})();